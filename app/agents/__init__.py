@@ -2,4 +2,4 @@
 Keep implementations small and testable.
 """
 
-__all__ = ["gmail", "gcal", "gdrive"]
+__all__ = ["base", "registry", "gmail", "gcal", "gdrive"]
@@ -4,6 +4,42 @@ All agents inherit from BaseAgent and implement the handle method.
 This allows the orchestrator engine to dispatch work uniformly.
 """
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import cached_property, lru_cache
+from typing import AsyncIterator, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import get_redis
+from app.db.session import async_session
+from app.embeddings.service import EmbeddingService
+
+
+class AgentResources:
+    """Process-wide clients shared by every agent.
+
+    Agents are long-lived (one instance per process, see
+    app/agents/registry.py) and get these injected instead of creating an
+    embedding client, Redis connection pool or session factory per call.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = async_session, redis_client=None):
+        self.session_factory = session_factory
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    @cached_property
+    def embeddings(self) -> EmbeddingService:
+        return EmbeddingService(redis_client=self.redis)
+
+
+@lru_cache(maxsize=1)
+def shared_resources() -> AgentResources:
+    """Return the process-wide AgentResources."""
+    return AgentResources()
 
 
 class BaseAgent(ABC):
@@ -12,6 +48,43 @@ class BaseAgent(ABC):
     Agents handle specific steps in an orchestration plan.
     """
 
+    def __init__(self, resources: AgentResources | None = None):
+        self.resources = resources or shared_resources()
+
+    @property
+    def embeddings(self) -> EmbeddingService:
+        return self.resources.embeddings
+
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        """Texts a step will embed, so the engine can batch them up front.
+
+        Only depends on the intent (not on results of earlier steps).
+        """
+        return []
+
+    async def embed(self, context: dict, text: str) -> list[float]:
+        """Vector for `text`, precomputed by the engine when available."""
+        precomputed = context.get("embeddings", {}).get(text)
+        if precomputed is not None:
+            return precomputed
+        return await self.embeddings.embed(text)
+
+    @asynccontextmanager
+    async def session(self, context: dict) -> AsyncIterator[AsyncSession]:
+        """Yield a DB session for a step.
+
+        Uses the orchestration's SessionScope when the engine provides one
+        (context["db_scope"]), so steps share connections instead of opening
+        one each; otherwise opens a standalone session.
+        """
+        scope = context.get("db_scope")
+        if scope is None:
+            async with self.resources.session_factory() as db:
+                yield db
+        else:
+            async with scope.acquire() as db:
+                yield db
+
     @abstractmethod
     async def handle(self, step_id: str, context: dict) -> dict:
         """Execute a step and return result.
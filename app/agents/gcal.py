@@ -2,12 +2,63 @@
 
 Handles Google Calendar-specific steps in orchestration.
 """
-from sqlalchemy import select, and_
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.agents.base import BaseAgent
-from app.db.session import async_session
-from app.db.models import GCalCache
+from app.embeddings.filtered import filtered_search, vector_order
+from app.embeddings.service import to_pgvector_literal
+from app.llm.temporal import TimeRange
+
+
+# Keyword matches on every search term are ranked first, then events closest
+# to now. Only a time range from the query bounds the candidates (either end
+# may be open); otherwise past bookings of any age still match. With no terms,
+# every event in the range is a candidate. The vector branch only runs when
+# no keyword candidate exists, so a lookup is always a single round trip:
+#   - (user_id, start_time) btree serves the time range
+#   - trigram GIN indexes on title/description serve the ILIKE ANY filters
+#   - (user_id, booking_reference) serves exact reference matches
+#   - the vector branch follows the user's strategy (app/embeddings/filtered.py):
+#     an exact sort for small calendars, an iterative HNSW scan otherwise
+FIND_EVENT_SQL = """
+    WITH keyword AS (
+        SELECT id, title, start_time,
+               CASE WHEN booking_reference = ANY(CAST(:terms AS text[])) THEN 10 ELSE 0 END
+               + 2 * (SELECT count(*) FROM unnest(CAST(:patterns AS text[])) AS p(pattern)
+                      WHERE title ILIKE p.pattern)
+               + (SELECT count(*) FROM unnest(CAST(:patterns AS text[])) AS p(pattern)
+                  WHERE description ILIKE p.pattern) AS score
+        FROM gcal_cache
+        WHERE user_id = :user_id
+          AND (CAST(:range_start AS timestamptz) IS NULL OR start_time >= :range_start)
+          AND (CAST(:range_end AS timestamptz) IS NULL OR start_time < :range_end)
+          AND (
+              cardinality(CAST(:terms AS text[])) = 0
+              OR title ILIKE ANY(CAST(:patterns AS text[]))
+              OR description ILIKE ANY(CAST(:patterns AS text[]))
+              OR booking_reference = ANY(CAST(:terms AS text[]))
+          )
+        ORDER BY score DESC, abs(extract(epoch FROM start_time - CAST(:now AS timestamptz))) ASC
+        LIMIT 1
+    ),
+    nearest AS (
+        SELECT id, title, start_time, 0 AS score
+        FROM gcal_cache
+        WHERE user_id = :user_id
+          AND (CAST(:range_start AS timestamptz) IS NULL OR start_time >= :range_start)
+          AND (CAST(:range_end AS timestamptz) IS NULL OR start_time < :range_end)
+          AND NOT EXISTS (SELECT 1 FROM keyword)
+        ORDER BY {vector_order}
+        LIMIT 1
+    )
+    SELECT id, title, start_time, 'keyword' AS method FROM keyword
+    UNION ALL
+    SELECT id, title, start_time, 'vector' AS method FROM nearest
+"""
 
 
 class GCalAgent(BaseAgent):
@@ -28,67 +79,117 @@ class GCalAgent(BaseAgent):
         else:
             return {"status": "unsupported_step", "step_id": step_id}
 
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        if step_id == "find_calendar_event":
+            query = self._embedding_text(context)
+            return [query] if query else []
+        return []
+
+    def _search_terms(self, context: dict) -> list[str]:
+        """Airline, company and booking reference, from the intent or an earlier step."""
+        entities = context.get("intent", {}).get("entities", {})
+        booking_reference = entities.get("booking_reference") or context.get("booking_reference")
+        return [
+            term
+            for term in (entities.get("airline"), entities.get("company"), booking_reference)
+            if term
+        ]
+
+    def _embedding_text(self, context: dict) -> str:
+        """Vector fallback text: the intent's entities, else all search terms.
+
+        A booking reference published by an earlier step only sharpens the
+        keyword tier, so the vector can usually be computed before execution.
+        Without intent entities it is the only term, taken from the context.
+        """
+        entities = context.get("intent", {}).get("entities", {})
+        terms = [
+            term
+            for term in (entities.get("airline"), entities.get("company"), entities.get("booking_reference"))
+            if term
+        ]
+        return " ".join(terms or self._search_terms(context))
+
     async def _find_calendar_event(self, context: dict) -> dict:
-        """Find calendar event by keyword search.
-        
-        Searches for events matching airline or booking reference.
+        """Find the calendar event best matching all known search terms.
+
+        Matches airline, company and booking reference in one query, ranked
+        by match quality and proximity to now, with a vector fallback. A
+        time range from the query ("next week") restricts both tiers.
         """
         user_id = context.get("user_id")
-        intent = context.get("intent", {})
-        entities = intent.get("entities", {})
-        airline = entities.get("airline", "")
-        booking_reference = context.get("booking_reference")
-
-        # Determine search keywords
-        search_terms = []
-        if airline:
-            search_terms.append(airline)
-        if booking_reference:
-            search_terms.append(booking_reference)
-
-        if not search_terms:
+        entities = context.get("intent", {}).get("entities", {})
+        time_range = TimeRange.from_dict(entities.get("time_range"))
+        search_terms = self._search_terms(context)
+
+        if not search_terms and not time_range:
             return {
                 "status": "not_found",
                 "step": "find_calendar_event",
                 "message": "No search terms available",
             }
 
-        # Search in database
-        async with async_session() as db:
-            # Try keyword search for each term
-            for term in search_terms:
-                event = await self._keyword_search(
-                    db=db,
-                    user_id=user_id,
-                    keyword=term,
-                )
-                if event:
-                    # Add event date to context
-                    context["event_date"] = str(event.start_time) if event.start_time else None
-
-                    return {
-                        "status": "found",
-                        "step": "find_calendar_event",
-                        "event_id": str(event.id),
-                        "title": event.title,
-                        "start_time": str(event.start_time) if event.start_time else None,
-                    }
+        query_embedding = None
+        if search_terms:
+            query_embedding = await self.embed(context, self._embedding_text(context))
+
+        async with self.session(context) as db:
+            event = await self._search_events(
+                db=db,
+                user_id=user_id,
+                terms=search_terms,
+                query_embedding=query_embedding,
+                time_range=time_range,
+            )
+
+        if event:
+            return self._event_found(event, context)
 
         return {
             "status": "not_found",
             "step": "find_calendar_event",
-            "message": f"No calendar event found for {' or '.join(search_terms)}",
+            "message": f"No calendar event found for {' or '.join(search_terms) or 'the requested time'}",
+        }
+
+    def _event_found(self, event, context: dict) -> dict:
+        """Build the step result for a matched event and publish its date."""
+        event_date = event.start_time.date().isoformat() if event.start_time else None
+        # Add event date to context
+        context["event_date"] = event_date
+
+        return {
+            "status": "found",
+            "step": "find_calendar_event",
+            "event_id": str(event.id),
+            "title": event.title,
+            "start_time": str(event.start_time) if event.start_time else None,
+            "event_date": event_date,
+            "method": event.method,
         }
 
-    async def _keyword_search(
-        self, db: AsyncSession, user_id, keyword: str
-    ) -> GCalCache | None:
-        """Search by keyword in event title."""
-        stmt = select(GCalCache).where(
-            and_(
-                GCalCache.user_id == user_id,
-                GCalCache.title.ilike(f"%{keyword}%"),
+    async def _search_events(
+        self,
+        db: AsyncSession,
+        user_id,
+        terms: list[str],
+        query_embedding: list[float] | None,
+        time_range: TimeRange | None = None,
+    ):
+        """Run the combined keyword + vector event search, bounded only by the query's time range."""
+        # Without an embedding the vector branch sorts on NULL; keep it off the index
+        exact = not query_embedding or await filtered_search.use_exact(db, "gcal_cache", user_id)
+        order = vector_order("embedding <-> CAST(:query_embedding AS vector)", exact)
+        async with nullcontext() if exact else filtered_search.ann_scan(db, k=1):
+            result = await db.execute(
+                text(FIND_EVENT_SQL.format(vector_order=order)),
+                {
+                    "user_id": user_id,
+                    "terms": terms,
+                    "patterns": [f"%{term}%" for term in terms],
+                    "now": datetime.now(timezone.utc),
+                    "range_start": time_range.start if time_range else None,
+                    "range_end": time_range.end if time_range else None,
+                    "query_embedding": to_pgvector_literal(query_embedding) if query_embedding else None,
+                },
             )
-        ).limit(1)
-        result = await db.execute(stmt)
-        return result.scalars().first()
+            return result.first()
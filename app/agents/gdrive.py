@@ -2,22 +2,20 @@
 
 Handles Drive-specific steps in orchestration.
 """
+from datetime import datetime, timezone
+
 from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.agents.base import BaseAgent
 from app.db.models import GDriveCache
-from app.embeddings.service import EmbeddingService
+from app.embeddings.batching import DRIVE_KEYWORD, get_vector_batcher
+from app.embeddings.filtered import filtered_search
+from app.llm.temporal import TimeRange
 
 
 class DriveAgent(BaseAgent):
     """Agent for Google Drive service operations."""
 
-    def __init__(self, db: AsyncSession, user_id: str, embeddings_svc: EmbeddingService):
-        self.db = db
-        self.user_id = user_id
-        self.embeddings_svc = embeddings_svc
-
     async def handle(self, step_id: str, context: dict) -> dict:
         """Handle a Drive step.
 
@@ -33,35 +31,41 @@ class DriveAgent(BaseAgent):
         else:
             return {"status": "unsupported_step", "step_id": step_id}
 
-    async def _search_drive_files(self, context: dict) -> dict:
-        intent = context.get("intent", {})
-        entities = intent.get("entities", {})
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        if step_id == "search_drive_files":
+            return [self._query_text(context)]
+        return []
 
+    def _query_text(self, context: dict) -> str:
         # Use extracted entity or fallback
-        query_text = entities.get("company") or entities.get("query") or "document"
-
-        # Generate embedding
-        query_embedding = await self.embeddings_svc.embed(query_text)
-
-        query_sql = """
-            SELECT id, file_id, name, content_preview
-            FROM gdrive_cache
-            WHERE user_id = :user_id
-            AND name ILIKE :keyword
-            ORDER BY embedding <-> CAST(:query_embedding AS vector)
-            LIMIT 1
-        """
-
-        result = await self.db.execute(
-            text(query_sql),
-            {
-                "user_id": self.user_id,
-                "keyword": f"%{query_text}%",
-                "query_embedding": query_embedding,
-            },
-        )
+        entities = context.get("intent", {}).get("entities", {})
+        return entities.get("company") or entities.get("query") or "document"
 
-        row = result.first()
+    async def _search_drive_files(self, context: dict) -> dict:
+        intent = context.get("intent", {})
+        entities = intent.get("entities", {})
+        user_id = context.get("user_id")
+
+        query_text = self._query_text(context)
+        query_embedding = await self.embed(context, query_text)
+
+        # Push the query's time range down to (user_id, updated_at);
+        # files are only ever edited in the past.
+        time_range = TimeRange.from_dict(entities.get("time_range"))
+        updated = time_range.clip_end(datetime.now(timezone.utc)) if time_range else None
+        filters = {
+            "keyword": f"%{query_text}%",
+            "updated_after": updated.start if updated else None,
+            "updated_before": updated.end if updated else None,
+        }
+
+        batcher = get_vector_batcher()
+        if batcher is not None:
+            rows = await batcher.search(DRIVE_KEYWORD, user_id, query_embedding, k=1, **filters)
+        else:
+            async with self.session(context) as db:
+                rows = await filtered_search.search(db, DRIVE_KEYWORD, user_id, query_embedding, k=1, **filters)
+        row = rows[0] if rows else None
 
         if row:
             return {
@@ -2,16 +2,63 @@
 
 Handles Gmail-specific steps in orchestration.
 """
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from typing import Any
-import re
 
-from sqlalchemy import select, and_, or_, func, text
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.agents.base import BaseAgent
-from app.db.session import async_session
-from app.db.models import GmailCache
-from app.embeddings.service import EmbeddingService
+from app.embeddings.batching import GMAIL_SEMANTIC, get_vector_batcher
+from app.embeddings.filtered import filtered_search, vector_order
+from app.embeddings.service import to_pgvector_literal
+from app.llm.temporal import TimeRange
+
+
+# Reference, keyword and vector tiers in one statement. Each later tier only
+# runs when the earlier ones found nothing, and all of them keep the user_id
+# predicate so partitioned tables are pruned.
+HYBRID_SEARCH_SQL = """
+    WITH reference AS (
+        SELECT id, 0 AS tier
+        FROM gmail_cache
+        WHERE user_id = :user_id
+          AND booking_reference = :reference
+        ORDER BY received_at DESC NULLS LAST
+        LIMIT 1
+    ),
+    keyword AS (
+        SELECT id, 1 AS tier
+        FROM gmail_cache
+        WHERE user_id = :user_id
+          AND subject ILIKE :keyword{received_filter}
+          AND NOT EXISTS (SELECT 1 FROM reference)
+        ORDER BY {vector_order}
+        LIMIT 1
+    ),
+    nearest AS (
+        SELECT id, 2 AS tier
+        FROM gmail_cache
+        WHERE user_id = :user_id{received_filter}
+          AND NOT EXISTS (SELECT 1 FROM reference)
+          AND NOT EXISTS (SELECT 1 FROM keyword)
+        ORDER BY {vector_order}
+        LIMIT 1
+    ),
+    best AS (
+        SELECT * FROM reference
+        UNION ALL SELECT * FROM keyword
+        UNION ALL SELECT * FROM nearest
+    )
+    SELECT g.id, g.subject, g.body_preview, g.booking_reference, best.tier
+    FROM best
+    JOIN gmail_cache g ON g.user_id = :user_id AND g.id = best.id
+    ORDER BY best.tier
+    LIMIT 1
+"""
+
+HYBRID_TIER_METHODS = {0: "reference", 1: "hybrid", 2: "vector_only"}
 
 
 class GmailAgent(BaseAgent):
@@ -29,129 +76,179 @@ class GmailAgent(BaseAgent):
         """
         if step_id == "search_gmail_for_booking":
             return await self._search_gmail_for_booking(context)
+        elif step_id == "search_gmail":
+            return await self._search_gmail(context)
         elif step_id == "draft_cancellation_email":
             return await self._draft_cancellation_email(context)
         else:
             return {"status": "unsupported_step", "step_id": step_id}
 
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        if step_id == "search_gmail_for_booking":
+            return [self._booking_query(context)]
+        if step_id == "search_gmail":
+            return [self._raw_query(context)]
+        return []
+
+    def _booking_query(self, context: dict) -> str:
+        entities = context.get("intent", {}).get("entities", {})
+        return f"{entities.get('airline', 'Unknown')} booking confirmation"
+
+    def _raw_query(self, context: dict) -> str:
+        return context.get("query") or context.get("intent", {}).get("intent", "")
+
     async def _search_gmail_for_booking(self, context: dict) -> dict:
         """Search Gmail for booking confirmation email using hybrid search.
         
-        Strategy:
-        1. Filter by keyword (airline name in subject)
-        2. Rank keyword matches by vector similarity
-        3. Fallback to pure vector similarity if no keyword matches
+        Strategy (tiers of one statement, first non-empty tier wins):
+        0. Look up a known booking reference through its index
+        1. Filter by keyword (airline name in subject), ranked by vector similarity
+        2. Fallback to pure vector similarity if no keyword matches
         """
         intent = context.get("intent", {})
         entities = intent.get("entities", {})
         airline = entities.get("airline", "Unknown")
         user_id = context.get("user_id")
+        reference = entities.get("booking_reference") or context.get("booking_reference")
+        received = self._received_range(entities)
 
-        # Generate embedding for query
-        embeddings_svc = EmbeddingService()
-        query = f"{airline} booking confirmation"
-        query_embedding = await embeddings_svc.embed(query)
+        query_embedding = await self.embed(context, self._booking_query(context))
 
-        # Search in database with hybrid strategy
-        async with async_session() as db:
-            # Step 1: Try keyword filter
-            keyword_results = await self._keyword_search(
+        async with self.session(context) as db:
+            match = await self._hybrid_search(
                 db=db,
                 user_id=user_id,
                 airline=airline,
+                booking_reference=reference,
+                query_embedding=query_embedding,
+                received=received,
             )
 
-            if keyword_results:
-                # Rank keyword matches by vector similarity
-                best_match = await self._rank_by_vector(
-                    db=db,
-                    email_ids=[row.id for row in keyword_results],
-                    query_embedding=query_embedding,
-                )
-                if best_match:
-                    # Extract booking reference from subject
-                    booking_ref = self._extract_booking_reference(best_match.subject)
-                    context["booking_reference"] = booking_ref
-
-                    return {
-                        "status": "found",
-                        "step": "search_gmail_for_booking",
-                        "email_id": str(best_match.id),
-                        "subject": best_match.subject,
-                        "body": best_match.body_preview,
-                        "booking_reference": booking_ref,
-                        "method": "hybrid",
-                    }
-
-            # Step 2: Fallback to pure vector similarity
-            vector_results = await self._vector_search(
-                db=db,
-                user_id=user_id,
-                query_embedding=query_embedding,
-                limit=1,
+        if match:
+            return self._booking_found(match, context, method=HYBRID_TIER_METHODS[match.tier])
+
+        return {
+            "status": "not_found",
+            "step": "search_gmail_for_booking",
+            "message": f"No booking email found for {airline}",
+        }
+
+    async def _search_gmail(self, context: dict) -> dict:
+        """Semantic email search over the raw query, bounded by any time range."""
+        intent = context.get("intent", {})
+        entities = intent.get("entities", {})
+        user_id = context.get("user_id")
+        received = self._received_range(entities)
+
+        query_embedding = await self.embed(context, self._raw_query(context))
+
+        received_after = received.start if received else None
+        received_before = received.end if received else None
+        batcher = get_vector_batcher()
+        if batcher is not None:
+            rows = await batcher.search(
+                GMAIL_SEMANTIC,
+                user_id,
+                query_embedding,
+                k=5,
+                received_after=received_after,
+                received_before=received_before,
             )
+        else:
+            async with self.session(context) as db:
+                rows = await filtered_search.search(
+                    db,
+                    GMAIL_SEMANTIC,
+                    user_id,
+                    query_embedding,
+                    k=5,
+                    received_after=received_after,
+                    received_before=received_before,
+                )
 
-            if vector_results:
-                row = vector_results[0]
-                # Extract booking reference from subject
-                booking_ref = self._extract_booking_reference(row.subject)
-                context["booking_reference"] = booking_ref
+        if not rows:
+            return {
+                "status": "not_found",
+                "step": "search_gmail",
+                "message": "No matching emails found",
+            }
 
-                return {
-                    "status": "found",
-                    "step": "search_gmail_for_booking",
+        return {
+            "status": "found",
+            "step": "search_gmail",
+            "emails": [
+                {
                     "email_id": str(row.id),
                     "subject": row.subject,
-                    "body": row.body_preview,
-                    "booking_reference": booking_ref,
-                    "method": "vector_only",
+                    "received_at": str(row.received_at) if row.received_at else None,
                 }
+                for row in rows
+            ],
+            "method": "vector_only",
+        }
 
-            return {
-                "status": "not_found",
-                "step": "search_gmail_for_booking",
-                "message": f"No booking email found for {airline}",
-            }
+    def _received_range(self, entities: dict) -> TimeRange | None:
+        """Time range from the query, clipped to the past (emails are never received in the future)."""
+        time_range = TimeRange.from_dict(entities.get("time_range"))
+        if not time_range:
+            return None
+        return time_range.clip_end(datetime.now(timezone.utc))
 
-    async def _keyword_search(
-        self, db: AsyncSession, user_id, airline: str
-    ) -> list:
-        """Search by keyword (airline name in subject)."""
-        stmt = select(GmailCache).where(
-            and_(
-                GmailCache.user_id == user_id,
-                GmailCache.subject.ilike(f"%{airline}%"),
-            )
-        )
-        result = await db.execute(stmt)
-        return result.scalars().all()
+    def _booking_found(self, row, context: dict, method: str) -> dict:
+        """Build the step result for a matched booking email.
+
+        The booking reference comes from the column populated at ingestion.
+        """
+        booking_ref = row.booking_reference
+        context["booking_reference"] = booking_ref
 
-    async def _rank_by_vector(
-        self, db: AsyncSession, email_ids: list, query_embedding: list
+        return {
+            "status": "found",
+            "step": "search_gmail_for_booking",
+            "email_id": str(row.id),
+            "subject": row.subject,
+            "body": row.body_preview,
+            "booking_reference": booking_ref,
+            "method": method,
+        }
+
+    async def _hybrid_search(
+        self,
+        db: AsyncSession,
+        user_id,
+        airline: str,
+        booking_reference: str | None,
+        query_embedding: list,
+        received: TimeRange | None = None,
     ):
-        """Rank emails by vector similarity and return top 1."""
-        if not email_ids:
-            return None
+        """Run the reference, keyword and vector tiers as one round trip.
+
+        For users with large mailboxes the keyword and vector tiers walk the
+        HNSW index with iterative scans, so the user_id and keyword filters
+        cannot leave them empty.
+        """
+        received_filter = ""
+        params = {
+            "user_id": user_id,
+            "reference": booking_reference,
+            "keyword": f"%{airline}%",
+            "query_embedding": to_pgvector_literal(query_embedding),
+        }
+        if received and received.start:
+            received_filter += " AND received_at >= :received_after"
+            params["received_after"] = received.start
+        if received and received.end:
+            received_filter += " AND received_at < :received_before"
+            params["received_before"] = received.end
 
-        stmt = select(GmailCache).where(
-            GmailCache.id.in_(email_ids)
-        ).order_by(
-            GmailCache.embedding.op("<->")(query_embedding)
-        ).limit(1)
-        result = await db.execute(stmt)
-        return result.scalars().first()
-
-    async def _vector_search(
-        self, db: AsyncSession, user_id, query_embedding: list, limit: int = 1
-    ) -> list:
-        """Pure vector similarity search."""
-        stmt = select(GmailCache).where(
-            GmailCache.user_id == user_id
-        ).order_by(
-            GmailCache.embedding.op("<->")(query_embedding)
-        ).limit(limit)
-        result = await db.execute(stmt)
-        return result.scalars().all()
+        exact = await filtered_search.use_exact(db, "gmail_cache", user_id)
+        order = vector_order("embedding <-> CAST(:query_embedding AS vector)", exact)
+        async with nullcontext() if exact else filtered_search.ann_scan(db, k=1):
+            result = await db.execute(
+                text(HYBRID_SEARCH_SQL.format(received_filter=received_filter, vector_order=order)),
+                params,
+            )
+            return result.first()
 
     async def _draft_cancellation_email(self, context: dict) -> dict:
         """Draft a cancellation email."""
@@ -159,16 +256,11 @@ class GmailAgent(BaseAgent):
         entities = intent.get("entities", {})
         airline = entities.get("airline", "Unknown")
         booking_ref = context.get("booking_reference")
-        event_date = context.get("event_date")
+        # YYYY-MM-DD, resolved once by the calendar agent
+        date_str = context.get("event_date")
 
         # Build body with or without event date
-        if event_date:
-            # Format event_date to YYYY-MM-DD if it's a datetime object
-            if hasattr(event_date, "strftime"):
-                date_str = event_date.strftime("%Y-%m-%d")
-            else:
-                date_str = str(event_date).split()[0]  # Extract date part
-            
+        if date_str:
             if booking_ref:
                 body = (
                     f"Please cancel my {airline} booking {booking_ref} "
@@ -200,11 +292,3 @@ class GmailAgent(BaseAgent):
             "subject": f"Cancellation Request - {airline}",
             "body": body,
         }
-
-    def _extract_booking_reference(self, text: str) -> str | None:
-        """Extract booking reference from text.
-        
-        Pattern: 2 uppercase letters followed by 4 digits (e.g., TK1234).
-        """
-        match = re.search(r"[A-Z]{2}\d{4}", text)
-        return match.group(0) if match else None
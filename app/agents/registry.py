@@ -0,0 +1,74 @@
+"""Registry mapping plan steps to the agents that handle them.
+
+Each agent is declared once in `AGENTS` with the steps it handles and its
+import path. Modules are imported on the first step that needs them, so
+adding a service costs nothing at startup, and every agent is instantiated
+once per process with the shared AgentResources. Dispatch is a dict lookup.
+"""
+import importlib
+from dataclasses import dataclass
+
+from app.agents.base import AgentResources, BaseAgent, shared_resources
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    service: str
+    path: str  # "package.module:ClassName"
+    steps: tuple[str, ...]
+
+
+AGENTS = (
+    AgentSpec(
+        "gmail",
+        "app.agents.gmail:GmailAgent",
+        ("search_gmail_for_booking", "search_gmail", "draft_cancellation_email"),
+    ),
+    AgentSpec("gcal", "app.agents.gcal:GCalAgent", ("find_calendar_event",)),
+    AgentSpec("gdrive", "app.agents.gdrive:DriveAgent", ("search_drive_files",)),
+)
+
+
+class AgentRegistry:
+    """Resolve steps to lazily constructed, process-wide agent instances."""
+
+    def __init__(self, specs=AGENTS, resources: AgentResources | None = None):
+        self._resources = resources
+        self._specs = {}
+        for spec in specs:
+            for step in spec.steps:
+                if step in self._specs:
+                    raise ValueError(f"Step '{step}' is handled by both {self._specs[step].service} and {spec.service}")
+                self._specs[step] = spec
+        self._agents: dict[str, BaseAgent] = {}
+
+    @property
+    def resources(self) -> AgentResources:
+        return self._resources or shared_resources()
+
+    @property
+    def steps(self) -> frozenset[str]:
+        return frozenset(self._specs)
+
+    def service_for(self, step_id: str) -> str:
+        """Service name handling a step, or "unknown"."""
+        spec = self._specs.get(step_id)
+        return spec.service if spec else "unknown"
+
+    def agent_for(self, step_id: str) -> BaseAgent | None:
+        """Agent handling a step, importing and constructing it on first use."""
+        spec = self._specs.get(step_id)
+        if spec is None:
+            return None
+        agent = self._agents.get(spec.service)
+        if agent is None:
+            agent = self._agents[spec.service] = self._load(spec)
+        return agent
+
+    def _load(self, spec: AgentSpec) -> BaseAgent:
+        module_name, class_name = spec.path.split(":")
+        agent_class = getattr(importlib.import_module(module_name), class_name)
+        return agent_class(self.resources)
+
+
+agent_registry = AgentRegistry()
@@ -1,14 +1,18 @@
 import uuid
 from datetime import datetime
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import insert
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.profiling import load_profile
 from app.db.session import get_db
+from app.db.slow_queries import ORDERS, slow_query_log
 from app.db.models import GmailCache, User
 from app.embeddings.service import EmbeddingService, search_gmail_semantic
+from app.ingestion.extraction import extract_entities
 
 router = APIRouter()
 
@@ -42,13 +46,17 @@ async def seed_and_search(
     embedding = await embeddings_svc.embed(payload.text)
 
     # Insert row
+    subject = payload.text[:50]
+    received_at = datetime.utcnow()
+    entities = extract_entities(subject, payload.text, reference_time=received_at)
     gmail_cache = GmailCache(
         user_id=user_id,
         email_id=email_id,
-        subject=payload.text[:50],
+        subject=subject,
         body_preview=payload.text,
         embedding=embedding,
-        received_at=datetime.utcnow(),
+        received_at=received_at,
+        **entities.as_columns(),
     )
 
     db.add(gmail_cache)
@@ -74,4 +82,22 @@ async def seed_and_search(
             }
             for row in results
         ],
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/profiles/{task_id}")
+async def get_profile(task_id: str):
+    """Profile of a query submitted with `X-Profile: 1` or `?profile=true`."""
+    profile = load_profile(task_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this task")
+    return profile
+
+
+@router.get("/slow-queries")
+async def list_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    order: str = Query("total_ms", pattern="^(" + "|".join(ORDERS) + ")$"),
+):
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS, grouped by fingerprint."""
+    return {"threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS, "queries": slow_query_log.top(limit, order)}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import metrics
+# Registers the queue-depth collector
+from app.services import scheduling  # noqa: F401
+
+router = APIRouter()
+
+
+@router.get("", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def export_metrics() -> str:
+    return metrics.render()
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from datetime import datetime
 
+from app.services.tasks import backfill_entities
+
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 sync_router = APIRouter(prefix="/sync", tags=["sync"])
 
@@ -14,10 +16,15 @@ async def google_oauth():
 
 @sync_router.post("/trigger")
 async def trigger_sync():
-    """Mock endpoint to manually trigger background sync."""
+    """Mock endpoint to manually trigger background sync.
+
+    Enqueues entity backfill on the ingest queue, away from interactive queries.
+    """
+    task = backfill_entities.delay()
     return {
         "status": "sync_triggered", 
-        "message": "Background sync for Gmail, GCal, and Drive initiated."
+        "message": "Background sync for Gmail, GCal, and Drive initiated.",
+        "task_id": task.id,
     }
 
 @sync_router.get("/status")
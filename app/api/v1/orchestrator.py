@@ -2,12 +2,19 @@
 
 Chains intent classification → planning → execution.
 """
+import math
 import uuid
 from pydantic import BaseModel
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Query
 from celery.result import AsyncResult
+from app.core.config import settings
 from app.services.celery_app import celery_app
-from app.services.tasks import run_orchestration
+from app.services.admission import admission_controller
+from app.services.results import load_details
+from app.services.scheduling import route_query
+from app.services.singleflight import single_flight
+from app.services.task_queue import CANCELLED, FAILURE, PENDING, SUCCESS, QueueFull, local_queue
+from app.services.tasks import run_orchestration, run_orchestration_local
 
 router = APIRouter()
 
@@ -17,6 +24,9 @@ FIXED_TEST_USER_ID = uuid.UUID("550e8400-e29b-41d4-a716-446655440000")
 
 class OrchestrateRequest(BaseModel):
     query: str
+    conversation_id: str | None = None
+    # Bulk or scheduled callers that do not wait on the result
+    background: bool = False
 
 
 class OrchestrateResponse(BaseModel):
@@ -25,13 +35,73 @@ class OrchestrateResponse(BaseModel):
 
 
 @router.post("/query")
-async def submit_query(payload: OrchestrateRequest):
+async def submit_query(
+    payload: OrchestrateRequest,
+    profile: bool = Query(False, description="Profile this run; see GET /debug/profiles/{task_id}"),
+    x_profile: bool = Header(False),
+):
     user_id = str(FIXED_TEST_USER_ID)
-    task = run_orchestration.delay(user_id, payload.query)
+    route = route_query(payload.conversation_id, payload.background)
+    profile = profile or x_profile
+
+    # Duplicates join the in-flight task without spending admission budget.
+    # Profiled runs never join, since the shared run was not profiled.
+    in_flight = None if profile else single_flight.lookup(user_id, payload.query, payload.conversation_id)
+    if in_flight:
+        return {"task_id": in_flight}
+
+    # Shed load up front rather than building a backlog that takes minutes to drain
+    decision = admission_controller.admit(user_id, route["queue"])
+    if not decision.admitted:
+        raise HTTPException(
+            status_code=429,
+            detail=decision.reason,
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+    if profile:
+        task_id = str(uuid.uuid4())
+    else:
+        task_id, leader = single_flight.claim(user_id, payload.query, payload.conversation_id)
+        if not leader:
+            return {"task_id": task_id}
+
+    if settings.TASK_BACKEND == "local":
+        return _submit_local(task_id, user_id, payload, route["priority"], profile)
+
+    task = run_orchestration.apply_async(
+        (user_id, payload.query, payload.conversation_id),
+        {"profile": profile},
+        task_id=task_id,
+        **route,
+    )
     return {"task_id": task.id}
 
+
+def _submit_local(task_id: str, user_id: str, payload: OrchestrateRequest, priority: int, profile: bool) -> dict:
+    try:
+        job = local_queue.apply_async(
+            run_orchestration_local,
+            (task_id, user_id, payload.query, payload.conversation_id),
+            {"profile": profile},
+            priority=priority,
+            task_id=task_id,
+        )
+    except QueueFull:
+        single_flight.release(user_id, payload.query, payload.conversation_id, task_id)
+        raise HTTPException(
+            status_code=429,
+            detail="overloaded",
+            headers={"Retry-After": str(max(1, math.ceil(settings.ADMISSION_TASK_SECONDS_ESTIMATE)))},
+        )
+    return {"task_id": job.id}
+
+
 @router.get("/query/{task_id}")
 async def get_query_status(task_id: str):
+    if settings.TASK_BACKEND == "local":
+        return _local_status(task_id)
+
     result = AsyncResult(task_id, app=celery_app)
 
     if result.state == "PENDING":
@@ -41,4 +111,40 @@ async def get_query_status(task_id: str):
     elif result.state == "FAILURE":
         return {"status": "failed", "error": str(result.info)}
     else:
-        return {"status": result.state}
\ No newline at end of file
+        return {"status": result.state}
+
+
+def _local_status(task_id: str) -> dict:
+    job = local_queue.get(task_id)
+    if job is None or job.state == PENDING:
+        return {"status": "pending"}
+    elif job.state == SUCCESS:
+        return {"status": "completed", "result": job.future.result()}
+    elif job.state == FAILURE:
+        return {"status": "failed", "error": str(job.future.exception())}
+    elif job.state == CANCELLED:
+        return {"status": "cancelled"}
+    else:
+        return {"status": job.state}
+
+
+@router.delete("/query/{task_id}")
+async def cancel_query(task_id: str):
+    """Cancel a queued or running query."""
+    if settings.TASK_BACKEND == "local":
+        if not local_queue.cancel(task_id):
+            raise HTTPException(status_code=404, detail="No pending or running task with this id")
+    else:
+        celery_app.control.revoke(task_id, terminate=False)
+    # A task cancelled before it started never releases its claim itself
+    single_flight.release_task(task_id)
+    return {"task_id": task_id, "status": "cancelled"}
+
+
+@router.get("/query/{task_id}/details")
+async def get_query_details(task_id: str):
+    """Full step outputs of a completed query (kept for RESULT_EXPIRES_SECONDS)."""
+    details = load_details(task_id)
+    if details is None:
+        raise HTTPException(status_code=404, detail="No details for this task")
+    return {"task_id": task_id, "details": details}
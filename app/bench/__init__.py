@@ -0,0 +1,5 @@
+"""Benchmarking tools: API load generation and trace replay.
+Run them as modules (`python -m app.bench.loadgen ...`).
+"""
+
+__all__ = ["loadgen", "replay"]
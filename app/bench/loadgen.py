@@ -0,0 +1,320 @@
+"""Open-loop load generator for the orchestration API.
+
+Queries arrive as a Poisson process at `--rate` per second for `--duration`
+seconds, drawn from a weighted mix of the intents the classifier supports.
+Each arrival is served by one of `--users` virtual users. A user has its own
+conversation, so repeated queries exercise follow-up routing. The user
+submits with `POST /query` and polls until the task finishes.
+
+Arrivals never wait for earlier queries. When every virtual user is busy the
+arrival is counted as `dropped` instead of being delayed. Latency is measured
+from the scheduled arrival time, so a slow server cannot hide its queueing
+delay (coordinated omission).
+
+A `--profile-rate` share of queries is sent with `X-Profile: 1`, and their
+stored profiles supply per-stage latency percentiles.
+
+    python -m app.bench.loadgen run --rate 20 --duration 60 --users 50 --output before.json
+    python -m app.bench.loadgen compare before.json after.json
+
+Targets: the docker-compose stack, or a local API with TASK_BACKEND=local
+and LLM_BASE_URL pointing at app/llm/mock_server.py. The API serves every
+query as one demo user, so raise RATE_LIMIT_PER_SECOND / RATE_LIMIT_BURST and
+FAIR_SHARE_MAX_INFLIGHT_PER_USER on the target, or most arrivals are shed
+with 429.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import httpx
+
+DEFAULT_BASE_URL = "http://localhost:8000/api/v1"
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass(frozen=True)
+class MixEntry:
+    label: str
+    query: str
+    weight: float
+
+
+# Roughly the shape of interactive traffic: single-service lookups dominate
+DEFAULT_MIX = (
+    MixEntry("check_calendar", "What's on my calendar next week?", 4),
+    MixEntry("search_emails", "Find emails from sarah@company.com about the budget", 4),
+    MixEntry("search_drive", "Show me PDFs in Drive from last month", 3),
+    MixEntry("find_booking", "Where is my booking TK1234?", 2),
+    MixEntry("cancel_flight", "Cancel my Turkish Airlines flight", 2),
+    MixEntry("prepare_meeting", "Prepare for tomorrow's meeting with Acme Corp", 2),
+    MixEntry("check_conflicts", "Find events next week that conflict with my out-of-office doc", 1),
+    MixEntry("check_calendar", "Move the meeting with John", 1),
+    MixEntry("unknown", "Summarize what I missed while I was away", 1),
+)
+
+
+@dataclass
+class Sample:
+    label: str
+    scheduled: float
+    status: str  # ok, failed, shed, error, timeout, dropped
+    submit_ms: float | None = None
+    e2e_ms: float | None = None
+    stages: dict[str, float] = field(default_factory=dict)
+
+
+def load_mix(path: str | None) -> tuple[MixEntry, ...]:
+    """Query mix from a JSON list of {label, query, weight}, or the default."""
+    if path is None:
+        return DEFAULT_MIX
+    with open(path) as f:
+        return tuple(MixEntry(item["label"], item["query"], float(item.get("weight", 1))) for item in json.load(f))
+
+
+async def _poll(client: httpx.AsyncClient, task_id: str, deadline: float, poll_interval: float) -> str:
+    """Poll until the task finishes; backs off up to 8x the base interval."""
+    delay = poll_interval
+    while time.monotonic() < deadline:
+        response = await client.get(f"/query/{task_id}")
+        response.raise_for_status()
+        status = response.json().get("status")
+        if status == "completed":
+            return "ok"
+        if status in ("failed", "cancelled"):
+            return "failed"
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, poll_interval * 8)
+    return "timeout"
+
+
+async def _one_query(
+    client: httpx.AsyncClient,
+    entry: MixEntry,
+    conversation_id: str,
+    scheduled: float,
+    timeout: float,
+    poll_interval: float,
+    profile: bool,
+) -> Sample:
+    sample = Sample(label=entry.label, scheduled=scheduled, status="error")
+    try:
+        response = await client.post(
+            "/query",
+            json={"query": entry.query, "conversation_id": conversation_id},
+            headers={"X-Profile": "1"} if profile else None,
+        )
+        sample.submit_ms = (time.monotonic() - scheduled) * 1000
+        if response.status_code == 429:
+            sample.status = "shed"
+            return sample
+        response.raise_for_status()
+        task_id = response.json()["task_id"]
+
+        sample.status = await _poll(client, task_id, scheduled + timeout, poll_interval)
+        sample.e2e_ms = (time.monotonic() - scheduled) * 1000
+
+        if profile and sample.status == "ok":
+            profiled = await client.get(f"/debug/profiles/{task_id}")
+            if profiled.status_code == 200:
+                sample.stages = {name: seconds * 1000 for name, seconds in profiled.json()["stages"].items()}
+    except (httpx.HTTPError, KeyError, ValueError):
+        sample.status = "error"
+    return sample
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    rate: float,
+    duration: float,
+    users: int,
+    mix: tuple[MixEntry, ...] = DEFAULT_MIX,
+    timeout: float = 30.0,
+    poll_interval: float = 0.05,
+    profile_rate: float = 0.0,
+    seed: int | None = None,
+) -> list[Sample]:
+    """Drive the API with Poisson arrivals and return one sample per arrival."""
+    rng = random.Random(seed)
+    weights = [entry.weight for entry in mix]
+    idle: asyncio.Queue[str] = asyncio.Queue()
+    for _ in range(users):
+        idle.put_nowait(str(uuid.uuid4()))
+
+    samples: list[Sample] = []
+    in_flight: list[asyncio.Task] = []
+
+    async def serve(conversation_id: str, entry: MixEntry, scheduled: float, profile: bool) -> None:
+        try:
+            samples.append(await _one_query(client, entry, conversation_id, scheduled, timeout, poll_interval, profile))
+        finally:
+            idle.put_nowait(conversation_id)
+
+    start = time.monotonic()
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        scheduled = start + offset
+        await asyncio.sleep(max(0.0, scheduled - time.monotonic()))
+        entry = rng.choices(mix, weights)[0]
+        try:
+            conversation_id = idle.get_nowait()
+        except asyncio.QueueEmpty:
+            samples.append(Sample(label=entry.label, scheduled=scheduled, status="dropped"))
+        else:
+            profile = rng.random() < profile_rate
+            in_flight.append(asyncio.create_task(serve(conversation_id, entry, scheduled, profile)))
+        offset += rng.expovariate(rate)
+
+    await asyncio.gather(*in_flight)
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def distribution(values: list[float]) -> dict:
+    ordered = sorted(values)
+    summary = {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = round(percentile(ordered, q), 3)
+    summary["max"] = round(ordered[-1], 3) if ordered else 0.0
+    return summary
+
+
+def summarize(samples: list[Sample], duration: float, config: dict | None = None) -> dict:
+    """Latency percentiles (ms), throughput and error rates of a run."""
+    statuses = Counter(sample.status for sample in samples)
+    ok = [sample for sample in samples if sample.status == "ok"]
+
+    by_label: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_label[sample.label].append(sample)
+
+    stage_values: dict[str, list[float]] = defaultdict(list)
+    for sample in ok:
+        for name, value in sample.stages.items():
+            stage_values[name].append(value)
+
+    total = len(samples)
+    return {
+        "config": config or {},
+        "created_at": time.time(),
+        "arrivals": total,
+        "statuses": dict(statuses),
+        "throughput_per_second": round(len(ok) / duration, 3) if duration else 0.0,
+        "error_rate": round((total - len(ok)) / total, 4) if total else 0.0,
+        "latency_ms": {
+            "e2e": distribution([sample.e2e_ms for sample in ok]),
+            "submit": distribution([sample.submit_ms for sample in samples if sample.submit_ms is not None]),
+        },
+        "by_label": {
+            label: {
+                "arrivals": len(group),
+                "errors": sum(1 for sample in group if sample.status != "ok"),
+                "e2e": distribution([sample.e2e_ms for sample in group if sample.status == "ok"]),
+            }
+            for label, group in sorted(by_label.items())
+        },
+        "stages_ms": {name: distribution(values) for name, values in sorted(stage_values.items())},
+    }
+
+
+def compare(before: dict, after: dict) -> list[tuple[str, float, float, float | None]]:
+    """(metric, before, after, relative change) for the headline metrics of two reports."""
+    rows = [
+        ("throughput_per_second", before["throughput_per_second"], after["throughput_per_second"]),
+        ("error_rate", before["error_rate"], after["error_rate"]),
+    ]
+    for kind in ("e2e", "submit"):
+        for stat in [f"p{q}" for q in PERCENTILES] + ["max"]:
+            rows.append((
+                f"{kind}.{stat}_ms",
+                before["latency_ms"][kind][stat],
+                after["latency_ms"][kind][stat],
+            ))
+    for name in sorted(set(before["stages_ms"]) & set(after["stages_ms"])):
+        rows.append((f"stage.{name}.p95_ms", before["stages_ms"][name]["p95"], after["stages_ms"][name]["p95"]))
+    return [(metric, a, b, (b - a) / a if a else None) for metric, a, b in rows]
+
+
+def _print_report(report: dict, out=sys.stdout) -> None:
+    e2e = report["latency_ms"]["e2e"]
+    print(f"arrivals {report['arrivals']}  statuses {report['statuses']}", file=out)
+    print(f"throughput {report['throughput_per_second']}/s  error rate {report['error_rate']:.2%}", file=out)
+    print("e2e ms  " + "  ".join(f"{key} {e2e[key]}" for key in ("p50", "p90", "p95", "p99", "max")), file=out)
+    for name, stage in report["stages_ms"].items():
+        print(f"  {name:<32} p50 {stage['p50']:>9}  p95 {stage['p95']:>9}  n={stage['count']}", file=out)
+
+
+def _print_comparison(rows, out=sys.stdout) -> None:
+    print(f"{'metric':<40} {'before':>12} {'after':>12} {'change':>9}", file=out)
+    for metric, before, after, change in rows:
+        change_text = f"{change:+.1%}" if change is not None else "n/a"
+        print(f"{metric:<40} {before:>12} {after:>12} {change_text:>9}", file=out)
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    config = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        samples = await run_load(
+            client,
+            rate=args.rate,
+            duration=args.duration,
+            users=args.users,
+            mix=load_mix(args.mix),
+            timeout=args.timeout,
+            poll_interval=args.poll_interval,
+            profile_rate=args.profile_rate,
+            seed=args.seed,
+        )
+    report = summarize(samples, args.duration, config)
+    report["samples"] = [asdict(sample) for sample in samples]
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="drive the API and write a report")
+    run_parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    run_parser.add_argument("--rate", type=float, default=5.0, help="arrivals per second")
+    run_parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals")
+    run_parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    run_parser.add_argument("--mix", help="JSON list of {label, query, weight}")
+    run_parser.add_argument("--timeout", type=float, default=30.0, help="per-query deadline in seconds")
+    run_parser.add_argument("--poll-interval", type=float, default=0.05)
+    run_parser.add_argument("--profile-rate", type=float, default=0.0, help="share of queries profiled")
+    run_parser.add_argument("--seed", type=int)
+    run_parser.add_argument("--output", help="write the JSON report here")
+
+    compare_parser = subcommands.add_parser("compare", help="compare two saved reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = asyncio.run(_run(args))
+        _print_report(report)
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, indent=2))
+    elif args.command == "compare":
+        before, after = (json.loads(Path(path).read_text()) for path in (args.before, args.after))
+        _print_comparison(compare(before, after))
@@ -0,0 +1,188 @@
+"""Replay recorded orchestration traces without a database or Redis.
+
+Each trace (app/orchestrator/tracing.py) is re-planned with the current
+planner and executed by the current engine. The engine's registry is
+replaced by stand-ins that return the recorded step results and embedding
+batches after their recorded latency times `--latency-scale`. The scale is 1
+for the original timings and 0 to measure pure orchestration overhead.
+Traces start at their recorded arrival offsets, compressed by
+`--arrival-scale`, so production traffic shapes are preserved.
+
+Replays produce the same report format as app/bench/loadgen.py, so runs
+before and after a scheduler, planner or caching change can be compared:
+
+    python -m app.bench.replay export --output traces.jsonl
+    python -m app.bench.replay run traces.jsonl --output before.json
+    python -m app.bench.loadgen compare before.json after.json
+"""
+import argparse
+import asyncio
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.bench.loadgen import Sample, _print_report, summarize
+from app.orchestrator import tracing
+from app.orchestrator.engine import OrchestratorEngine
+from app.orchestrator.planner import QueryPlanner
+
+# all-MiniLM-L6-v2; replayed agents never read the vectors
+EMBEDDING_DIMENSIONS = 384
+
+
+class ReplayEmbeddings:
+    """Embedding service answering with zero vectors after the recorded batch latency."""
+
+    def __init__(self, batch_ms: float, latency_scale: float):
+        self.batch_seconds = batch_ms / 1000 * latency_scale
+
+    async def embed(self, text: str) -> list[float]:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        if self.batch_seconds:
+            await asyncio.sleep(self.batch_seconds)
+        return [[0.0] * EMBEDDING_DIMENSIONS for _ in texts]
+
+
+class ReplayResources:
+    def __init__(self, embeddings: ReplayEmbeddings):
+        self.embeddings = embeddings
+
+
+class ReplayAgent:
+    """Return a trace's recorded step results after their recorded durations."""
+
+    def __init__(self, trace: dict, latency_scale: float):
+        self.steps = trace["steps"]
+        self.texts = trace["embeddings"]["texts"]
+        self.latency_scale = latency_scale
+
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        return list(self.texts.get(step_id, ()))
+
+    async def handle(self, step_id: str, context: dict) -> dict:
+        recorded = self.steps.get(step_id)
+        if recorded is None or "result" not in recorded:
+            return {"status": "not_recorded", "step_id": step_id}
+        delay = recorded["duration_ms"] / 1000 * self.latency_scale
+        if delay:
+            await asyncio.sleep(delay)
+        context.update(recorded["published"])
+        return copy.deepcopy(recorded["result"])
+
+
+class ReplayRegistry:
+    """Stand-in for AgentRegistry serving every step from one trace."""
+
+    def __init__(self, trace: dict, latency_scale: float = 1.0):
+        self.agent = ReplayAgent(trace, latency_scale)
+        self.resources = ReplayResources(ReplayEmbeddings(trace["embeddings"]["batch_ms"], latency_scale))
+
+    def service_for(self, step_id: str) -> str:
+        return "replay"
+
+    def agent_for(self, step_id: str) -> ReplayAgent:
+        return self.agent
+
+
+async def replay_trace(trace: dict, latency_scale: float = 1.0, include_classify: bool = True) -> Sample:
+    """Re-plan and execute one trace; the sample's stages are per-step wall times."""
+    started = time.monotonic()
+    if include_classify:
+        await asyncio.sleep(trace["stages_ms"].get("classify", 0.0) / 1000 * latency_scale)
+
+    plan = QueryPlanner().build_plan(trace["intent"], known_results=trace["plan"]["reused"])
+    engine = OrchestratorEngine(registry=ReplayRegistry(trace, latency_scale))
+    context = {"user_id": trace["user_id"], "query": trace["query"]}
+
+    # Record the replay itself for per-step wall times (never stored)
+    with tracing.recording(tracing.TraceRecorder(trace["user_id"], trace["query"])) as recorder:
+        await engine.execute(plan, context)
+    replayed = recorder.finish()
+
+    stages = {f"step:{step_id}": step["duration_ms"] for step_id, step in replayed["steps"].items()}
+    stages["execute"] = replayed["total_ms"]
+    return Sample(
+        label=trace["intent"].get("intent", "unknown"),
+        scheduled=started,
+        status="ok",
+        submit_ms=0.0,
+        e2e_ms=(time.monotonic() - started) * 1000,
+        stages=stages,
+    )
+
+
+async def replay(
+    traces: list[dict],
+    latency_scale: float = 1.0,
+    arrival_scale: float = 1.0,
+    include_classify: bool = True,
+) -> list[Sample]:
+    """Replay traces at their recorded arrival offsets (times `arrival_scale`)."""
+    if not traces:
+        return []
+    first = min(trace["recorded_at"] for trace in traces)
+    start = time.monotonic()
+
+    async def at_offset(trace: dict) -> Sample:
+        delay = start + (trace["recorded_at"] - first) * arrival_scale - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            return await replay_trace(trace, latency_scale, include_classify)
+        except Exception:
+            return Sample(label=(trace.get("intent") or {}).get("intent", "unknown"), scheduled=time.monotonic(), status="error")
+
+    return list(await asyncio.gather(*(at_offset(trace) for trace in traces)))
+
+
+def read_traces(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _span_seconds(traces: list[dict], arrival_scale: float) -> float:
+    if len(traces) < 2:
+        return 1.0
+    stamps = [trace["recorded_at"] for trace in traces]
+    return max((max(stamps) - min(stamps)) * arrival_scale, 1e-3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subcommands.add_parser("export", help="write recorded traces from Redis as JSON lines")
+    export_parser.add_argument("--output", required=True)
+    export_parser.add_argument("--limit", type=int, help="newest N traces only")
+
+    run_parser = subcommands.add_parser("run", help="replay a trace file and write a report")
+    run_parser.add_argument("traces")
+    run_parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latencies")
+    run_parser.add_argument("--arrival-scale", type=float, default=1.0, help="multiplier for inter-arrival gaps")
+    run_parser.add_argument("--skip-classify", action="store_true", help="do not replay classification time")
+    run_parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        traces = tracing.load_traces(args.limit)
+        with open(args.output, "w") as f:
+            for trace in traces:
+                f.write(json.dumps(trace) + "\n")
+        print(f"Wrote {len(traces)} traces to {args.output}", file=sys.stderr)
+    elif args.command == "run":
+        traces = read_traces(args.traces)
+        samples = asyncio.run(replay(
+            traces,
+            latency_scale=args.latency_scale,
+            arrival_scale=args.arrival_scale,
+            include_classify=not args.skip_classify,
+        ))
+        config = {"traces": args.traces, "latency_scale": args.latency_scale, "arrival_scale": args.arrival_scale}
+        report = summarize(samples, _span_seconds(traces, args.arrival_scale), config)
+        _print_report(report)
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, indent=2))
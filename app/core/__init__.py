@@ -1,3 +1,3 @@
 """Core utilities: configuration and logging."""
 
-__all__ = ["config", "logging"]
+__all__ = ["config", "logging", "redis", "metrics", "loop", "profiling"]
@@ -12,6 +12,125 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str | None = None
     GOOGLE_CLIENT_SECRET: str | None = None
 
+    # Connection pool size per process (0 = NullPool, a fresh connection per
+    # session). Each orchestration holds one connection per concurrent branch.
+    DB_POOL_SIZE: int = 0
+    DB_MAX_OVERFLOW: int = 10
+
+    # Hash-partition the per-user cache tables by user_id into this many
+    # partitions (0 keeps single heap tables). Existing databases are moved
+    # over with `python -m app.db.partitioning migrate`.
+    DB_PARTITION_COUNT: int = 0
+
+    # Write-behind conversation log (see app/services/conversation_log.py)
+    CONVERSATION_BUFFER_MAX_PENDING: int = 100_000
+    CONVERSATION_FLUSH_BATCH_SIZE: int = 500
+    CONVERSATION_FLUSH_INTERVAL_SECONDS: float = 2.0
+    # A batch none of whose rows insert is dead-lettered after this many flushes
+    CONVERSATION_FLUSH_MAX_ATTEMPTS: int = 5
+
+    # Conversation state for follow-up queries (see app/services/conversation_state.py)
+    CONVERSATION_STATE_TTL_SECONDS: int = 1800
+    CONVERSATION_STEP_MAX_AGE_SECONDS: int = 300
+
+    # Per-user fair share: tasks beyond this many in flight per queue are
+    # deferred by ~FAIR_SHARE_DEFER_SECONDS, at most FAIR_SHARE_MAX_DEFERRALS times.
+    # A slot's lease expires after FAIR_SHARE_SLOT_TTL_SECONDS if never released
+    # (keep it above the longest task).
+    FAIR_SHARE_MAX_INFLIGHT_PER_USER: int = 4
+    FAIR_SHARE_DEFER_SECONDS: float = 0.5
+    FAIR_SHARE_MAX_DEFERRALS: int = 20
+    FAIR_SHARE_SLOT_TTL_SECONDS: int = 300
+
+    # Admission control on POST /query (see app/services/admission.py).
+    # ADMISSION_WORKER_CAPACITY should match the interactive worker concurrency.
+    ADMISSION_MAX_QUEUE_DEPTH: int = 200
+    ADMISSION_WORKER_CAPACITY: int = 8
+    ADMISSION_TASK_SECONDS_ESTIMATE: float = 1.0
+    RATE_LIMIT_PER_SECOND: float = 5.0
+    RATE_LIMIT_BURST: int = 20
+
+    # Identical queries from one user within this window share one task (0 disables)
+    SINGLEFLIGHT_WINDOW_SECONDS: int = 10
+
+    # Where orchestrations run: "celery" (Redis broker, worker processes) or
+    # "local" (in-process asyncio queue in the API, see app/services/task_queue.py)
+    TASK_BACKEND: str = "celery"
+    LOCAL_TASK_WORKERS: int = 4
+    LOCAL_TASK_KEEP_RESULTS: int = 1000
+    LOCAL_TASK_DRAIN_SECONDS: float = 30.0
+
+    # Concurrent vector searches within this window run as one statement, up
+    # to VECTOR_BATCH_MAX_SIZE per batch (see app/embeddings/batching.py); 0 disables.
+    # Only worth enabling where a loop runs several orchestrations at once
+    # (TASK_BACKEND=local or gevent/eventlet pools), e.g. 2.0
+    VECTOR_BATCH_WINDOW_MS: float = 0.0
+    VECTOR_BATCH_MAX_SIZE: int = 32
+
+    # Filtered vector search (see app/embeddings/filtered.py): users owning at
+    # most VECTOR_EXACT_SCAN_MAX_ROWS rows in a table are searched exactly, larger
+    # corpora through HNSW iterative scans ("off" before pgvector 0.8) starting
+    # from max(VECTOR_ANN_EF_SEARCH, k * VECTOR_ANN_CANDIDATE_FACTOR) candidates
+    VECTOR_EXACT_SCAN_MAX_ROWS: int = 5000
+    VECTOR_CORPUS_SIZE_TTL_SECONDS: int = 600
+    VECTOR_ANN_EF_SEARCH: int = 40
+    VECTOR_ANN_CANDIDATE_FACTOR: int = 4
+    VECTOR_ANN_ITERATIVE_SCAN: str = "strict_order"
+    VECTOR_ANN_MAX_SCAN_TUPLES: int = 20_000
+    # Share of index searches re-run exactly to measure recall@k
+    VECTOR_RECALL_SAMPLE_RATE: float = 0.01
+
+    # Slow-query log (see app/db/slow_queries.py); 0 disables it. A sample of
+    # slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS), at most once per
+    # statement fingerprint per interval.
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = 600
+    SLOW_QUERY_TTL_SECONDS: int = 7 * 86400
+
+    # Opt-in request profiling (X-Profile header / ?profile=true on POST /query)
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_TTL_SECONDS: int = 86400
+
+    # Share of orchestrations recorded as replayable traces (see
+    # app/orchestrator/tracing.py); the newest TRACE_MAX_STORED are kept
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_MAX_STORED: int = 10_000
+
+    # Slim task results and full step details expire after this long
+    RESULT_EXPIRES_SECONDS: int = 3600
+
+    # Run likely read-only steps on a partial rule match while the router or
+    # LLM tier classifies (see app/orchestrator/speculation.py)
+    SPECULATION_ENABLED: bool = True
+    SPECULATION_MIN_CONFIDENCE: float = 0.5
+
+    # Intent rules for the classifier fast path (default: app/llm/intent_rules.json)
+    INTENT_RULES_PATH: str | None = None
+
+    # Embedding centroid router (default centroids: app/llm/intent_centroids.npz,
+    # built with `python -m app.llm.router build`); ambiguous queries go to the LLM
+    INTENT_CENTROIDS_PATH: str | None = None
+    ROUTER_MIN_SIMILARITY: float = 0.6
+    ROUTER_MIN_MARGIN: float = 0.1
+
+    # OpenAI-compatible chat completions (see app/llm/client.py). The LLM tiers
+    # stay mocked unless LLM_ENABLED; point LLM_BASE_URL at app/llm/mock_server.py
+    # for offline load tests.
+    LLM_ENABLED: bool = False
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+    LLM_CLASSIFIER_MODEL: str = "gpt-4o-mini"
+    LLM_SYNTHESIZER_MODEL: str = "gpt-4o-mini"
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 8
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_SECONDS: float = 0.25
+    LLM_BACKOFF_CAP_SECONDS: float = 8.0
+    # Retries are capped at ~this share of requests, plus a small reserve
+    LLM_RETRY_BUDGET_RATIO: float = 0.1
+    LLM_RETRY_BUDGET_RESERVE: float = 10.0
+
     class Config:
         env_file = ".env"
         extra = "ignore"
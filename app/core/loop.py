@@ -0,0 +1,28 @@
+"""Persistent event loop for synchronous callers such as Celery tasks.
+
+`asyncio.run` creates and closes a loop per call, which throws away every
+loop-bound resource with it: the LLM client's httpx pool, pooled database
+connections. `run_async` keeps one loop per thread instead, so those pools
+survive from one task to the next.
+"""
+import asyncio
+import threading
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """This thread's persistent loop, created on first use."""
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Run a coroutine to completion on this thread's persistent loop."""
+    return get_loop().run_until_complete(coro)
@@ -0,0 +1,120 @@
+"""Process-independent metrics exported in Prometheus text format.
+
+API and worker processes both record into Redis hashes, so one scrape of
+`GET /api/v1/metrics` on any API instance sees the whole deployment.
+Recording never raises into the caller; a Redis outage only loses samples.
+
+Series are stored under their rendered Prometheus name, e.g.
+`orchestrator_tasks_total{queue="interactive"}`. Gauges that are cheaper to
+compute at scrape time (queue depths) are provided by registered collectors.
+"""
+import logging
+from typing import Callable, Iterable
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "metrics:counters"
+GAUGES_KEY = "metrics:gauges"
+HISTOGRAMS_KEY = "metrics:histograms"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (name, labels, value) samples computed at scrape time
+Collector = Callable[[], Iterable[tuple[str, dict, float]]]
+
+
+def series(name: str, labels: dict | None = None) -> str:
+    """Render a series name with sorted labels."""
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{labels[key]}"' for key in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def _base_name(series_name: str) -> str:
+    return series_name.split("{", 1)[0]
+
+
+class Metrics:
+    """Redis-backed counters, gauges and histograms."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._collectors: dict[str, Collector] = {}
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increment a counter."""
+        try:
+            self.redis.hincrbyfloat(COUNTERS_KEY, series(name, labels), value)
+        except Exception:
+            logger.debug("Dropping metric %s", name, exc_info=True)
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge to an absolute value."""
+        try:
+            self.redis.hset(GAUGES_KEY, series(name, labels), value)
+        except Exception:
+            logger.debug("Dropping metric %s", name, exc_info=True)
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels) -> None:
+        """Record one observation in a cumulative histogram."""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for bound in (*buckets, "+Inf"):
+                if bound == "+Inf" or value <= bound:
+                    pipe.hincrbyfloat(
+                        HISTOGRAMS_KEY, series(f"{name}_bucket", {**labels, "le": bound}), 1
+                    )
+            pipe.hincrbyfloat(HISTOGRAMS_KEY, series(f"{name}_sum", labels), value)
+            pipe.hincrbyfloat(HISTOGRAMS_KEY, series(f"{name}_count", labels), 1)
+            pipe.execute()
+        except Exception:
+            logger.debug("Dropping metric %s", name, exc_info=True)
+
+    def register_collector(self, name: str, collector: Collector) -> None:
+        """Register a scrape-time gauge source (idempotent by name)."""
+        self._collectors[name] = collector
+
+    def render(self) -> str:
+        """Render every recorded and collected series in Prometheus text format."""
+        lines: list[str] = []
+
+        def emit(kind: str, samples: dict[str, float], strip: tuple[str, ...] = ()) -> None:
+            declared = set()
+            for name in sorted(samples):
+                base = _base_name(name)
+                for suffix in strip:
+                    base = base.removesuffix(suffix)
+                if base not in declared:
+                    declared.add(base)
+                    lines.append(f"# TYPE {base} {kind}")
+                lines.append(f"{name} {samples[name]:g}")
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(COUNTERS_KEY)
+        pipe.hgetall(GAUGES_KEY)
+        pipe.hgetall(HISTOGRAMS_KEY)
+        counters, gauges, histograms = (
+            {key.decode(): float(value) for key, value in raw.items()} for raw in pipe.execute()
+        )
+
+        for collector_name, collector in self._collectors.items():
+            try:
+                for name, labels, value in collector():
+                    gauges[series(name, labels)] = value
+            except Exception:
+                logger.warning("Metrics collector %s failed", collector_name, exc_info=True)
+
+        emit("counter", counters)
+        emit("gauge", gauges)
+        emit("histogram", histograms, strip=("_bucket", "_sum", "_count"))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
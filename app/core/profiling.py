@@ -0,0 +1,222 @@
+"""Opt-in per-request profiling.
+
+`capture(profile_id)` around an orchestration records:
+
+- wall time per pipeline stage (`stage("classify")`, one per plan step, ...)
+- wall time per SQL statement, aggregated by statement text
+- a sampling profile of the thread running the event loop: its stack is
+  sampled every PROFILE_SAMPLE_INTERVAL_MS and counted as collapsed stacks
+
+The finished profile is stored in Redis for PROFILE_TTL_SECONDS and served by
+`GET /api/v1/debug/profiles/{task_id}`.
+
+When no capture is active, `stage` costs one context variable lookup and no
+SQL event listeners are installed.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar["Profile | None"] = ContextVar("profile", default=None)
+_NOOP = nullcontext()
+
+
+class Profile:
+    """Timings and stack samples collected for one request."""
+
+    def __init__(self, profile_id: str):
+        self.id = profile_id
+        self.started_at = time.time()
+        self.wall_seconds = 0.0
+        self.stages: dict[str, float] = {}
+        self.sql: dict[str, dict] = {}
+        self.samples: dict[str, int] = {}
+        self.sample_count = 0
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_sql(self, statement: str, seconds: float) -> None:
+        entry = self.sql.setdefault(statement, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        entry["calls"] += 1
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def to_dict(self, top_stacks: int = 50) -> dict:
+        sql = sorted(self.sql.items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+        stacks = sorted(self.samples.items(), key=lambda item: item[1], reverse=True)[:top_stacks]
+        return {
+            "id": self.id,
+            "started_at": self.started_at,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "sql": [{"statement": statement, **entry} for statement, entry in sql],
+            "sample_interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+            "sample_count": self.sample_count,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in stacks],
+        }
+
+
+@contextmanager
+def _timed_stage(profile: Profile, name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_stage(name, time.perf_counter() - started)
+
+
+def stage(name: str):
+    """Time a block as a named stage of the active profile, if any."""
+    profile = _current.get()
+    if profile is None:
+        return _NOOP
+    return _timed_stage(profile, name)
+
+
+# ---------------------------------------------------------------------------
+# SQL timing (listeners installed only while a capture is active)
+# ---------------------------------------------------------------------------
+
+_sql_lock = threading.Lock()
+_sql_captures = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = conn.info.get("profile_started")
+    if profile is not None and started:
+        profile.add_sql(" ".join(statement.split())[:1000], time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches _after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    started = conn.info.get("profile_started") if conn is not None else None
+    if started:
+        started.pop()
+
+
+def _sql_engine():
+    # Imported lazily: the session module creates the engine on import
+    from app.db.session import engine
+
+    return engine.sync_engine
+
+
+def _listen_sql() -> None:
+    global _sql_captures
+    with _sql_lock:
+        _sql_captures += 1
+        if _sql_captures == 1:
+            event.listen(_sql_engine(), "before_cursor_execute", _before_cursor_execute)
+            event.listen(_sql_engine(), "after_cursor_execute", _after_cursor_execute)
+            event.listen(_sql_engine(), "handle_error", _handle_error)
+
+
+def _unlisten_sql() -> None:
+    global _sql_captures
+    with _sql_lock:
+        _sql_captures -= 1
+        if _sql_captures == 0:
+            event.remove(_sql_engine(), "before_cursor_execute", _before_cursor_execute)
+            event.remove(_sql_engine(), "after_cursor_execute", _after_cursor_execute)
+            event.remove(_sql_engine(), "handle_error", _handle_error)
+
+
+# ---------------------------------------------------------------------------
+# Stack sampling
+# ---------------------------------------------------------------------------
+
+class _Sampler(threading.Thread):
+    """Sample one thread's stack at a fixed interval into a Profile."""
+
+    def __init__(self, profile: Profile, thread_id: int, interval: float):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.thread_id = thread_id
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.profile.samples[key] = self.profile.samples.get(key, 0) + 1
+            self.profile.sample_count += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+@contextmanager
+def capture(profile_id: str | None) -> Iterator[Profile | None]:
+    """Profile the enclosed block and store the result under `profile_id`.
+
+    A no-op when `profile_id` is None. Samples cover the whole thread, so
+    other requests sharing the event loop can show up in the stacks.
+    """
+    if profile_id is None:
+        yield None
+        return
+
+    profile = Profile(profile_id)
+    token = _current.set(profile)
+    sampler = _Sampler(profile, threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    _listen_sql()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.wall_seconds = time.perf_counter() - started
+        sampler.stop()
+        _unlisten_sql()
+        _current.reset(token)
+        store_profile(profile)
+
+
+def _profile_key(profile_id: str) -> str:
+    return f"profile:{profile_id}"
+
+
+def store_profile(profile: Profile) -> None:
+    try:
+        get_redis().setex(_profile_key(profile.id), settings.PROFILE_TTL_SECONDS, json.dumps(profile.to_dict()))
+    except Exception:
+        logger.warning("Could not store profile %s", profile.id, exc_info=True)
+
+
+def load_profile(profile_id: str) -> dict | None:
+    """Stored profile, or None when missing, expired or unavailable."""
+    try:
+        raw = get_redis().get(_profile_key(profile_id))
+    except Exception:
+        logger.warning("Could not load profile %s", profile_id, exc_info=True)
+        return None
+    return json.loads(raw) if raw else None
@@ -0,0 +1,16 @@
+"""Shared Redis client.
+
+redis-py clients are thread-safe and keep their own connection pool, so one
+client per process is shared instead of opening a pool per caller.
+"""
+from functools import lru_cache
+
+import redis
+
+from app.core.config import settings
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client."""
+    return redis.from_url(settings.REDIS_URL)
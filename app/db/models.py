@@ -1,13 +1,26 @@
 from __future__ import annotations
 
 import uuid
-from sqlalchemy import Column, String, Text, ForeignKey, UniqueConstraint, func
+from sqlalchemy import Column, String, Text, ForeignKey, UniqueConstraint, Index, func
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB, TIMESTAMP
 from pgvector.sqlalchemy import Vector
 
+from app.core.config import settings
 from app.db.session import Base
 
 
+# Partitioned tables need the partition key in every unique constraint,
+# so user_id joins the primary key of the cache tables when enabled.
+PARTITIONED = settings.DB_PARTITION_COUNT > 0
+
+
+def _cache_table_args(*args) -> tuple:
+    """Table args for per-user cache tables, hash partitioned by user_id when enabled."""
+    if PARTITIONED:
+        return (*args, {"postgresql_partition_by": "HASH (user_id)"})
+    return args
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -31,42 +44,65 @@ class Conversation(Base):
 
 class GmailCache(Base):
     __tablename__ = "gmail_cache"
-    __table_args__ = (
+    __table_args__ = _cache_table_args(
         UniqueConstraint("user_id", "email_id", name="uq_gmail_user_email"),
+        Index("ix_gmail_user_booking_ref", "user_id", "booking_reference"),
+        Index("ix_gmail_user_counterparty", "user_id", "counterparty"),
+        Index("ix_gmail_user_received", "user_id", "received_at"),
     )
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, primary_key=PARTITIONED)
     email_id = Column(String(255), nullable=False)
     subject = Column(Text, nullable=True)
     body_preview = Column(Text, nullable=True)
     embedding = Column(Vector(384), nullable=True)
     received_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Populated at ingestion by app.ingestion.extraction
+    booking_reference = Column(String(32), nullable=True)
+    counterparty = Column(String(320), nullable=True)
+    mentioned_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
 
 class GCalCache(Base):
     __tablename__ = "gcal_cache"
-    __table_args__ = (
+    __table_args__ = _cache_table_args(
         UniqueConstraint("user_id", "event_id", name="uq_gcal_user_event"),
+        Index("ix_gcal_user_booking_ref", "user_id", "booking_reference"),
+        Index("ix_gcal_user_counterparty", "user_id", "counterparty"),
+        Index("ix_gcal_user_start", "user_id", "start_time"),
+        # pg_trgm indexes serve ILIKE '%term%' on free text
+        Index(
+            "ix_gcal_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_gcal_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+        ),
     )
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, primary_key=PARTITIONED)
     event_id = Column(String(255), nullable=False)
     title = Column(Text, nullable=True)
     description = Column(Text, nullable=True)
     embedding = Column(Vector(384), nullable=True)
     start_time = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Populated at ingestion by app.ingestion.extraction
+    booking_reference = Column(String(32), nullable=True)
+    counterparty = Column(String(320), nullable=True)
 
 
 class GDriveCache(Base):
     __tablename__ = "gdrive_cache"
-    __table_args__ = (
+    __table_args__ = _cache_table_args(
         UniqueConstraint("user_id", "file_id", name="uq_gdrive_user_file"),
+        Index("ix_gdrive_user_updated", "user_id", "updated_at"),
     )
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, primary_key=PARTITIONED)
     file_id = Column(String(255), nullable=False)
     name = Column(Text, nullable=True)
     content_preview = Column(Text, nullable=True)
@@ -0,0 +1,300 @@
+"""Hash partitioning of the per-user cache tables.
+
+With `DB_PARTITION_COUNT > 0` the Gmail, Calendar and Drive cache tables are
+created as `PARTITION BY HASH (user_id)` parents with one partition per
+remainder (`gmail_cache_p0` ... `gmail_cache_pN`). Every agent query filters
+on `user_id`, so the planner prunes to a single partition and scans, vacuum
+and ANN index builds scale with one partition instead of the global table.
+
+ANN indexes are created per partition (or per table when unpartitioned)
+with the L2 operator class matching the `<->` ordering used by the agents.
+
+Existing single-table layouts are migrated online with:
+
+    DB_PARTITION_COUNT=16 python -m app.db.partitioning migrate [--batch-size N] [--drop-legacy]
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import MetaData, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.session import Base, engine
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("gmail_cache", "gcal_cache", "gdrive_cache")
+
+# Suffix for the new table (and its constraint/index names) while a migration runs
+BUILD_SUFFIX = "_partitioned"
+LEGACY_SUFFIX = "_legacy"
+
+
+def partition_names(table_name: str, count: int | None = None) -> list[str]:
+    count = settings.DB_PARTITION_COUNT if count is None else count
+    return [f"{table_name}_p{remainder}" for remainder in range(count)]
+
+
+async def is_partitioned(conn: AsyncConnection, table_name: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name AND c.relnamespace = 'public'::regnamespace"
+        ),
+        {"name": table_name},
+    )
+    return result.first() is not None
+
+
+async def ensure_partitions(conn: AsyncConnection) -> None:
+    """Create missing hash partitions for every partitioned cache table.
+
+    Tables that still use the single-table layout are left alone (with a
+    warning) until they are moved over by the migration tool.
+    """
+    if settings.DB_PARTITION_COUNT <= 0:
+        return
+
+    for table_name in PARTITIONED_TABLES:
+        if not await is_partitioned(conn, table_name):
+            logger.warning(
+                "%s is not partitioned; run `python -m app.db.partitioning migrate`", table_name
+            )
+            continue
+        await _create_partitions(conn, table_name, table_name)
+
+
+async def ensure_ann_indexes(conn: AsyncConnection) -> None:
+    """Create the embedding ANN index on each partition, or on each plain table."""
+    for table_name in PARTITIONED_TABLES:
+        if await is_partitioned(conn, table_name):
+            targets = partition_names(table_name)
+        else:
+            targets = [table_name]
+        for target in targets:
+            await conn.execute(text(_ann_index_ddl(target)))
+
+
+def _ann_index_ddl(target: str) -> str:
+    return (
+        f"CREATE INDEX IF NOT EXISTS ix_{target}_embedding ON {target} "
+        "USING hnsw (embedding vector_l2_ops)"
+    )
+
+
+async def _create_partitions(conn: AsyncConnection, parent: str, base_name: str) -> None:
+    count = settings.DB_PARTITION_COUNT
+    for remainder, partition in enumerate(partition_names(base_name, count)):
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {parent} "
+            f"FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})"
+        ))
+
+
+# ---------------------------------------------------------------------------
+# Online migration from the single-table layout
+# ---------------------------------------------------------------------------
+
+def _build_table(table: Table) -> Table:
+    """Copy a model table under the build name, with suffixed constraint/index names."""
+    metadata = MetaData()
+    # Referenced tables must be present for FK DDL to compile
+    Base.metadata.tables["users"].to_metadata(metadata)
+    build = table.to_metadata(metadata, name=f"{table.name}{BUILD_SUFFIX}")
+    for constraint in build.constraints:
+        if constraint.name:
+            constraint.name = f"{constraint.name}{BUILD_SUFFIX}"
+    for index in build.indexes:
+        index.name = f"{index.name}{BUILD_SUFFIX}"
+    return build
+
+
+def _renamed_objects(table: Table) -> list[str]:
+    """Index-backed names that move between the legacy and new tables on swap."""
+    names = [f"{table.name}_pkey", f"ix_{table.name}_embedding"]
+    names += [constraint.name for constraint in table.constraints if constraint.name]
+    names += [index.name for index in table.indexes]
+    return names
+
+
+def _tombstones_name(table: Table) -> str:
+    return f"{table.name}_tombstones"
+
+
+async def _install_mirror_trigger(conn: AsyncConnection, table: Table, build_name: str) -> None:
+    """Mirror writes on the live table into the new one while the backfill runs.
+
+    Updated and deleted keys are also recorded as tombstones: a backfill batch
+    may have read the old row before the write and copy it afterwards, when
+    the trigger's delete has already run (see `_apply_tombstones`).
+    """
+    columns = [column.name for column in table.columns]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{name}" for name in columns)
+    tombstones = _tombstones_name(table)
+    await conn.execute(text(
+        f"CREATE UNLOGGED TABLE IF NOT EXISTS {tombstones} AS "
+        f"SELECT id, user_id FROM {table.name} WITH NO DATA"
+    ))
+    await conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {table.name}_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {build_name} WHERE id = OLD.id AND user_id = OLD.user_id;
+                INSERT INTO {tombstones} (id, user_id) VALUES (OLD.id, OLD.user_id);
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            INSERT INTO {build_name} ({column_list}) VALUES ({new_values})
+            ON CONFLICT DO NOTHING;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    await conn.execute(text(f"DROP TRIGGER IF EXISTS {table.name}_mirror ON {table.name}"))
+    await conn.execute(text(
+        f"CREATE TRIGGER {table.name}_mirror AFTER INSERT OR UPDATE OR DELETE ON {table.name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table.name}_mirror()"
+    ))
+
+
+async def _backfill(table: Table, build_name: str, batch_size: int) -> int:
+    """Copy existing rows in primary-key order, one short transaction per batch."""
+    column_list = ", ".join(column.name for column in table.columns)
+    copied = 0
+    last_id = None
+    while True:
+        after = "" if last_id is None else "WHERE id > :last_id"
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text(f"""
+                    WITH batch AS (
+                        SELECT {column_list} FROM {table.name}
+                        {after}
+                        ORDER BY id
+                        LIMIT :batch_size
+                    ),
+                    copied AS (
+                        INSERT INTO {build_name} ({column_list})
+                        SELECT {column_list} FROM batch
+                        ON CONFLICT DO NOTHING
+                    )
+                    SELECT
+                        (SELECT count(*) FROM batch) AS batch_rows,
+                        (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id
+                """),
+                {"last_id": last_id, "batch_size": batch_size},
+            )
+            row = result.one()
+        if not row.batch_rows:
+            return copied
+        copied += row.batch_rows
+        last_id = row.last_id
+
+
+async def _apply_tombstones(conn: AsyncConnection, table: Table, build_name: str) -> int:
+    """Delete copied rows whose key was updated away or deleted on the live table.
+
+    Run with writers locked out: rows resurrected by a backfill that raced a
+    write are removed, unless the key exists again on the live table.
+    """
+    tombstones = _tombstones_name(table)
+    result = await conn.execute(text(f"""
+        DELETE FROM {build_name} b
+        USING (SELECT DISTINCT id, user_id FROM {tombstones}) t
+        WHERE b.id = t.id AND b.user_id = t.user_id
+          AND NOT EXISTS (
+              SELECT 1 FROM {table.name} live
+              WHERE live.id = t.id AND live.user_id = t.user_id
+          )
+    """))
+    return result.rowcount
+
+
+async def _swap(table: Table, build_name: str) -> None:
+    """Atomically replace the live table with the partitioned one."""
+    legacy_name = f"{table.name}{LEGACY_SUFFIX}"
+    async with engine.begin() as conn:
+        await conn.execute(text(f"LOCK TABLE {table.name} IN ACCESS EXCLUSIVE MODE"))
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {table.name}_mirror ON {table.name}"))
+        await conn.execute(text(f"DROP FUNCTION IF EXISTS {table.name}_mirror()"))
+        removed = await _apply_tombstones(conn, table, build_name)
+        if removed:
+            logger.info("%s: removed %d rows deleted during the backfill", table.name, removed)
+        await conn.execute(text(f"DROP TABLE IF EXISTS {_tombstones_name(table)}"))
+
+        await conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy_name}"))
+        await conn.execute(text(f"ALTER TABLE {build_name} RENAME TO {table.name}"))
+
+        # Renaming a constraint's index renames the constraint too
+        for name in _renamed_objects(table):
+            await conn.execute(text(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}{LEGACY_SUFFIX}"))
+        await conn.execute(text(
+            f"ALTER INDEX IF EXISTS {build_name}_pkey RENAME TO {table.name}_pkey"
+        ))
+        for name in _renamed_objects(table):
+            await conn.execute(text(f"ALTER INDEX IF EXISTS {name}{BUILD_SUFFIX} RENAME TO {name}"))
+
+
+async def migrate_table(table: Table, batch_size: int = 5000, drop_legacy: bool = False) -> None:
+    """Move one cache table to the partitioned layout without blocking writers.
+
+    1. Create the partitioned copy and its partitions
+    2. Mirror live writes into it with a trigger, recording tombstones
+    3. Backfill existing rows in small batches
+    4. Build per-partition ANN indexes
+    5. In one short ACCESS EXCLUSIVE transaction, drop rows the backfill
+       copied after they were deleted, then swap names
+    """
+    build = _build_table(table)
+
+    async with engine.begin() as conn:
+        if await is_partitioned(conn, table.name):
+            logger.info("%s is already partitioned", table.name)
+            return
+        await conn.run_sync(build.create, checkfirst=True)
+        await _create_partitions(conn, build.name, table.name)
+        await _install_mirror_trigger(conn, table, build.name)
+
+    copied = await _backfill(table, build.name, batch_size)
+    logger.info("%s: backfilled %d rows", table.name, copied)
+
+    async with engine.begin() as conn:
+        for partition in partition_names(table.name):
+            await conn.execute(text(_ann_index_ddl(partition)))
+
+    await _swap(table, build.name)
+    logger.info("%s: now partitioned into %d partitions", table.name, settings.DB_PARTITION_COUNT)
+
+    if drop_legacy:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {table.name}{LEGACY_SUFFIX}"))
+
+
+async def migrate(batch_size: int = 5000, drop_legacy: bool = False) -> None:
+    """Migrate every cache table to the partitioned layout."""
+    if settings.DB_PARTITION_COUNT <= 0:
+        raise RuntimeError("Set DB_PARTITION_COUNT > 0 before migrating")
+
+    from app.db import models  # noqa: F401  (registers tables on Base.metadata)
+
+    for table_name in PARTITIONED_TABLES:
+        await migrate_table(Base.metadata.tables[table_name], batch_size, drop_legacy)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="move cache tables to hash partitions")
+    migrate_parser.add_argument("--batch-size", type=int, default=5000)
+    migrate_parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        asyncio.run(migrate(batch_size=args.batch_size, drop_legacy=args.drop_legacy))
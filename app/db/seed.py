@@ -14,6 +14,7 @@ from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.db.session import async_session
 from app.db.models import User, GmailCache, GCalCache, GDriveCache
 from app.embeddings.service import EmbeddingService
+from app.ingestion.extraction import extract_entities
 
 # Fixed demo user ID
 DEMO_USER_ID = uuid.UUID("550e8400-e29b-41d4-a716-446655440000")
@@ -68,13 +69,16 @@ async def seed_demo_data() -> None:
 
         for i, subject in enumerate(gmail_subjects):
             embedding = await embeddings_svc.embed(subject)
+            received_at = datetime.utcnow() - timedelta(days=max(0, i-5))
+            entities = extract_entities(subject, reference_time=received_at)
             gmail = GmailCache(
                 user_id=DEMO_USER_ID,
                 email_id=f"gmail_msg_{i}",
                 subject=subject,
                 body_preview=subject,
-                received_at=datetime.utcnow() - timedelta(days=max(0, i-5)),
+                received_at=received_at,
                 embedding=embedding,
+                **entities.as_columns(),
             )
             db.add(gmail)
 
@@ -88,7 +92,7 @@ async def seed_demo_data() -> None:
             {
                 "title": "Acme Corp Meeting",
                 "description": "Product launch planning with Acme",
-                "start_time": datetime.utcnow() + timedelta(days=3),
+                "start_time": datetime.utcnow() + timedelta(days=1),
             },
             {
                 "title": "Sarah - Budget Review",
@@ -104,6 +108,7 @@ async def seed_demo_data() -> None:
 
         for i, event in enumerate(gcal_events):
             event_embedding = await embeddings_svc.embed(event["title"])
+            entities = extract_entities(event["title"], event["description"])
             gcal = GCalCache(
                 user_id=DEMO_USER_ID,
                 event_id=f"gcal_event_{i}",
@@ -111,6 +116,7 @@ async def seed_demo_data() -> None:
                 description=event["description"],
                 start_time=event["start_time"],
                 embedding=event_embedding,
+                **entities.as_columns("booking_reference", "counterparty"),
             )
             db.add(gcal)
 
@@ -139,6 +145,7 @@ async def seed_demo_data() -> None:
                 file_id=str(uuid.uuid4()),
                 name=file["name"],
                 content_preview=file["content_preview"],
+                updated_at=datetime.utcnow() - timedelta(days=7 * (i + 1)),
                 embedding=await embeddings_svc.embed(file["name"] + " " + file["content_preview"]),
             )
             db.add(gdfile)
@@ -7,8 +7,11 @@ is an async URL, e.g.:
 
 Keep this module minimal and importable from application code and tests.
 """
-from typing import AsyncGenerator
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator
 
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncSession,
@@ -18,20 +21,34 @@ from sqlalchemy.orm import declarative_base
 from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
+from app.db.slow_queries import slow_query_log
 
 
+# Pooled connections are bound to the event loop that opened them. Celery
+# tasks share one loop per worker (app/core/loop.py), so a pool is safe there;
+# NullPool stays the default for scripts that start a new loop per call.
+if settings.DB_POOL_SIZE > 0:
+    _pool_options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+    }
+else:
+    _pool_options = {"poolclass": NullPool}
+
 # Create the async engine. `future=True` keeps compatibility with SQLAlchemy 2.0
 # style SQL and recommended usage in 1.4+.
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
-    poolclass=NullPool,
-    # pool_size=10,
-    # max_overflow=20,
-    # pool_pre_ping=True,
+    **_pool_options,
 )
 
 
+if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+    slow_query_log.install(engine.sync_engine)
+
+
 # async_session is an async_sessionmaker producing AsyncSession instances.
 # expire_on_commit=False is convenient for web backends to avoid lazy-loading
 # after commit; adjust if you prefer stricter session lifecycle.
@@ -41,6 +58,9 @@ async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_c
 # Declarative base for models. Put models in `app/db/models.py` and import Base.
 Base = declarative_base()
 
+# Extensions the models depend on: pgvector columns and pg_trgm text indexes.
+REQUIRED_EXTENSIONS = ("vector", "pg_trgm")
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """FastAPI dependency that yields an async DB session.
@@ -54,13 +74,85 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+class SessionScope:
+    """Sessions shared by all steps of one orchestration.
+
+    Steps that run one after another reuse the same session, and with it the
+    same connection. Steps that run concurrently each borrow their own, since
+    an AsyncSession must not be used by two tasks at once. The scope never
+    holds more sessions than the widest concurrent batch of the plan.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = async_session):
+        self._session_factory = session_factory
+        self._idle: list[AsyncSession] = []
+        self._sessions: list[AsyncSession] = []
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncSession]:
+        """Borrow an idle session, opening a new one only when all are in use."""
+        if self._idle:
+            session = self._idle.pop()
+        else:
+            session = self._session_factory()
+            self._sessions.append(session)
+
+        try:
+            yield session
+        except asyncio.CancelledError:
+            # Cancelled mid-step (a discarded speculative run): the session may
+            # be mid-statement, so it is not lent again; close() still releases it
+            raise
+        except Exception:
+            await session.rollback()
+            self._idle.append(session)
+            raise
+        self._idle.append(session)
+
+    async def close(self) -> None:
+        """Close every session and return their connections."""
+        for session in self._sessions:
+            await session.close()
+        self._idle.clear()
+        self._sessions.clear()
+
+
 async def init_db() -> None:
     """Create database tables for all models defined on Base.
 
     Call this during application startup or from a small management script.
     Uses run_sync to execute synchronous metadata.create_all on the sync
-    engine bound to the async connection.
+    engine bound to the async connection. With `DB_PARTITION_COUNT > 0` the
+    cache tables are created as hash-partitioned parents plus partitions.
     """
     async with engine.begin() as conn:
+        for extension in REQUIRED_EXTENSIONS:
+            await conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+
+        # Imported here: partitioning builds on this module's engine and Base
+        from app.db.partitioning import ensure_partitions, ensure_ann_indexes
+        await ensure_partitions(conn)
+        await ensure_ann_indexes(conn)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    """Add nullable columns and indexes introduced after a table was created.
+
+    `create_all` only creates missing tables, so additive model changes are
+    applied here to keep existing databases in step with the models.
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column_type}"
+            ))
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
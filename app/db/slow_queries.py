@@ -0,0 +1,253 @@
+"""Slow-query log for agent SQL.
+
+Engine cursor events time every statement. Those slower than
+SLOW_QUERY_THRESHOLD_MS are aggregated in Redis by fingerprint: the statement
+with literals and bind parameters replaced by `?`. Each fingerprint keeps its
+call count, total and max time, the parameter shapes (types and sizes, never
+values) and the latest statement text.
+
+A sample of slow reads (SELECT, or WITH ... SELECT without data-modifying
+clauses; SLOW_QUERY_EXPLAIN_SAMPLE_RATE, at most once per
+fingerprint per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS) is re-run under
+`EXPLAIN (ANALYZE, BUFFERS)` on the same connection, inside a savepoint. The
+latest plan is stored with a summary of the sequential scans and indexes it
+used, so plans that lose an index as data grows stand out. Other statements
+are never explained, because ANALYZE executes them.
+
+Top offenders are listed by `GET /api/v1/debug/slow-queries`.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "slow_queries:index"
+ORDERS = ("total_ms", "max_ms", "calls")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Named binds, but not `::type` casts
+_BIND_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):(?!:)\w+|\?")
+_LIST_OF_PLACEHOLDERS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_READ = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Also rejects SELECT ... FOR UPDATE, which would take row locks under ANALYZE
+_WRITE_KEYWORD = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    """Normalized statement and its short hash.
+
+    Literals and bind parameters become `?` and IN-lists collapse to `(?)`,
+    so calls differing only in values share a fingerprint.
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _BIND_PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _LIST_OF_PLACEHOLDERS.sub("(?)", normalized)
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _shape(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        if value.startswith("[") and value.endswith("]"):
+            return f"vector({value.count(',') + 1})"
+        return f"str({len(value)})"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters) -> list[str] | dict[str, str]:
+    """Types and sizes of bind parameters, without their values."""
+    if isinstance(parameters, dict):
+        return {key: _shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_shape(value) for value in parameters]
+    return []
+
+
+def summarize_plan(plan: dict) -> dict:
+    """Execution time plus the relations scanned sequentially and the indexes used."""
+    seq_scans, indexes = set(), set()
+
+    def walk(node: dict) -> None:
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.add(node.get("Relation Name"))
+        if node.get("Index Name"):
+            indexes.add(node["Index Name"])
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    walk(plan.get("Plan", {}))
+    return {
+        "execution_ms": plan.get("Execution Time"),
+        "seq_scans": sorted(filter(None, seq_scans)),
+        "indexes": sorted(indexes),
+    }
+
+
+# HSET max_ms only when the new duration is larger
+_MAX_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'max_ms') or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('HSET', KEYS[1], 'max_ms', ARGV[1])
+end
+"""
+
+
+def _key(digest: str) -> str:
+    return f"slow_queries:{digest}"
+
+
+class SlowQueryLog:
+    """Record statements slower than the threshold, aggregated by fingerprint."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def install(self, sync_engine) -> None:
+        """Time every statement on the engine (idempotent)."""
+        if not event.contains(sync_engine, "before_cursor_execute", self._before):
+            event.listen(sync_engine, "before_cursor_execute", self._before)
+            event.listen(sync_engine, "after_cursor_execute", self._after)
+            event.listen(sync_engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    def _error(self, exception_context):
+        # A failed statement never reaches _after; drop its start time
+        conn = exception_context.connection
+        started = conn.info.get("slow_query_started") if conn is not None else None
+        if started:
+            started.pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("slow_query_started")
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        if elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        normalized, digest = fingerprint(statement)
+        plan = None
+        if not executemany and self._should_explain(statement, digest):
+            plan = self._explain(conn, statement, parameters)
+        self.record(digest, normalized, statement, parameters, elapsed_ms, plan)
+
+    def _should_explain(self, statement: str, digest: str) -> bool:
+        if not _READ.match(statement) or _WRITE_KEYWORD.search(statement):
+            return False
+        if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            return False
+        try:
+            return bool(self.redis.set(
+                f"{_key(digest)}:explained", 1, nx=True, ex=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+            ))
+        except Exception:
+            return False
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> dict | None:
+        """EXPLAIN ANALYZE the statement in a savepoint so a failure cannot abort the caller's transaction."""
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+                row = cursor.fetchone()
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            plan = row[0]
+            return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+        except Exception:
+            logger.warning("EXPLAIN of slow query failed", exc_info=True)
+            return None
+        finally:
+            cursor.close()
+
+    def record(self, digest: str, normalized: str, statement: str, parameters, elapsed_ms: float, plan: dict | None = None) -> None:
+        key = _key(digest)
+        fields = {
+            "fingerprint": normalized,
+            "statement": statement,
+            "parameters": json.dumps(parameter_shapes(parameters)),
+            "last_seen": time.time(),
+        }
+        if plan is not None:
+            fields["plan"] = json.dumps(plan)
+            fields["plan_summary"] = json.dumps(summarize_plan(plan))
+            fields["plan_at"] = time.time()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping=fields)
+            pipe.hincrby(key, "calls", 1)
+            pipe.hincrbyfloat(key, "total_ms", elapsed_ms)
+            pipe.expire(key, settings.SLOW_QUERY_TTL_SECONDS)
+            pipe.eval(_MAX_SCRIPT, 1, key, elapsed_ms)
+            pipe.zincrby(INDEX_KEY, elapsed_ms, digest)
+            pipe.execute()
+        except Exception:
+            logger.warning("Could not record slow query %s", digest, exc_info=True)
+
+    def top(self, limit: int = 20, order: str = "total_ms") -> list[dict]:
+        """Slowest fingerprints, ordered by total time, max time or call count."""
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}")
+        # The index is ordered by total time; other orders re-sort a wider window
+        window = limit if order == "total_ms" else max(limit * 5, 100)
+        digests = [d.decode() for d in self.redis.zrevrange(INDEX_KEY, 0, window - 1)]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for digest in digests:
+            pipe.hgetall(_key(digest))
+        entries = []
+        stale = []
+        for digest, raw in zip(digests, pipe.execute()):
+            if not raw:
+                stale.append(digest)
+                continue
+            data = {k.decode(): v.decode() for k, v in raw.items()}
+            entries.append({
+                "id": digest,
+                "fingerprint": data["fingerprint"],
+                "statement": data["statement"],
+                "parameters": json.loads(data["parameters"]),
+                "calls": int(data.get("calls", 0)),
+                "total_ms": round(float(data.get("total_ms", 0)), 3),
+                "max_ms": round(float(data.get("max_ms", 0)), 3),
+                "mean_ms": round(float(data.get("total_ms", 0)) / max(int(data.get("calls", 1)), 1), 3),
+                "last_seen": float(data["last_seen"]),
+                "plan_summary": json.loads(data["plan_summary"]) if "plan_summary" in data else None,
+                "plan": json.loads(data["plan"]) if "plan" in data else None,
+                "plan_at": float(data["plan_at"]) if "plan_at" in data else None,
+            })
+        if stale:
+            # Expired fingerprints
+            self.redis.zrem(INDEX_KEY, *stale)
+
+        entries.sort(key=lambda entry: entry[order], reverse=True)
+        return entries[:limit]
+
+
+slow_query_log = SlowQueryLog()
@@ -1,17 +1,16 @@
 -- Enable pgvector extension
 CREATE EXTENSION IF NOT EXISTS vector;
 
--- Create ivfflat indexes for embedding fields (cosine similarity)
--- lists parameter set to 100 (reasonable for up to 1M rows; adjust as data grows)
+-- ANN indexes for embedding fields. init_db creates these automatically
+-- (per partition when DB_PARTITION_COUNT > 0, see app/db/partitioning.py).
+-- The L2 operator class matches the `embedding <-> :query` ordering used by
+-- the agents; an index built with a different operator class is never used.
 
-CREATE INDEX IF NOT EXISTS idx_gmail_cache_embedding ON gmail_cache
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS ix_gmail_cache_embedding ON gmail_cache
+USING hnsw (embedding vector_l2_ops);
 
-CREATE INDEX IF NOT EXISTS idx_gcal_cache_embedding ON gcal_cache
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS ix_gcal_cache_embedding ON gcal_cache
+USING hnsw (embedding vector_l2_ops);
 
-CREATE INDEX IF NOT EXISTS idx_gdrive_cache_embedding ON gdrive_cache
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS ix_gdrive_cache_embedding ON gdrive_cache
+USING hnsw (embedding vector_l2_ops);
@@ -1,3 +1,3 @@
 """Embeddings package: provide a thin adapter for vector/embedding providers."""
 
-__all__ = ["service"]
+__all__ = ["batching", "filtered", "service"]
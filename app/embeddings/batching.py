@@ -0,0 +1,263 @@
+"""Cross-request batching of vector searches.
+
+A worker runs many orchestrations on one event loop, and each of them issues
+its own `ORDER BY embedding <-> :q LIMIT k` query. `VectorSearchBatcher`
+collects the searches of one shape (a `VectorQuery`) submitted within
+VECTOR_BATCH_WINDOW_MS and runs them as a single statement: a `LATERAL` join
+over a `VALUES` list holding each search's user, query vector, k and filter
+parameters. The rows are fanned back out to the callers by their position in
+that list. The nested loop passes each row's user_id into the lateral scan,
+so partitioned tables are still pruned to one partition per search (at
+execution time rather than at planning time).
+
+Batches run on their own session, outside any orchestration's SessionScope,
+since one batch serves several orchestrations. On that session the users of
+a batch are sorted into the exact and index strategies together
+(app/embeddings/filtered.py), and a batch runs one statement per strategy. A
+batch is flushed early once it holds VECTOR_BATCH_MAX_SIZE searches.
+
+Batching only pays off where one event loop runs several orchestrations at
+once (TASK_BACKEND=local, or gevent/eventlet Celery pools). A prefork Celery
+worker runs one at a time, so there the window is pure latency; the default
+VECTOR_BATCH_WINDOW_MS = 0 disables batching, and agents search through
+their step's session instead.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.session import async_session
+from app.embeddings.filtered import FilteredSearch, filtered_search, vector_order
+from app.embeddings.service import to_pgvector_literal
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass(frozen=True)
+class VectorQuery:
+    """One shape of nearest-neighbour search that can be batched.
+
+    `filters` are extra predicates over `t` (the searched table) and `q` (the
+    search's VALUES row); `parameters` name and type the per-search values
+    they read from `q`. A NULL parameter should disable its predicate.
+    """
+
+    name: str
+    table: str
+    columns: tuple[str, ...]
+    parameters: tuple[tuple[str, str], ...] = ()
+    filters: tuple[str, ...] = ()
+
+    def bind(self, user_id: UUID | str, embedding: list[float], k: int, **params) -> dict[str, Any]:
+        """Bind values of one search; missing parameters are NULL."""
+        unknown = set(params) - {name for name, _ in self.parameters}
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {sorted(unknown)}")
+        return {
+            "user_id": user_id,
+            "embedding": to_pgvector_literal(embedding),
+            "k": k,
+            **{name: params.get(name) for name, _ in self.parameters},
+        }
+
+    @staticmethod
+    def batch_params(searches: list[dict[str, Any]]) -> dict[str, Any]:
+        """Bind values of several searches, suffixed with their index."""
+        return {f"{name}_{i}": value for i, bound in enumerate(searches) for name, value in bound.items()}
+
+    def batch_sql(self, size: int, exact: bool = False) -> str:
+        """Statement running `size` searches; bind names are suffixed with the search's index.
+
+        With `exact`, the ordering cannot use the HNSW index, so each search
+        sorts all of the user's matching rows (see app/embeddings/filtered.py).
+        """
+        names = ("user_id", "embedding", "k", *(name for name, _ in self.parameters))
+        types = ("uuid", "vector", "integer", *(sql_type for _, sql_type in self.parameters))
+        rows = ",\n            ".join(
+            "(" + ", ".join([str(i)] + [f"CAST(:{name}_{i} AS {sql_type})" for name, sql_type in zip(names, types)]) + ")"
+            for i in range(size)
+        )
+        where = "".join(f"\n              AND {predicate}" for predicate in self.filters)
+        order = vector_order("t.embedding <-> q.embedding", exact)
+        return f"""
+        SELECT q.i AS batch_index, r.*
+        FROM (VALUES
+            {rows}
+        ) AS q(i, {", ".join(names)})
+        CROSS JOIN LATERAL (
+            SELECT {", ".join(f"t.{column}" for column in self.columns)},
+                   t.embedding <-> q.embedding AS distance
+            FROM {self.table} t
+            WHERE t.user_id = q.user_id{where}
+            ORDER BY {order}
+            LIMIT q.k
+        ) AS r
+        ORDER BY q.i, r.distance
+        """
+
+
+GMAIL_SEMANTIC = VectorQuery(
+    name="gmail_semantic",
+    table="gmail_cache",
+    columns=("id", "email_id", "subject", "body_preview", "received_at"),
+    parameters=(("received_after", "timestamptz"), ("received_before", "timestamptz")),
+    filters=(
+        "(q.received_after IS NULL OR t.received_at >= q.received_after)",
+        "(q.received_before IS NULL OR t.received_at < q.received_before)",
+    ),
+)
+
+DRIVE_KEYWORD = VectorQuery(
+    name="drive_keyword",
+    table="gdrive_cache",
+    columns=("id", "file_id", "name", "content_preview"),
+    parameters=(("keyword", "text"), ("updated_after", "timestamptz"), ("updated_before", "timestamptz")),
+    filters=(
+        "t.name ILIKE q.keyword",
+        "(q.updated_after IS NULL OR t.updated_at >= q.updated_after)",
+        "(q.updated_before IS NULL OR t.updated_at < q.updated_before)",
+    ),
+)
+
+QUERIES = {query.name: query for query in (GMAIL_SEMANTIC, DRIVE_KEYWORD)}
+
+
+@dataclass
+class _Search:
+    params: dict[str, Any]
+    future: asyncio.Future
+
+
+class VectorSearchBatcher:
+    """Coalesce concurrent searches of the same VectorQuery into one statement."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        window_ms: float | None = None,
+        max_size: int | None = None,
+        strategy: FilteredSearch | None = None,
+    ):
+        self.session_factory = session_factory
+        self.strategy = strategy or filtered_search
+        self.window = (settings.VECTOR_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_size = settings.VECTOR_BATCH_MAX_SIZE if max_size is None else max_size
+        self._pending: dict[VectorQuery, list[_Search]] = {}
+        self._timers: dict[VectorQuery, asyncio.TimerHandle] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    async def search(
+        self,
+        query: VectorQuery,
+        user_id: UUID | str,
+        embedding: list[float],
+        k: int,
+        **params,
+    ) -> list:
+        """Nearest rows for one search, run as part of the next batch.
+
+        Args:
+            query: Search shape
+            user_id: Owner of the rows searched
+            embedding: Query vector
+            k: Maximum rows returned
+            **params: Values for `query.parameters`; missing ones are NULL
+
+        Returns:
+            Rows ordered by distance: `query.columns` plus `distance` and `batch_index`
+        """
+        bound = query.bind(user_id, embedding, k, **params)
+
+        loop = asyncio.get_running_loop()
+        search = _Search(params=bound, future=loop.create_future())
+        pending = self._pending.setdefault(query, [])
+        pending.append(search)
+        if len(pending) >= self.max_size:
+            self._flush(query)
+        elif len(pending) == 1:
+            self._timers[query] = loop.call_later(self.window, self._flush, query)
+        return await search.future
+
+    def _flush(self, query: VectorQuery) -> None:
+        timer = self._timers.pop(query, None)
+        if timer is not None:
+            timer.cancel()
+        searches = self._pending.pop(query, [])
+        if searches:
+            task = asyncio.get_running_loop().create_task(self._run(query, searches))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, query: VectorQuery, searches: list[_Search]) -> None:
+        metrics.observe("orchestrator_vector_batch_size", len(searches), buckets=BATCH_SIZE_BUCKETS, query=query.name)
+        try:
+            async with self.session_factory() as db:
+                by_strategy: dict[bool, list[_Search]] = {True: [], False: []}
+                exact_users = await self.strategy.use_exact_many(
+                    db, query.table, [search.params["user_id"] for search in searches]
+                )
+                for search in searches:
+                    by_strategy[exact_users[search.params["user_id"]]].append(search)
+
+                exact_rows = await self._execute(db, query, by_strategy[True], exact=True)
+                ann_rows = []
+                if by_strategy[False]:
+                    k = max(search.params["k"] for search in by_strategy[False])
+                    async with self.strategy.ann_scan(db, k):
+                        ann_rows = await self._execute(db, query, by_strategy[False], exact=False)
+        except Exception as exc:
+            logger.warning("Batched %s search of %d failed", query.name, len(searches), exc_info=True)
+            for search in searches:
+                if not search.future.done():
+                    search.future.set_exception(exc)
+            return
+
+        for exact, rows in ((True, exact_rows), (False, ann_rows)):
+            group = by_strategy[exact]
+            by_search: list[list] = [[] for _ in group]
+            for row in rows:
+                by_search[row.batch_index].append(row)
+            for search, matches in zip(group, by_search):
+                if not exact:
+                    self.strategy.sample_recall(query, search.params, matches)
+                if not search.future.done():
+                    search.future.set_result(matches)
+
+    @staticmethod
+    async def _execute(db: AsyncSession, query: VectorQuery, searches: list[_Search], exact: bool) -> list:
+        """Run one statement for `searches`; rows carry their search's position as batch_index."""
+        if not searches:
+            return []
+        params = query.batch_params([search.params for search in searches])
+        result = await db.execute(text(query.batch_sql(len(searches), exact=exact)), params)
+        return result.fetchall()
+
+
+_batchers: dict[int, tuple[asyncio.AbstractEventLoop, VectorSearchBatcher]] = {}
+
+
+def get_vector_batcher() -> VectorSearchBatcher | None:
+    """Batcher for the running event loop, or None when batching is disabled.
+
+    Pending searches are futures of one loop, so each loop gets its own
+    batcher; with a persistent loop that is one per worker process.
+    """
+    if settings.VECTOR_BATCH_WINDOW_MS <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    entry = _batchers.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        # Drop batchers of closed loops
+        for key in [key for key, (other, _) in _batchers.items() if other.is_closed()]:
+            del _batchers[key]
+        entry = _batchers[id(loop)] = (loop, VectorSearchBatcher())
+    return entry[1]
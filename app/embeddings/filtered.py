@@ -0,0 +1,277 @@
+"""Filtered nearest-neighbour search over per-user rows.
+
+Every vector search filters on `user_id`, often with a keyword or time range
+on top. The HNSW index is global (per table or partition), so for a user
+owning a tiny share of its rows the index walk finds mostly other users'
+vectors: without help it returns fewer than k rows, or the planner falls
+back to a sequential scan of the whole table. Two strategies cover this:
+
+- exact: users owning at most VECTOR_EXACT_SCAN_MAX_ROWS rows are searched
+  by reading their rows through the user_id indexes and sorting by
+  distance. The ORDER BY is written so it cannot match the HNSW index.
+- ann: larger corpora use the index with pgvector's iterative scan
+  (VECTOR_ANN_ITERATIVE_SCAN, pgvector >= 0.8). The walk keeps widening past
+  filtered-out candidates until k rows qualify or VECTOR_ANN_MAX_SCAN_TUPLES
+  have been visited. Each step starts from ef_search = max(VECTOR_ANN_EF_SEARCH,
+  k * VECTOR_ANN_CANDIDATE_FACTOR) candidates. The settings are made inside
+  a savepoint that is rolled back after the search, so later statements of
+  a shared transaction run with the defaults.
+
+The per-user row count is a capped COUNT on the caller's session, cached in
+Redis for VECTOR_CORPUS_SIZE_TTL_SECONDS, so it never scans past the threshold.
+A batch of searches counts all of its uncached users in one statement.
+
+VECTOR_RECALL_SAMPLE_RATE of index searches are re-run exactly in the
+background. Their recall@k is recorded in the
+`orchestrator_vector_recall` histogram. An offline report over random rows
+is printed by:
+
+    python -m app.embeddings.filtered recall --query gmail_semantic --samples 200 --k 5
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Callable
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+from app.db.session import async_session
+
+if TYPE_CHECKING:
+    from app.embeddings.batching import VectorQuery
+
+logger = logging.getLogger(__name__)
+
+RECALL_BUCKETS = (0.5, 0.8, 0.9, 0.95, 0.99, 1.0)
+
+# Transaction-local; ann_scan scopes them further with a savepoint
+_EF_SEARCH_SQL = "SELECT set_config('hnsw.ef_search', :ef_search, true)"
+_ITERATIVE_SCAN_SQL = """
+    SELECT set_config('hnsw.iterative_scan', :mode, true),
+           set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)
+"""
+
+
+# Capped per-user row counts, in the order of :user_ids
+_CORPUS_SIZES_SQL = """
+    SELECT (SELECT count(*) FROM (SELECT 1 FROM {table} WHERE user_id = u.user_id LIMIT :cap) AS capped)
+    FROM unnest(CAST(:user_ids AS uuid[])) WITH ORDINALITY AS u(user_id, i)
+    ORDER BY u.i
+"""
+
+
+def vector_order(distance: str, exact: bool) -> str:
+    """ORDER BY expression for a distance; with `exact` it cannot match the HNSW index."""
+    return f"({distance}) + 0" if exact else distance
+
+
+def recall_at_k(found: list, exact: list) -> float:
+    """Share of the exact nearest rows (by id) that the approximate search found."""
+    if not exact:
+        return 1.0
+    expected = {row.id for row in exact}
+    return len(expected & {row.id for row in found}) / len(expected)
+
+
+class FilteredSearch:
+    """Choose and configure the search strategy for one user's rows."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = async_session, redis_client=None):
+        self.session_factory = session_factory
+        self._redis = redis_client
+        self._checks: set[asyncio.Task] = set()
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    async def corpus_size(self, db: AsyncSession, table: str, user_id: UUID | str) -> int:
+        """Rows the user owns in `table`, counted on `db` up to just past the exact-scan threshold."""
+        return (await self.corpus_sizes(db, table, [user_id]))[user_id]
+
+    async def corpus_sizes(self, db: AsyncSession, table: str, user_ids: list) -> dict:
+        """`corpus_size` of several users, with one MGET and at most one COUNT statement."""
+        users = list(dict.fromkeys(user_ids))
+        keys = [f"vector_corpus:{table}:{user_id}" for user_id in users]
+        try:
+            cached = self.redis.mget(keys)
+        except Exception:
+            logger.warning("Corpus size cache unavailable", exc_info=True)
+            cached = [None] * len(keys)
+        sizes = {user_id: int(size) for user_id, size in zip(users, cached) if size is not None}
+
+        missing = [user_id for user_id in users if user_id not in sizes]
+        if missing:
+            result = await db.execute(
+                text(_CORPUS_SIZES_SQL.format(table=table)),
+                {"user_ids": missing, "cap": settings.VECTOR_EXACT_SCAN_MAX_ROWS + 1},
+            )
+            counted = dict(zip(missing, result.scalars().all()))
+            sizes.update(counted)
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for user_id, size in counted.items():
+                    pipe.setex(f"vector_corpus:{table}:{user_id}", settings.VECTOR_CORPUS_SIZE_TTL_SECONDS, size)
+                pipe.execute()
+            except Exception:
+                logger.warning("Corpus size cache unavailable", exc_info=True)
+        return sizes
+
+    async def use_exact(self, db: AsyncSession, table: str, user_id: UUID | str) -> bool:
+        """Whether the user's rows are few enough to search without the index."""
+        return (await self.use_exact_many(db, table, [user_id]))[user_id]
+
+    async def use_exact_many(self, db: AsyncSession, table: str, user_ids: list) -> dict:
+        """`use_exact` for several users, resolved together (see `corpus_sizes`)."""
+        sizes = await self.corpus_sizes(db, table, user_ids)
+        exact = {user_id: size <= settings.VECTOR_EXACT_SCAN_MAX_ROWS for user_id, size in sizes.items()}
+        for user_id in user_ids:
+            metrics.inc("orchestrator_vector_search_total", table=table, strategy="exact" if exact[user_id] else "ann")
+        return exact
+
+    @staticmethod
+    @asynccontextmanager
+    async def ann_scan(db: AsyncSession, k: int) -> AsyncIterator[None]:
+        """Widen and iterate the HNSW scans of the statements run inside the block.
+
+        The settings live in a savepoint that is rolled back on exit, so only
+        read-only statements belong in the block and their rows must be
+        fetched inside it.
+        """
+        ef_search = max(settings.VECTOR_ANN_EF_SEARCH, k * settings.VECTOR_ANN_CANDIDATE_FACTOR)
+        savepoint = await db.begin_nested()
+        try:
+            await db.execute(text(_EF_SEARCH_SQL), {"ef_search": str(ef_search)})
+            if settings.VECTOR_ANN_ITERATIVE_SCAN != "off":
+                await db.execute(text(_ITERATIVE_SCAN_SQL), {
+                    "mode": settings.VECTOR_ANN_ITERATIVE_SCAN,
+                    "max_scan_tuples": str(settings.VECTOR_ANN_MAX_SCAN_TUPLES),
+                })
+            yield
+        finally:
+            await savepoint.rollback()
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: "VectorQuery",
+        user_id: UUID | str,
+        embedding: list[float],
+        k: int,
+        **params,
+    ) -> list:
+        """Nearest rows for one search on `db`, with the strategy chosen for the user.
+
+        Args:
+            db: Session to run on (the step's session)
+            query: Search shape
+            user_id: Owner of the rows searched
+            embedding: Query vector
+            k: Maximum rows returned
+            **params: Values for `query.parameters`; missing ones are NULL
+
+        Returns:
+            Rows ordered by distance
+        """
+        bound = query.bind(user_id, embedding, k, **params)
+        if await self.use_exact(db, query.table, user_id):
+            result = await db.execute(text(query.batch_sql(1, exact=True)), query.batch_params([bound]))
+            return result.fetchall()
+
+        async with self.ann_scan(db, k):
+            result = await db.execute(text(query.batch_sql(1)), query.batch_params([bound]))
+            rows = result.fetchall()
+        self.sample_recall(query, bound, rows)
+        return rows
+
+    def sample_recall(self, query: "VectorQuery", bound: dict, rows: list) -> None:
+        """Re-run a sample of index searches exactly, in the background."""
+        if random.random() >= settings.VECTOR_RECALL_SAMPLE_RATE:
+            return
+        task = asyncio.get_running_loop().create_task(self._check_recall(query, bound, rows))
+        self._checks.add(task)
+        task.add_done_callback(self._checks.discard)
+
+    async def _check_recall(self, query: "VectorQuery", bound: dict, rows: list) -> None:
+        try:
+            exact = await self.exact_rows(query, bound)
+        except Exception:
+            logger.warning("Recall check for %s failed", query.name, exc_info=True)
+            return
+        metrics.observe("orchestrator_vector_recall", recall_at_k(rows, exact), buckets=RECALL_BUCKETS, query=query.name)
+
+    async def exact_rows(self, query: "VectorQuery", bound: dict) -> list:
+        async with self.session_factory() as db:
+            result = await db.execute(text(query.batch_sql(1, exact=True)), query.batch_params([bound]))
+            return result.fetchall()
+
+
+filtered_search = FilteredSearch()
+
+
+async def recall_report(query: "VectorQuery", samples: int, k: int) -> dict:
+    """Recall and latency of index searches against exact search, for random rows as queries.
+
+    Each sampled row's own vector and user are the query, with the shape's
+    filters left open (NULL, or "%" for keywords).
+    """
+    async with async_session() as db:
+        result = await db.execute(text(
+            f"SELECT user_id, embedding::text AS embedding FROM {query.table} "
+            "WHERE embedding IS NOT NULL ORDER BY random() LIMIT :samples"
+        ), {"samples": samples})
+        probes = result.fetchall()
+
+    recalls, ann_ms, exact_ms = [], [], []
+    for probe in probes:
+        open_filters = {name: "%" for name, sql_type in query.parameters if sql_type == "text"}
+        bound = query.bind(probe.user_id, [float(x) for x in probe.embedding.strip("[]").split(",")], k, **open_filters)
+        async with async_session() as db:
+            started = time.perf_counter()
+            async with FilteredSearch.ann_scan(db, k):
+                result = await db.execute(text(query.batch_sql(1)), query.batch_params([bound]))
+                found = result.fetchall()
+            ann_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        exact = await filtered_search.exact_rows(query, bound)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        recalls.append(recall_at_k(found, exact))
+
+    def median(values: list[float]) -> float | None:
+        return round(sorted(values)[len(values) // 2], 3) if values else None
+
+    return {
+        "query": query.name,
+        "k": k,
+        "samples": len(recalls),
+        "mean_recall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "min_recall": min(recalls, default=None),
+        "incomplete": sum(recall < 1.0 for recall in recalls),
+        "ann_p50_ms": median(ann_ms),
+        "exact_p50_ms": median(exact_ms),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    from app.embeddings.batching import QUERIES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    recall_parser = subcommands.add_parser("recall", help="compare index searches with exact search")
+    recall_parser.add_argument("--query", choices=sorted(QUERIES), default="gmail_semantic")
+    recall_parser.add_argument("--samples", type=int, default=100)
+    recall_parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "recall":
+        print(json.dumps(asyncio.run(recall_report(QUERIES[args.query], args.samples, args.k)), indent=2))
@@ -1,34 +1,85 @@
 from datetime import datetime
-from typing import Any
+from functools import lru_cache
+import asyncio
+import hashlib
 from uuid import UUID
-import random
-import redis
 import json
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sentence_transformers import SentenceTransformer
-from sqlalchemy import text
 # from openai import AsyncOpenAI
 from sqlalchemy import text
 
-from app.core.config import settings
-_embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_TTL_SECONDS = 3600
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load the sentence-transformers model once per process, on first use.
+
+    Importing this module (API startup, workers that never embed) stays cheap.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
 
 class EmbeddingService:
-    def __init__(self) -> None:
-        self.redis = redis.from_url(settings.REDIS_URL)
-        self.model = _embedding_model
+    def __init__(self, redis_client=None) -> None:
+        self.redis = redis_client or get_redis()
+
+    @property
+    def model(self):
+        return get_embedding_model()
 
     async def embed(self, text: str) -> list[float]:
-        # Deterministic fake embedding based on hash
-        cache_key = f"embedding:{hash(text)}"
-        cached = self.redis.get(cache_key)
-        if cached:
-            return json.loads(cached)
-        embedding = self.model.encode(text).tolist()
-        self.redis.setex(cache_key, 3600, json.dumps(embedding))
-        return embedding
-
-def _to_pgvector_literal(embedding: list[float]) -> str:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts with one cache round trip and at most one model call.
+
+        Cached vectors are fetched with a single MGET; the misses are encoded
+        in one batch off the event loop and written back in one pipeline.
+        Without Redis every text is a miss and nothing is cached.
+        """
+        if not texts:
+            return []
+        keys = [_cache_key(text) for text in texts]
+        try:
+            cached = self.redis.mget(keys)
+        except Exception:
+            logger.warning("Embedding cache unavailable", exc_info=True)
+            cached = [None] * len(keys)
+        embeddings = [json.loads(raw) if raw else None for raw in cached]
+
+        missing = sorted({text for text, embedding in zip(texts, embeddings) if embedding is None})
+        if missing:
+            encoded = await asyncio.to_thread(self.model.encode, missing)
+            computed = {text: vector.tolist() for text, vector in zip(missing, encoded)}
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for text, embedding in computed.items():
+                    pipe.setex(_cache_key(text), EMBEDDING_CACHE_TTL_SECONDS, json.dumps(embedding))
+                pipe.execute()
+            except Exception:
+                logger.warning("Embedding cache unavailable", exc_info=True)
+            embeddings = [
+                embedding if embedding is not None else computed[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
+
+
+def _cache_key(text: str) -> str:
+    # Stable across processes, unlike hash() which is salted per interpreter
+    return f"embedding:{EMBEDDING_MODEL_NAME}:{hashlib.sha1(text.encode()).hexdigest()}"
+
+
+def to_pgvector_literal(embedding: list[float]) -> str:
     return "[" + ",".join(str(x) for x in embedding) + "]"
 
 
@@ -38,8 +89,9 @@ async def search_gmail_semantic(
     query_embedding: list[float],
     limit: int = 5,
     received_after: datetime | None = None,
+    received_before: datetime | None = None,
 ):
-    vector_literal = _to_pgvector_literal(query_embedding)
+    vector_literal = to_pgvector_literal(query_embedding)
 
     base_query = """
         SELECT id, email_id, subject, body_preview, received_at
@@ -57,6 +109,10 @@ async def search_gmail_semantic(
         base_query += " AND received_at > :received_after"
         params["received_after"] = received_after
 
+    if received_before:
+        base_query += " AND received_at < :received_before"
+        params["received_before"] = received_before
+
     base_query += """
         ORDER BY embedding <-> CAST(:query_embedding AS vector)
         LIMIT :limit
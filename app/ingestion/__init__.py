@@ -0,0 +1,3 @@
+"""Ingestion helpers: work done once when workspace data is written to the cache."""
+
+__all__ = ["extraction", "backfill"]
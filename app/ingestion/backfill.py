@@ -0,0 +1,88 @@
+"""Backfill extracted entity columns for rows cached before extraction existed.
+
+Run via:
+    python -m app.ingestion.backfill
+"""
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.db.session import async_session
+from app.db.models import GmailCache, GCalCache
+from app.ingestion.extraction import extract_entities
+
+
+async def backfill_extracted_entities(batch_size: int = 500) -> dict[str, int]:
+    """Populate entity columns on existing Gmail and Calendar rows.
+
+    Walks each table in primary-key order in batches so the work can run
+    against a live database without holding long transactions.
+
+    Returns:
+        Dict mapping table name -> number of rows updated
+    """
+    updated = {
+        GmailCache.__tablename__: await _backfill_gmail(batch_size),
+        GCalCache.__tablename__: await _backfill_gcal(batch_size),
+    }
+    return updated
+
+
+async def _backfill_gmail(batch_size: int) -> int:
+    count = 0
+    last_id = None
+    while True:
+        async with async_session() as db:
+            stmt = select(
+                GmailCache.id, GmailCache.subject, GmailCache.body_preview, GmailCache.received_at
+            ).order_by(GmailCache.id).limit(batch_size)
+            if last_id is not None:
+                stmt = stmt.where(GmailCache.id > last_id)
+            rows = (await db.execute(stmt)).all()
+            if not rows:
+                return count
+
+            for row in rows:
+                entities = extract_entities(
+                    row.subject, row.body_preview, reference_time=row.received_at
+                )
+                await db.execute(
+                    update(GmailCache)
+                    .where(GmailCache.id == row.id)
+                    .values(**entities.as_columns())
+                )
+            await db.commit()
+
+            count += len(rows)
+            last_id = rows[-1].id
+
+
+async def _backfill_gcal(batch_size: int) -> int:
+    count = 0
+    last_id = None
+    while True:
+        async with async_session() as db:
+            stmt = select(
+                GCalCache.id, GCalCache.title, GCalCache.description
+            ).order_by(GCalCache.id).limit(batch_size)
+            if last_id is not None:
+                stmt = stmt.where(GCalCache.id > last_id)
+            rows = (await db.execute(stmt)).all()
+            if not rows:
+                return count
+
+            for row in rows:
+                entities = extract_entities(row.title, row.description)
+                await db.execute(
+                    update(GCalCache)
+                    .where(GCalCache.id == row.id)
+                    .values(**entities.as_columns("booking_reference", "counterparty"))
+                )
+            await db.commit()
+
+            count += len(rows)
+            last_id = rows[-1].id
+
+
+if __name__ == "__main__":
+    print(asyncio.run(backfill_extracted_entities()))
@@ -0,0 +1,121 @@
+"""Entity extraction for the ingestion path.
+
+Pulls booking references, counterparties and dates out of subjects and
+bodies when rows are written to the cache, so agents can look them up
+through indexed columns instead of running regexes at query time.
+"""
+import re
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+
+# 2 uppercase letters followed by 4 digits (e.g., TK1234)
+BOOKING_REFERENCE_RE = re.compile(r"[A-Z]{2}\d{4}")
+
+EMAIL_ADDRESS_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+# Capitalised name ending in an organisation suffix (e.g., "Turkish Airlines", "Acme Corp")
+ORGANIZATION_RE = re.compile(
+    r"\b((?:[A-Z][\w&'-]*\s+){1,3}"
+    r"(?:Airlines|Airways|Air|Corp|Corporation|Inc|Ltd|LLC|GmbH|Group|Bank|Hotels?))\b"
+)
+
+_MONTHS = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*"
+
+# (pattern, strptime formats tried against the normalised match)
+_DATE_PATTERNS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), ["%Y-%m-%d"]),
+    (re.compile(rf"\b\d{{1,2}} {_MONTHS},? \d{{4}}\b"), ["%d %B %Y", "%d %b %Y"]),
+    (re.compile(rf"\b{_MONTHS} \d{{1,2}},? \d{{4}}\b"), ["%B %d %Y", "%b %d %Y"]),
+]
+
+_RELATIVE_DAYS = {"yesterday": -1, "today": 0, "tonight": 0, "tomorrow": 1}
+_RELATIVE_DAY_RE = re.compile(r"\b(yesterday|today|tonight|tomorrow)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ExtractedEntities:
+    """Structured entities stored alongside a cached item."""
+
+    booking_reference: str | None = None
+    counterparty: str | None = None
+    mentioned_at: datetime | None = None
+
+    def as_columns(self, *names: str) -> dict:
+        """Return entity values keyed by column name, optionally limited to `names`."""
+        values = asdict(self)
+        if names:
+            return {name: values[name] for name in names}
+        return values
+
+
+def extract_booking_reference(text: str | None) -> str | None:
+    """Extract the first booking reference from text."""
+    if not text:
+        return None
+    match = BOOKING_REFERENCE_RE.search(text)
+    return match.group(0) if match else None
+
+
+def extract_counterparty(text: str | None) -> str | None:
+    """Extract the other party of a message: an email address or organisation name."""
+    if not text:
+        return None
+    match = EMAIL_ADDRESS_RE.search(text)
+    if match:
+        return match.group(0).lower()
+    match = ORGANIZATION_RE.search(text)
+    return match.group(1) if match else None
+
+
+def extract_date(text: str | None, reference_time: datetime | None = None) -> datetime | None:
+    """Extract the first explicit date mentioned in text.
+
+    Relative day words ("tomorrow") are resolved against `reference_time`
+    (usually the time the item was received) and skipped without one.
+    """
+    if not text:
+        return None
+
+    for pattern, formats in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        value = match.group(0).replace(",", "")
+        for fmt in formats:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+
+    if reference_time is not None:
+        match = _RELATIVE_DAY_RE.search(text)
+        if match:
+            offset = _RELATIVE_DAYS[match.group(1).lower()]
+            day = reference_time + timedelta(days=offset)
+            return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return None
+
+
+def extract_entities(*texts: str | None, reference_time: datetime | None = None) -> ExtractedEntities:
+    """Extract entities from the given texts, most specific text first.
+
+    Args:
+        texts: Candidate texts (e.g., subject then body); the first hit wins
+        reference_time: Anchor for relative dates such as "tomorrow"
+
+    Returns:
+        ExtractedEntities with any values found
+    """
+    booking_reference = counterparty = mentioned_at = None
+    for text in texts:
+        booking_reference = booking_reference or extract_booking_reference(text)
+        counterparty = counterparty or extract_counterparty(text)
+        mentioned_at = mentioned_at or extract_date(text, reference_time)
+
+    return ExtractedEntities(
+        booking_reference=booking_reference,
+        counterparty=counterparty,
+        mentioned_at=mentioned_at,
+    )
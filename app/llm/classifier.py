@@ -1,12 +1,31 @@
 """Intent classification using LLM.
 
 Converts natural language queries into structured intent JSON.
-Current implementation uses mocked LLM responses for development.
-Later, wire this to OpenAI chat completions with temperature=0.
+A rule engine (app/llm/rules.py, intents in app/llm/intent_rules.json)
+resolves known intents, then a nearest-centroid embedding router
+(app/llm/router.py); the rest falls back to the LLM tier, a temperature-0
+chat completion through the pooled client (app/llm/client.py). With
+LLM_ENABLED off the LLM tier is mocked and answers "unknown".
 """
 import json
+import logging
 from typing import Any
 
+from app.ingestion.extraction import extract_booking_reference
+from app.core.metrics import metrics
+from app.embeddings.service import EmbeddingService
+from app.core.config import settings
+from app.llm.client import LLMClient, LLMError, get_llm_client
+from app.llm.router import CentroidRouter, RouteMatch, default_router
+from app.llm.rules import RuleEngine, default_rule_engine
+from app.llm.temporal import extract_time_range
+
+logger = logging.getLogger(__name__)
+
+# Steps that only read data which already exists (received emails, edited
+# files): undirected dates in their queries ("March 3") mean the past
+PAST_DATA_STEPS = frozenset({"search_gmail", "search_gmail_for_booking", "search_drive_files"})
+
 
 class IntentClassifier:
     """Classify user queries into structured intent with services, entities, and steps."""
@@ -32,81 +51,132 @@ Steps should be in logical order for execution.
 
 Return ONLY valid JSON. No markdown, no explanation."""
 
+    def __init__(
+        self,
+        rules: RuleEngine | None = None,
+        router: CentroidRouter | None = None,
+        embeddings=None,
+        llm: LLMClient | None = None,
+    ):
+        self.rules = rules or default_rule_engine()
+        self.router = router or default_router()
+        self._embeddings = embeddings
+        self._llm = llm
+
+    @property
+    def embeddings(self) -> EmbeddingService:
+        if self._embeddings is None:
+            self._embeddings = EmbeddingService()
+        return self._embeddings
+
     async def classify(self, query: str) -> dict[str, Any]:
         """Classify a natural language query into structured intent.
 
+        Tiers, cheapest first: the rule engine, the embedding centroid
+        router, and the LLM for queries both consider ambiguous.
+
         Args:
             query: Natural language query from user
 
         Returns:
             Dictionary with keys: services, intent, entities, steps
         """
-        # TODO: Replace with actual OpenAI call:
-        # response = openai.ChatCompletion.create(
-        #     model="gpt-4",
-        #     temperature=0,
-        #     messages=[
-        #         {"role": "system", "content": self.SYSTEM_PROMPT},
-        #         {"role": "user", "content": query}
-        #     ]
-        # )
-        # return json.loads(response["choices"][0]["message"]["content"])
-
-        # Mocked responses for development
-        query_lower = query.lower()
-
-        if "cancel" in query_lower and "flight" in query_lower:
-            return {
-                "services": ["gmail", "gcal"],
-                "intent": "cancel_flight",
-                "entities": {"airline": "Turkish Airlines"},
-                "steps": ["search_gmail_for_booking", "find_calendar_event", "draft_cancellation_email"],
-            }
-            
-        if "acme corp" in query_lower:
-            return {
-                "services": ["gcal", "gmail", "gdrive"],
-                "intent": "prepare_meeting",
-                "entities": {"company": "Acme Corp"},
-                "steps": ["find_calendar_event", "search_gmail", "search_drive_files"],
-            }
-            
-        if "out-of-office" in query_lower:
-            return {
-                "services": ["gcal", "gdrive"],
-                "intent": "check_conflicts",
-                "entities": {"document": "out-of-office"},
-                "steps": ["search_drive_files", "find_calendar_event"],
-            }
-
-        # Single Service & Hard Cases
-        if "calendar" in query_lower or "meeting" in query_lower or "tuesday" in query_lower:
-            return {
-                "services": ["gcal"],
-                "intent": "check_calendar",
-                "entities": {},
-                "steps": ["find_calendar_event"],
-            }
-            
-        if "emails" in query_lower or "email" in query_lower:
-            return {
-                "services": ["gmail"],
-                "intent": "search_emails",
-                "entities": {},
-                "steps": ["search_gmail"],
-            }
-            
-        if "drive" in query_lower or "pdfs" in query_lower:
-            return {
-                "services": ["gdrive"],
-                "intent": "search_drive",
-                "entities": {},
-                "steps": ["search_drive_files"],
-            }
+        match = self.rules.match(query)
+        if match:
+            tier, intent = "rules", match.intent
+        else:
+            routed = await self._route(query)
+            if routed:
+                tier, intent = "router", routed.intent
+            else:
+                tier, intent = "llm", await self._llm_classify(query)
+
+        metrics.inc("orchestrator_classifier_tier_total", tier=tier)
+        return self._add_entities(query, intent)
+
+    async def _route(self, query: str) -> RouteMatch | None:
+        """Centroid router tier; None when no centroids are built or the match is ambiguous."""
+        if self.router is None:
+            return None
+        # Cached, so query-level searches later reuse this vector
+        embedding = await self.embeddings.embed(query)
+        return self.router.route(embedding)
+
+    def guess(self, query: str) -> dict[str, Any]:
+        """Deterministic, microsecond-cost classification.
+
+        The rule tier alone; "unknown" when no rule is confident.
+        """
+        match = self.rules.match(query)
+        return self._add_entities(query, match.intent if match else self._unknown())
+
+    def speculative_guess(self, query: str) -> dict[str, Any] | None:
+        """Low-confidence rule guess to prefetch on while the slower tiers run.
+
+        None when the rule tier resolves the query, since `classify` then
+        returns without awaiting anything, or when no rule reaches
+        SPECULATION_MIN_CONFIDENCE.
+        """
+        match = self.rules.match(query, min_confidence=settings.SPECULATION_MIN_CONFIDENCE)
+        if match is None or match.confidence >= self.rules.min_confidence:
+            return None
+        return self._add_entities(query, match.intent)
+
+    async def _llm_classify(self, query: str) -> dict[str, Any]:
+        """LLM tier for queries the rules cannot resolve.
+
+        Falls back to "unknown" when the LLM is disabled, unavailable, or
+        returns something that is not an intent object.
+        """
+        if self._llm is None and not settings.LLM_ENABLED:
+            return self._unknown()
+
+        llm = self._llm or get_llm_client()
+        try:
+            response = await llm.chat(
+                settings.LLM_CLASSIFIER_MODEL,
+                [
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": query},
+                ],
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+            intent = json.loads(response.content)
+        except (LLMError, ValueError) as exc:
+            logger.warning("LLM classification failed: %s", exc)
+            return self._unknown()
+
+        if not isinstance(intent, dict):
+            return self._unknown()
+        entities = intent.get("entities")
+        return {
+            "services": [str(s) for s in intent.get("services") or []],
+            "intent": str(intent.get("intent") or "unknown"),
+            "entities": entities if isinstance(entities, dict) else {},
+            "steps": [str(s) for s in intent.get("steps") or []],
+        }
+
+    def _add_entities(self, query: str, intent: dict[str, Any]) -> dict[str, Any]:
+        # Booking references are matched exactly against indexed columns
+        booking_reference = extract_booking_reference(query)
+        if booking_reference:
+            intent["entities"]["booking_reference"] = booking_reference
+
+        # Temporal expressions become range filters pushed down by the agents
+        steps = intent.get("steps") or []
+        prefer = "past" if steps and set(steps) <= PAST_DATA_STEPS else "future"
+        time_range = extract_time_range(query, prefer=prefer)
+        if time_range:
+            intent["entities"]["time_range"] = time_range.to_dict()
+
+        return intent
 
+    @staticmethod
+    def _unknown() -> dict[str, Any]:
         return {
             "services": [],
             "intent": "unknown",
             "entities": {},
             "steps": [],
-        }
\ No newline at end of file
+        }
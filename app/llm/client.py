@@ -0,0 +1,213 @@
+"""Pooled async client for OpenAI-compatible chat completion APIs.
+
+One client per event loop keeps an `httpx` connection pool (and its TLS
+sessions) alive across tasks; Celery workers run every task on a persistent
+per-process loop (app/core/loop.py) so the pool is actually reused.
+
+- concurrency is bounded per model with semaphores
+- retries (429, 5xx, transport errors) use full-jitter exponential backoff,
+  honour `Retry-After`, and draw from a shared retry budget so an outage
+  cannot multiply load on the provider
+- streaming responses are parsed from server-sent events
+- request counts, latency and token usage are exported as metrics
+
+Point `LLM_BASE_URL` at app/llm/mock_server.py for offline load tests.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMError(RuntimeError):
+    """Raised when a completion fails after retries."""
+
+
+@dataclass
+class ChatResult:
+    content: str
+    model: str
+    usage: dict[str, int] = field(default_factory=dict)
+
+
+class RetryBudget:
+    """Allow retries up to a fraction of recent requests.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    retries stay below roughly `ratio` of traffic; `reserve` tokens allow
+    retries at low request rates.
+    """
+
+    def __init__(self, ratio: float, reserve: float):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+
+    def deposit(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.reserve + 100 * self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LLMClient:
+    """Async chat completion client bound to one event loop."""
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, transport=None):
+        self._http = httpx.AsyncClient(
+            base_url=base_url or settings.LLM_BASE_URL,
+            headers={"Authorization": f"Bearer {api_key or settings.OPENAI_API_KEY or ''}"},
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._budget = RetryBudget(settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RETRY_BUDGET_RESERVE)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._semaphores[model] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_MODEL)
+        return semaphore
+
+    async def chat(self, model: str, messages: list[dict], **params: Any) -> ChatResult:
+        """Run one chat completion.
+
+        Raises:
+            LLMError: When the request fails after retries, the budget is
+                spent, or the response is not a completion
+        """
+        payload = {"model": model, "messages": messages, **params}
+        async with self._semaphore(model):
+            request = self._http.build_request("POST", "/chat/completions", json=payload)
+            response = await self._send_with_retries(model, request)
+
+        try:
+            body = response.json()
+            content = body["choices"][0]["message"]["content"]
+            if not isinstance(content, str):
+                raise TypeError(f"content is {type(content).__name__}")
+        except (ValueError, LookupError, TypeError) as exc:
+            raise LLMError(f"Malformed completion from {model}: {exc}") from exc
+
+        usage = body.get("usage") or {}
+        self._record_usage(model, usage)
+        return ChatResult(content=content, model=body.get("model", model), usage=usage)
+
+    async def stream_chat(self, model: str, messages: list[dict], **params: Any) -> AsyncIterator[str]:
+        """Yield content deltas of a streamed chat completion.
+
+        Only connection setup is retried; a stream that fails midway raises.
+        """
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        started = time.perf_counter()
+        async with self._semaphore(model):
+            request = self._http.build_request("POST", "/chat/completions", json=payload)
+            response = await self._send_with_retries(model, request, stream=True)
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError as exc:
+                        raise LLMError(f"Malformed stream chunk from {model}: {exc}") from exc
+                    if chunk.get("usage"):
+                        self._record_usage(model, chunk["usage"])
+                    for choice in chunk.get("choices", ()):
+                        delta = choice.get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+            finally:
+                await response.aclose()
+                metrics.observe("orchestrator_llm_stream_seconds", time.perf_counter() - started, model=model)
+
+    async def _send_with_retries(self, model: str, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        self._budget.deposit()
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                response = await self._http.send(request, stream=stream)
+            except httpx.TransportError as exc:
+                status, error = "transport_error", exc
+            else:
+                status, error = str(response.status_code), None
+                if response.status_code < 400:
+                    metrics.inc("orchestrator_llm_requests_total", model=model, status=status)
+                    metrics.observe("orchestrator_llm_latency_seconds", time.perf_counter() - started, model=model)
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                if stream:
+                    await response.aclose()
+                if response.status_code not in RETRYABLE_STATUS:
+                    metrics.inc("orchestrator_llm_requests_total", model=model, status=status)
+                    raise LLMError(f"{model}: HTTP {response.status_code}")
+
+            metrics.inc("orchestrator_llm_requests_total", model=model, status=status)
+            attempt += 1
+            if attempt > settings.LLM_MAX_RETRIES or not self._budget.withdraw():
+                logger.warning("LLM request to %s failed after %d attempt(s): %s", model, attempt, status)
+                raise LLMError(f"{model}: giving up after {attempt} attempt(s) ({status})") from error
+
+            metrics.inc("orchestrator_llm_retries_total", model=model)
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: str | None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(settings.LLM_BACKOFF_CAP_SECONDS, settings.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    @staticmethod
+    def _record_usage(model: str, usage: dict) -> None:
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                metrics.inc("orchestrator_llm_tokens_total", usage[kind], model=model, kind=kind)
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+_clients: dict[int, tuple[asyncio.AbstractEventLoop, LLMClient]] = {}
+
+
+def get_llm_client() -> LLMClient:
+    """Client for the running event loop, created on first use.
+
+    httpx pools (and asyncio primitives) belong to one loop, so each loop
+    gets its own client; with a persistent loop that is one per process.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        # Drop clients of closed loops
+        for key in [key for key, (other, _) in _clients.items() if other.is_closed()]:
+            del _clients[key]
+        entry = _clients[id(loop)] = (loop, LLMClient())
+    return entry[1]
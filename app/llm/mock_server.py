@@ -0,0 +1,99 @@
+"""Local OpenAI-compatible chat completions server for offline load tests.
+
+Serves `POST /v1/chat/completions`, streamed or not, with simulated latency
+and failures so the pooled client, its retries and the worker pipeline can be
+exercised without a provider:
+
+    uvicorn app.llm.mock_server:app --port 8100
+    LLM_ENABLED=true LLM_BASE_URL=http://localhost:8100/v1 ...
+
+Requests asking for a JSON object (the classifier) get the rule engine's
+intent for the last user message; anything else gets a short summary.
+
+Environment:
+    MOCK_LLM_LATENCY_MS: mean response latency (exponentially distributed)
+    MOCK_LLM_ERROR_RATE: share of requests answered with 503
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm.rules import default_rule_engine
+
+LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "200"))
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+
+app = FastAPI(title="Mock LLM")
+
+
+def _reply(body: dict) -> str:
+    user_messages = [m.get("content", "") for m in body.get("messages", ()) if m.get("role") == "user"]
+    prompt = user_messages[-1] if user_messages else ""
+
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        match = default_rule_engine().match(prompt)
+        intent = match.intent if match else {"services": [], "intent": "unknown", "entities": {}, "steps": []}
+        return json.dumps(intent)
+    return f"Done: processed {len(prompt)} characters of results."
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", ()))
+    completion_tokens = len(content.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(random.expovariate(1000 / LATENCY_MS) if LATENCY_MS > 0 else 0)
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": {"message": "overloaded"}}, status_code=503, headers={"Retry-After": "0"})
+
+    model = body.get("model", "mock")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    content = _reply(body)
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": _usage(body, content),
+        }
+
+    async def events():
+        for i, word in enumerate(content.split(" ")):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": _usage(body, content),
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,166 @@
+"""Nearest-centroid intent router between the rule engine and the LLM.
+
+Each known intent is represented by the normalized mean embedding of logged
+queries that were classified as it. A query embedding is scored against all
+centroids with one matrix-vector product. When the best intent is similar
+enough and clearly ahead of the runner-up, its cached step template is used
+and the LLM is skipped; ambiguous queries still go to the LLM.
+
+Centroids are rebuilt offline from the `conversations` table:
+
+    python -m app.llm.router build [--output PATH] [--min-examples N]
+"""
+import argparse
+import asyncio
+import json
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CENTROIDS_PATH = Path(__file__).with_name("intent_centroids.npz")
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    intent: dict[str, Any]
+    similarity: float
+    margin: float
+
+
+class CentroidRouter:
+    """Score query embeddings against per-intent centroids."""
+
+    def __init__(self, labels: list[str], centroids: np.ndarray, templates: dict[str, dict]):
+        if len(labels) != len(centroids):
+            raise ValueError("One centroid per label is required")
+        self.labels = list(labels)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = (centroids / np.where(norms == 0, 1, norms)).astype(np.float32)
+        self.templates = templates
+
+    def route(
+        self,
+        embedding: list[float],
+        min_similarity: float | None = None,
+        min_margin: float | None = None,
+    ) -> RouteMatch | None:
+        """Best intent for a query embedding, or None when the match is ambiguous."""
+        min_similarity = settings.ROUTER_MIN_SIMILARITY if min_similarity is None else min_similarity
+        min_margin = settings.ROUTER_MIN_MARGIN if min_margin is None else min_margin
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or not self.labels:
+            return None
+        scores = self.centroids @ (query / norm)
+
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        runner_up = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else -1.0
+        margin = similarity - runner_up
+        if similarity < min_similarity or margin < min_margin:
+            return None
+
+        template = self.templates[self.labels[best]]
+        intent = {
+            "services": list(template["services"]),
+            "intent": self.labels[best],
+            "entities": {},
+            "steps": list(template["steps"]),
+        }
+        return RouteMatch(intent=intent, similarity=similarity, margin=margin)
+
+    def save(self, path: str | Path) -> None:
+        np.savez(
+            path,
+            labels=np.array(self.labels),
+            centroids=self.centroids,
+            templates=np.array(json.dumps(self.templates)),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "CentroidRouter":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                labels=[str(label) for label in data["labels"]],
+                centroids=data["centroids"],
+                templates=json.loads(str(data["templates"])),
+            )
+
+
+@lru_cache(maxsize=1)
+def default_router() -> CentroidRouter | None:
+    """Router loaded once per process, or None when no centroids were built."""
+    path = Path(settings.INTENT_CENTROIDS_PATH or DEFAULT_CENTROIDS_PATH)
+    if not path.exists():
+        return None
+    return CentroidRouter.load(path)
+
+
+# ---------------------------------------------------------------------------
+# Offline rebuild from logged conversations
+# ---------------------------------------------------------------------------
+
+async def build_router(min_examples: int = 5, batch_size: int = 256) -> CentroidRouter:
+    """Compute per-intent centroids and step templates from the conversations table."""
+    from sqlalchemy import select
+
+    from app.db.models import Conversation
+    from app.db.session import async_session
+    from app.embeddings.service import EmbeddingService
+
+    async with async_session() as db:
+        rows = (await db.execute(select(Conversation.query, Conversation.intent))).all()
+
+    queries: dict[str, list[str]] = defaultdict(list)
+    shapes: dict[str, Counter] = defaultdict(Counter)
+    for query, intent in rows:
+        label = (intent or {}).get("intent")
+        if not label or label == "unknown" or not intent.get("steps"):
+            continue
+        queries[label].append(query)
+        shapes[label][(tuple(intent.get("services", ())), tuple(intent["steps"]))] += 1
+
+    embeddings_svc = EmbeddingService()
+    labels, centroids, templates = [], [], {}
+    for label, texts in sorted(queries.items()):
+        if len(texts) < min_examples:
+            logger.info("Skipping %s: %d examples", label, len(texts))
+            continue
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(await embeddings_svc.embed_many(texts[start:start + batch_size]))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+
+        (services, steps), _ = shapes[label].most_common(1)[0]
+        labels.append(label)
+        centroids.append(matrix.mean(axis=0))
+        templates[label] = {"services": list(services), "steps": list(steps)}
+
+    return CentroidRouter(labels, np.asarray(centroids, dtype=np.float32).reshape(len(labels), -1), templates)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build_parser = subcommands.add_parser("build", help="rebuild centroids from logged conversations")
+    build_parser.add_argument("--output", default=str(DEFAULT_CENTROIDS_PATH))
+    build_parser.add_argument("--min-examples", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        router = asyncio.run(build_router(min_examples=args.min_examples))
+        router.save(args.output)
+        logger.info("Wrote %d intent centroids to %s", len(router.labels), args.output)
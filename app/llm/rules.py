@@ -0,0 +1,138 @@
+"""Data-driven rule engine for the classifier's deterministic tier.
+
+Intents are declared in JSON (`app/llm/intent_rules.json` by default, or
+`INTENT_RULES_PATH`). Each intent lists `match` groups: a group is satisfied
+when any of its phrases occurs in the query (case-insensitive substring),
+optionally weighted with `"weights"`. An intent's score is the weighted share
+of its satisfied groups.
+
+All phrases of all intents are compiled into one regex that is scanned once
+per query, so adding intents does not add passes over the string. The regex
+is a lookahead at every position, which reports the longest phrase starting
+there; shorter phrases that are prefixes of it are added from a precomputed
+table. Together this finds every phrase occurrence, overlaps included.
+
+The highest-scoring intent wins, ties going to the one declared first.
+Scores below `min_confidence` return None so the caller can fall back to the
+LLM.
+"""
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("intent_rules.json")
+
+
+@dataclass(frozen=True)
+class IntentRule:
+    intent: str
+    services: tuple[str, ...]
+    entities: dict
+    steps: tuple[str, ...]
+    weights: tuple[float, ...]
+
+    def build(self) -> dict[str, Any]:
+        """Fresh intent dict (callers add entities to it)."""
+        return {
+            "services": list(self.services),
+            "intent": self.intent,
+            "entities": dict(self.entities),
+            "steps": list(self.steps),
+        }
+
+
+@dataclass(frozen=True)
+class RuleMatch:
+    intent: dict[str, Any]
+    confidence: float
+
+
+class RuleEngine:
+    """Compiled matcher over a set of intent rules."""
+
+    def __init__(self, config: dict):
+        self.min_confidence = float(config.get("min_confidence", 1.0))
+        self.rules: list[IntentRule] = []
+
+        # phrase -> [(rule index, group index)]
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for rule_index, spec in enumerate(config["intents"]):
+            groups = spec["match"]
+            weights = tuple(float(w) for w in spec.get("weights", [1.0] * len(groups)))
+            if len(weights) != len(groups):
+                raise ValueError(f"Intent '{spec['intent']}': weights and match groups differ in length")
+            self.rules.append(IntentRule(
+                intent=spec["intent"],
+                services=tuple(spec.get("services", ())),
+                entities=dict(spec.get("entities", {})),
+                steps=tuple(spec.get("steps", ())),
+                weights=weights,
+            ))
+            for group_index, phrases in enumerate(groups):
+                for phrase in phrases:
+                    postings.setdefault(phrase.lower(), []).append((rule_index, group_index))
+
+        self._postings = postings
+        # Longest alternatives first so the lookahead reports the longest phrase per position
+        phrases = sorted(postings, key=len, reverse=True)
+        self._pattern = re.compile(
+            "(?=(" + "|".join(re.escape(phrase) for phrase in phrases) + "))"
+        ) if phrases else None
+        self._prefixes = {
+            phrase: tuple(other for other in phrases if other != phrase and phrase.startswith(other))
+            for phrase in phrases
+        }
+        self._total_weight = [sum(rule.weights) for rule in self.rules]
+
+    def phrases_in(self, query: str) -> set[str]:
+        """Every configured phrase occurring in the query."""
+        if self._pattern is None:
+            return set()
+        found: set[str] = set()
+        for match in self._pattern.finditer(query.lower()):
+            phrase = match.group(1)
+            found.add(phrase)
+            found.update(self._prefixes[phrase])
+        return found
+
+    def match(self, query: str, min_confidence: float | None = None) -> RuleMatch | None:
+        """Best intent for the query, or None below the confidence threshold.
+
+        `min_confidence` overrides the configured threshold, e.g. for guesses
+        that are only acted on speculatively.
+        """
+        min_confidence = self.min_confidence if min_confidence is None else min_confidence
+        satisfied: dict[tuple[int, int], None] = {}
+        for phrase in self.phrases_in(query):
+            for posting in self._postings[phrase]:
+                satisfied[posting] = None
+
+        scores = [0.0] * len(self.rules)
+        for rule_index, group_index in satisfied:
+            scores[rule_index] += self.rules[rule_index].weights[group_index]
+
+        best_index, best_score = None, 0.0
+        for rule_index, score in enumerate(scores):
+            confidence = score / self._total_weight[rule_index] if self._total_weight[rule_index] else 0.0
+            if confidence > best_score:
+                best_index, best_score = rule_index, confidence
+
+        if best_index is None or best_score < min_confidence:
+            return None
+        return RuleMatch(intent=self.rules[best_index].build(), confidence=best_score)
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "RuleEngine":
+        with open(path) as f:
+            return cls(json.load(f))
+
+
+@lru_cache(maxsize=1)
+def default_rule_engine() -> RuleEngine:
+    """Rule engine compiled once per process from the configured rules file."""
+    return RuleEngine.from_file(settings.INTENT_RULES_PATH or DEFAULT_RULES_PATH)
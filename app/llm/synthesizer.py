@@ -1,10 +1,59 @@
 """Synthesizer composes prompts and responses from an LLM.
 Keep this small and testable; swap the backend easily.
+
+`synthesize` is the deterministic template; `synthesize_async` asks the LLM
+through the pooled client when LLM_ENABLED and falls back to the template.
 """
+import json
+import logging
+
+from app.core.config import settings
+from app.llm.client import LLMClient, LLMError, get_llm_client
+
+logger = logging.getLogger(__name__)
+
 
 class Synthesizer:
     """Compose natural language responses from execution results."""
 
+    SYSTEM_PROMPT = """You are the assistant of a Google Workspace Orchestration system.
+
+Given the user's intent and the results of the steps that ran for it, reply
+to the user in one or two plain sentences. Only state facts present in the
+results."""
+
+    def __init__(self, llm: LLMClient | None = None):
+        self._llm = llm
+
+    async def synthesize_async(self, intent: dict, results: dict) -> str:
+        """Synthesize a response with the LLM, falling back to the template.
+
+        Args:
+            intent: Intent dict with entities (airline, etc.)
+            results: Results dict with step outcomes
+
+        Returns:
+            Natural language response string.
+        """
+        if self._llm is None and not settings.LLM_ENABLED:
+            return self.synthesize(intent, results)
+
+        llm = self._llm or get_llm_client()
+        payload = json.dumps({"intent": intent, "results": results}, default=str)
+        try:
+            response = await llm.chat(
+                settings.LLM_SYNTHESIZER_MODEL,
+                [
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": payload},
+                ],
+                temperature=0,
+            )
+        except LLMError as exc:
+            logger.warning("LLM synthesis failed: %s", exc)
+            return self.synthesize(intent, results)
+        return response.content.strip() or self.synthesize(intent, results)
+
     def synthesize(self, intent: dict, results: dict) -> str:
         """Synthesize a response from intent and execution results.
 
@@ -24,20 +73,13 @@ class Synthesizer:
         email_result = results.get("draft_cancellation_email", {})
 
         booking_reference = gmail_result.get("booking_reference")
-        event_start_time = gcal_result.get("start_time")
+        # YYYY-MM-DD, resolved once by the calendar agent
+        date_str = gcal_result.get("event_date")
         recipient = email_result.get("to")
 
-        # Format event_start_time if present
-        date_str = None
-        if event_start_time:
-            if hasattr(event_start_time, "strftime"):
-                date_str = event_start_time.strftime("%Y-%m-%d")
-            else:
-                date_str = str(event_start_time).split()[0]
-
         # Synthesize response based on available data
         if booking_reference:
-            if event_start_time and date_str:
+            if date_str:
                 return (
                     f"I found your {airline} booking {booking_reference} "
                     f"scheduled on {date_str} and drafted a cancellation email to {recipient}."
@@ -0,0 +1,189 @@
+"""Temporal expression extraction.
+
+Turns phrases like "tomorrow", "next week" or "last Tuesday" into concrete
+time ranges so agents can push them down to SQL as range predicates on
+`received_at`, `start_time` and `updated_at`.
+
+Expressions that do not name a direction ("March 3", "on friday") resolve
+to the past or the future from cues in the query ("happened", "ago", "will",
+"upcoming", ...), falling back to the caller's preference. "since X" is the
+open range [X, now).
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import dateparser
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+_RELATIVE_DAY_RE = re.compile(r"\b(today|tonight|tomorrow|yesterday)\b")
+_RELATIVE_PERIOD_RE = re.compile(r"\b(this|next|last|past|previous)\s+(week|month|year)\b")
+_ROLLING_RE = re.compile(r"\b(last|past|next)\s+(\d+)\s+(day|week|month|year)s?\b")
+_WEEKDAY_RE = re.compile(r"\b(?:(this|next|last|on)\s+)?(" + "|".join(WEEKDAYS) + r")\b")
+_EXPLICIT_DATE_RE = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*(?:\s+\d{4})?)\b"
+)
+_PAST_CUE_RE = re.compile(
+    r"\b(since|ago|last|past|previous|yesterday|was|were|did|happened|received|sent|got|had)\b"
+)
+_FUTURE_CUE_RE = re.compile(r"\b(next|upcoming|coming|tomorrow|will|until)\b")
+_SINCE_RE = re.compile(r"\bsince\s+$")
+
+
+@dataclass(frozen=True)
+class TimeRange:
+    """Half-open UTC time range [start, end). Either bound may be open."""
+
+    start: datetime | None = None
+    end: datetime | None = None
+
+    def to_dict(self) -> dict:
+        """JSON-safe form stored in intent entities."""
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "TimeRange | None":
+        if not data:
+            return None
+        start, end = data.get("start"), data.get("end")
+        return cls(
+            start=datetime.fromisoformat(start) if start else None,
+            end=datetime.fromisoformat(end) if end else None,
+        )
+
+    def clip_end(self, limit: datetime) -> "TimeRange | None":
+        """Clip the range so it ends no later than `limit`.
+
+        Used for data that can only exist in the past (received emails,
+        edited files): a future range such as "tomorrow" yields None, so no
+        filter is applied rather than one that can never match.
+        """
+        if self.start and self.start >= limit:
+            return None
+        end = min(self.end, limit) if self.end else limit
+        return TimeRange(start=self.start, end=end)
+
+
+def extract_time_range(query: str, now: datetime | None = None, prefer: str = "future") -> TimeRange | None:
+    """Extract the first temporal expression in a query as a time range.
+
+    Args:
+        query: Natural language query
+        now: Reference time (defaults to current UTC time)
+        prefer: "past" or "future", for expressions without a direction when
+            the query has no tense or keyword cue either
+
+    Returns:
+        TimeRange, or None when the query has no temporal expression
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    text = query.lower()
+    direction = _direction(text) or prefer
+
+    candidates = []
+
+    match = _RELATIVE_DAY_RE.search(text)
+    if match:
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "yesterday": -1}[match.group(1)]
+        day = today + timedelta(days=offset)
+        candidates.append((match.start(), TimeRange(day, day + timedelta(days=1))))
+
+    match = _ROLLING_RE.search(text)
+    if match:
+        which, count, unit = match.groups()
+        span = timedelta(days=int(count) * _UNIT_DAYS[unit])
+        if which == "next":
+            candidates.append((match.start(), TimeRange(now, now + span)))
+        else:
+            candidates.append((match.start(), TimeRange(now - span, now)))
+
+    match = _RELATIVE_PERIOD_RE.search(text)
+    if match:
+        candidates.append((match.start(), _relative_period(today, *match.groups())))
+
+    match = _WEEKDAY_RE.search(text)
+    if match:
+        candidates.append((match.start(), _weekday(today, *match.groups(), direction=direction)))
+
+    match = _EXPLICIT_DATE_RE.search(text)
+    if match:
+        parsed = dateparser.parse(
+            match.group(1),
+            settings={
+                "RELATIVE_BASE": now.replace(tzinfo=None),
+                "PREFER_DATES_FROM": direction,
+            },
+        )
+        if parsed:
+            day = parsed.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=now.tzinfo)
+            candidates.append((match.start(), TimeRange(day, day + timedelta(days=1))))
+
+    if not candidates:
+        return None
+
+    # Earliest expression in the query wins
+    position, time_range = min(candidates, key=lambda candidate: candidate[0])
+    if _SINCE_RE.search(text[:position]) and time_range.start and time_range.start < now:
+        return TimeRange(time_range.start, now)
+    return time_range
+
+
+def _direction(text: str) -> str | None:
+    """"past" or "future" when the query's cues agree on one, else None."""
+    past, future = bool(_PAST_CUE_RE.search(text)), bool(_FUTURE_CUE_RE.search(text))
+    if past != future:
+        return "past" if past else "future"
+    return None
+
+
+def _relative_period(today: datetime, which: str, unit: str) -> TimeRange:
+    """Resolve "this/next/last week|month|year" to calendar-aligned bounds."""
+    step = {"this": 0, "next": 1, "last": -1, "past": -1, "previous": -1}[which]
+
+    if unit == "week":
+        monday = today - timedelta(days=today.weekday())
+        start = monday + timedelta(weeks=step)
+        return TimeRange(start, start + timedelta(weeks=1))
+
+    if unit == "month":
+        start = _add_months(today.replace(day=1), step)
+        return TimeRange(start, _add_months(start, 1))
+
+    start = today.replace(month=1, day=1, year=today.year + step)
+    return TimeRange(start, start.replace(year=start.year + 1))
+
+
+def _weekday(today: datetime, qualifier: str | None, name: str, direction: str = "future") -> TimeRange:
+    """Resolve a weekday name to a single day.
+
+    A bare or "this"/"on" weekday is the nearest occurrence including today,
+    in `direction`; "next" is strictly after today and "last" strictly
+    before today.
+    """
+    target = WEEKDAYS.index(name)
+    if qualifier == "last":
+        delta = (today.weekday() - target) % 7 or 7
+        day = today - timedelta(days=delta)
+    elif qualifier != "next" and direction == "past":
+        day = today - timedelta(days=(today.weekday() - target) % 7)
+    else:
+        delta = (target - today.weekday()) % 7
+        if qualifier == "next" and delta == 0:
+            delta = 7
+        day = today + timedelta(days=delta)
+    return TimeRange(day, day + timedelta(days=1))
+
+
+def _add_months(day: datetime, months: int) -> datetime:
+    month_index = day.month - 1 + months
+    return day.replace(year=day.year + month_index // 12, month=month_index % 12 + 1)
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 
 from app.api.v1.routes import router as api_router
@@ -6,6 +8,8 @@ from app.core.logging import setup_logging
 from app.db.session import init_db
 from app.db import models
 from app.db.seed import seed_demo_data
+from app.services.task_queue import local_queue
+from app.services.tasks import flush_conversations_periodically
 
 
 def create_app() -> FastAPI:
@@ -21,10 +25,17 @@ def create_app() -> FastAPI:
         await init_db()
         await seed_demo_data()
 
+        # Broker-free mode: orchestrations run on this loop
+        if settings.TASK_BACKEND == "local":
+            local_queue.start()
+            app.state.conversation_flusher = asyncio.create_task(flush_conversations_periodically())
+
     @app.on_event("shutdown")
     async def _shutdown():
-        # place for graceful shutdown tasks
-        pass
+        # Let in-flight local orchestrations finish
+        if settings.TASK_BACKEND == "local":
+            app.state.conversation_flusher.cancel()
+            await local_queue.drain(settings.LOCAL_TASK_DRAIN_SECONDS)
 
     return app
 
@@ -2,4 +2,4 @@
 Keep logic focused and testable. Expose small, well-documented APIs.
 """
 
-__all__ = ["planner", "dag", "engine"]
+__all__ = ["planner", "dag", "engine", "tracing"]
@@ -2,6 +2,11 @@
 
 Defines the structure of a plan with dependencies.
 Does not execute; only tracks which steps can run next.
+
+A `Plan` is a mutable builder. `Plan.compile()` turns it into an immutable
+`CompiledPlan` holding a topological order, dependents and an in-degree table,
+which planners cache per step signature. Each execution gets a cheap
+`PlanInstance` that only copies the in-degree table.
 """
 from typing import Any
 
@@ -9,6 +14,8 @@ from typing import Any
 class PlanNode:
     """A single step in the execution plan."""
 
+    __slots__ = ("id", "dependencies", "result")
+
     def __init__(self, id: str, dependencies: list[str] | None = None):
         self.id = id
         self.dependencies = dependencies or []
@@ -46,5 +53,99 @@ class Plan:
                     ready.append(node)
         return ready
 
+    def compile(self) -> "CompiledPlan":
+        """Validate and freeze the plan into a CompiledPlan.
+
+        Raises:
+            ValueError: On unknown dependencies or cycles
+        """
+        self.validate()
+        return CompiledPlan(
+            {node_id: tuple(node.dependencies) for node_id, node in self.nodes.items()}
+        )
+
+    def __repr__(self):
+        return f"Plan(nodes={list(self.nodes.keys())})"
+
+
+class CompiledPlan:
+    """Immutable, topologically ordered plan shared across executions.
+
+    Steps are addressed by their position in `order`; `dependents[i]` and
+    `in_degree[i]` describe step `order[i]`.
+    """
+
+    __slots__ = ("order", "dependencies", "dependents", "in_degree", "roots")
+
+    def __init__(self, dependencies: dict[str, tuple[str, ...]]):
+        # Kahn's algorithm, keeping insertion order among ready steps
+        in_degree = {step: len(deps) for step, deps in dependencies.items()}
+        dependents: dict[str, list[str]] = {step: [] for step in dependencies}
+        for step, deps in dependencies.items():
+            for dep in deps:
+                dependents[dep].append(step)
+
+        order: list[str] = []
+        ready = [step for step, degree in in_degree.items() if degree == 0]
+        remaining = dict(in_degree)
+        while ready:
+            step = ready.pop(0)
+            order.append(step)
+            for dependent in dependents[step]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) < len(dependencies):
+            raise ValueError("Circular dependency in plan")
+
+        index = {step: i for i, step in enumerate(order)}
+        self.order: tuple[str, ...] = tuple(order)
+        self.dependencies: tuple[tuple[str, ...], ...] = tuple(dependencies[step] for step in order)
+        self.dependents: tuple[tuple[int, ...], ...] = tuple(
+            tuple(index[dependent] for dependent in dependents[step]) for step in order
+        )
+        self.in_degree: tuple[int, ...] = tuple(in_degree[step] for step in order)
+        self.roots: tuple[int, ...] = tuple(i for i, degree in enumerate(self.in_degree) if degree == 0)
+
+    def instantiate(self, intent: dict | None = None, reused: dict | None = None) -> "PlanInstance":
+        """Cheap per-run state for executing this plan."""
+        return PlanInstance(self, intent or {}, reused or {})
+
+    def __len__(self):
+        return len(self.order)
+
+    def __repr__(self):
+        return f"CompiledPlan(order={list(self.order)})"
+
+
+class PlanInstance:
+    """Per-execution view of a CompiledPlan: intent, reused results and in-degrees."""
+
+    __slots__ = ("compiled", "intent", "reused", "_remaining")
+
+    def __init__(self, compiled: CompiledPlan, intent: dict, reused: dict[str, Any]):
+        self.compiled = compiled
+        self.intent = intent
+        self.reused = reused
+        self._remaining = list(compiled.in_degree)
+
+    @property
+    def steps(self) -> tuple[str, ...]:
+        """Step ids in topological order."""
+        return self.compiled.order
+
+    def roots(self) -> list[int]:
+        """Indexes of steps without dependencies."""
+        return list(self.compiled.roots)
+
+    def complete(self, index: int) -> list[int]:
+        """Mark a step done and return the indexes of steps it made ready."""
+        ready = []
+        for dependent in self.compiled.dependents[index]:
+            self._remaining[dependent] -= 1
+            if self._remaining[dependent] == 0:
+                ready.append(dependent)
+        return ready
+
     def __repr__(self):
-        return f"Plan(nodes={list(self.nodes.keys())})"
\ No newline at end of file
+        return f"PlanInstance(steps={list(self.steps)}, reused={list(self.reused)})"
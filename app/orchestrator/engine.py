@@ -5,24 +5,20 @@ Dispatches to service agents and tracks results.
 """
 from typing import Any
 import asyncio
-from app.orchestrator.dag import Plan, PlanNode
-from app.agents.gmail import GmailAgent
-from app.agents.gcal import GCalAgent
+import time
+from app.core import profiling
+from app.orchestrator import tracing
+from app.orchestrator.dag import PlanInstance
+from app.agents.registry import AgentRegistry, agent_registry
+from app.db.session import SessionScope
 
 
 class OrchestratorEngine:
     """Execute a Plan (DAG) by resolving dependencies and running steps."""
 
-    # Mapping of step_id to service
-    STEP_TO_SERVICE = {
-        "search_gmail_for_booking": "gmail",
-        "draft_cancellation_email": "gmail",
-        "find_calendar_event": "gcal",
-    }
-
-    def __init__(self):
-        self.gmail_agent = GmailAgent()
-        self.gcal_agent = GCalAgent()
+    def __init__(self, registry: AgentRegistry | None = None):
+        # Steps are dispatched through the registry; agents are shared per process
+        self.registry = registry or agent_registry
 
     def _resolve_service(self, step_id: str) -> str:
         """Resolve which service handles a step.
@@ -33,45 +29,99 @@ class OrchestratorEngine:
         Returns:
             Service name (e.g., "gmail", "gcal", "gdrive") or "unknown"
         """
-        return self.STEP_TO_SERVICE.get(step_id, "unknown")
+        return self.registry.service_for(step_id)
 
-    async def execute(self, plan: Plan, context: dict) -> dict:
+    async def execute(self, plan: PlanInstance, context: dict) -> dict:
         """Execute all nodes in a plan.
 
+        Steps run in waves: every step whose dependencies are complete runs
+        concurrently, driven by the plan's precomputed in-degree table.
+
         Args:
-            plan: Plan (DAG) to execute
+            plan: Plan instance (DAG) to execute
             context: Execution context (optional state/data)
 
         Returns:
             Dict mapping step_id -> result
         """
-        completed: set[str] = set()
         results: dict[str, Any] = {}
 
         context = context or {}
         context["user_id"] = context.get("user_id")
-        context["intent"] = getattr(plan, "intent", {})
-
-        while len(completed) < len(plan.nodes):
-            ready_nodes = plan.get_ready_nodes(completed)
+        context["intent"] = plan.intent
+
+        # Results reused from earlier turns of the conversation
+        for step_id, result in plan.reused.items():
+            results[step_id] = result
+            context[step_id] = result
+
+        # One connection per concurrent branch for the whole orchestration. A
+        # scope passed in the context (shared with speculative steps) stays
+        # open for its owner to close.
+        db_scope = context.get("db_scope")
+        owns_scope = db_scope is None
+        if owns_scope:
+            db_scope = context["db_scope"] = SessionScope()
+
+        steps = plan.steps
+        try:
+            with profiling.stage("embed"):
+                embeddings = context.setdefault("embeddings", {})
+                embeddings.update(await self._embed_plan(steps, context))
+
+            ready = plan.roots()
+            while ready:
+                batch_results = await asyncio.gather(
+                    *(self._timed_step(steps[index], context) for index in ready)
+                )
+
+                next_ready: list[int] = []
+                for index, result in zip(ready, batch_results):
+                    results[steps[index]] = result
+                    context[steps[index]] = result
+                    next_ready.extend(plan.complete(index))
+                ready = next_ready
+        finally:
+            if owns_scope:
+                context.pop("db_scope", None)
+                await db_scope.close()
 
-            if not ready_nodes:
-                raise RuntimeError("Circular dependency or missing nodes")
-
-            tasks = [
-                self._execute_step(node.id, context)
-                for node in ready_nodes
-            ]
+        return results
 
-            batch_results = await asyncio.gather(*tasks)
+    async def _embed_plan(self, steps: tuple[str, ...], context: dict) -> dict[str, list[float]]:
+        """Embed every text the plan's steps need in one batched call.
 
-            for node, result in zip(ready_nodes, batch_results):
-                node.result = result
-                results[node.id] = result
-                completed.add(node.id)
-                context[node.id] = result
+        Texts already in context["embeddings"] (embedded for speculative
+        steps) are skipped.
 
-        return results
+        Returns:
+            Dict mapping text -> vector, exposed to agents as context["embeddings"]
+        """
+        texts_by_step: dict[str, list[str]] = {}
+        for step_id in steps:
+            agent = self.registry.agent_for(step_id)
+            if agent is not None:
+                texts_by_step[step_id] = agent.embedding_texts(step_id, context)
+        known = context.get("embeddings") or {}
+        texts = list(dict.fromkeys(
+            text for step_texts in texts_by_step.values() for text in step_texts if text not in known
+        ))
+        if not texts:
+            return {}
+
+        started = time.perf_counter()
+        vectors = await self.registry.resources.embeddings.embed_many(texts)
+        recorder = tracing.current()
+        if recorder is not None:
+            recorder.add_embeddings(texts_by_step, (time.perf_counter() - started) * 1000)
+        return dict(zip(texts, vectors))
+
+    async def _timed_step(self, step_id: str, context: dict) -> dict:
+        recorder = tracing.current()
+        with profiling.stage(f"step:{step_id}"):
+            if recorder is None:
+                return await self._execute_step(step_id, context)
+            return await recorder.step(step_id, context, self._execute_step(step_id, context))
 
     async def _execute_step(self, step_id: str, context: dict) -> dict:
         """Execute a single step and return result.
@@ -83,13 +133,23 @@ class OrchestratorEngine:
         Returns:
             Result dict
         """
-        # Resolve which service handles this step
-        service = self._resolve_service(step_id)
-
-        if service == "gmail":
-            return await self.gmail_agent.handle(step_id, context)
-        elif service == "gcal":
-            return await self.gcal_agent.handle(step_id, context)
+        # Adopt a speculative run of this step (app/orchestrator/speculation.py)
+        prefetched = context.get("prefetched")
+        speculative = prefetched.pop(step_id, None) if prefetched else None
+        if speculative is not None:
+            try:
+                result, published = await speculative
+            except Exception:
+                # Speculation failed; run the step for real
+                pass
+            else:
+                context.update(published)
+                return result
+
+        agent = self.registry.agent_for(step_id)
+
+        if agent is not None:
+            return await agent.handle(step_id, context)
         elif step_id == "send_email":
             return await self._send_email(context)
         else:
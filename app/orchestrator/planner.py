@@ -1,35 +1,61 @@
 """Planner converts intent into a DAG execution plan.
 
 Takes structured intent from IntentClassifier and builds a Plan
-with nodes and dependencies.
+with nodes and dependencies, compiled once per step signature.
 """
-from app.orchestrator.dag import Plan, PlanNode
+from functools import lru_cache
+
+from app.orchestrator.dag import CompiledPlan, Plan, PlanInstance, PlanNode
 
 
 class QueryPlanner:
     """Convert intent classification into an execution plan."""
 
-    def build_plan(self, intent: dict) -> Plan:
-        plan = Plan()
+    # Read-only steps whose results can be reused within a conversation.
+    # Steps with side effects (drafts, sends) always run.
+    REUSABLE_STEPS = frozenset({
+        "search_gmail_for_booking",
+        "search_gmail",
+        "find_calendar_event",
+        "search_drive_files",
+    })
+
+    def build_plan(self, intent: dict, known_results: dict | None = None) -> PlanInstance:
+        """Build a sequential plan for the intent's steps.
+
+        Compiled plans are cached per step signature, so planning a known
+        intent shape only allocates the per-run instance.
+
+        Args:
+            intent: Classified intent with a `steps` list
+            known_results: Fresh results of earlier turns (step_id -> result);
+                reusable steps found here are skipped and exposed as
+                `plan.reused` instead of becoming plan nodes
+
+        Returns:
+            PlanInstance ready for execution
+        """
+        known_results = known_results or {}
         steps = intent.get("steps", [])
 
-        # Attach intent metadata to plan (useful later)
-        plan.intent = intent
+        reused = {
+            step: {**known_results[step], "reused": True}
+            for step in steps
+            if step in self.REUSABLE_STEPS and step in known_results
+        }
+        remaining = tuple(step for step in steps if step not in reused)
 
-        if not steps:
-            return plan
+        return compile_sequential(remaining).instantiate(intent=intent, reused=reused)
 
-        # First node
-        plan.add_node(PlanNode(id=steps[0], dependencies=[]))
 
-        # Sequential dependency chain
-        for i in range(1, len(steps)):
-            plan.add_node(
-                PlanNode(
-                    id=steps[i],
-                    dependencies=[steps[i - 1]],
-                )
-            )
+@lru_cache(maxsize=256)
+def compile_sequential(steps: tuple[str, ...]) -> CompiledPlan:
+    """Compile steps into a chain where each step depends on the previous one.
 
-        plan.validate()
-        return plan
\ No newline at end of file
+    Raises:
+        ValueError: If a step appears twice
+    """
+    plan = Plan()
+    for i, step in enumerate(steps):
+        plan.add_node(PlanNode(id=step, dependencies=[steps[i - 1]] if i else []))
+    return plan.compile()
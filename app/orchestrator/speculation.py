@@ -0,0 +1,121 @@
+"""Speculative prefetch while intent classification is in flight.
+
+When the rule tier resolves a query, `classify` returns without awaiting
+anything and there is nothing to overlap. Otherwise the router or LLM tier
+runs, and retrieval would wait on it. A speculation starts from the
+classifier's low-confidence rule guess and, concurrently with `classify`,
+runs the guessed plan's root steps if they are read-only.
+
+Speculative steps run on the orchestration's SessionScope and embed their
+texts in one batched call into the shared context["embeddings"], so the
+engine neither opens extra connections nor embeds those texts again.
+
+Once the real intent is known, speculative steps that the plan runs with the
+same entities are adopted: the engine awaits them instead of executing the
+step again. Everything else is cancelled; outcomes are exported as
+`orchestrator_speculation_total{outcome="adopted"|"wasted"|"mismatched"}`.
+"""
+import asyncio
+import logging
+
+from app.core.metrics import metrics
+from app.orchestrator.dag import PlanInstance
+from app.orchestrator.planner import QueryPlanner, compile_sequential
+from app.services.conversation_state import CONTEXT_KEYS, entities_signature
+
+logger = logging.getLogger(__name__)
+
+
+class Speculation:
+    """Speculative step executions for one orchestration.
+
+    `context` is the orchestration's context; it should already hold the
+    SessionScope (context["db_scope"]) the engine will run on.
+    """
+
+    def __init__(self, engine, context: dict):
+        self.engine = engine
+        self.context = context
+        self._tasks: dict[str, tuple[asyncio.Task, str]] = {}
+        self._embedding: asyncio.Task | None = None
+        self._mismatched: set[str] = set()
+
+    def start(self, guess: dict, skip=frozenset()) -> None:
+        """Start speculative work. Must be called from a running event loop.
+
+        Args:
+            guess: Low-confidence intent guess
+            skip: Steps that will not run anyway (e.g. reused from the conversation)
+        """
+        compiled = compile_sequential(tuple(guess.get("steps", ())))
+        steps = tuple(
+            step_id
+            for step_id in (compiled.order[index] for index in compiled.roots)
+            if step_id in QueryPlanner.REUSABLE_STEPS and step_id not in skip
+        )
+        if not steps:
+            return
+
+        # Shared with the engine, which skips texts already embedded here
+        embeddings = self.context.setdefault("embeddings", {})
+        self._embedding = asyncio.create_task(self._embed(steps, {**self.context, "intent": guess}, embeddings))
+        signature = entities_signature(guess)
+        for step_id in steps:
+            context = {**self.context, "intent": guess}
+            task = asyncio.create_task(self._run(step_id, context))
+            self._tasks[step_id] = (task, signature)
+
+    def adopt(self, intent: dict, plan: PlanInstance) -> dict[str, asyncio.Task]:
+        """Split speculative steps into adoptable ones and cancelled ones.
+
+        Returns:
+            step_id -> task, for the engine to await in place of execution
+        """
+        signature = entities_signature(intent)
+        planned = set(plan.steps)
+        adopted = {}
+        for step_id, (task, task_signature) in self._tasks.items():
+            if step_id in planned and task_signature == signature:
+                adopted[step_id] = task
+            else:
+                task.cancel()
+                self._mismatched.add(step_id)
+                metrics.inc("orchestrator_speculation_total", step=step_id, outcome="mismatched")
+        return adopted
+
+    async def finish(self, unconsumed: dict[str, asyncio.Task]) -> None:
+        """Cancel adopted tasks the engine never reached and record outcomes.
+
+        Waits for cancelled tasks to unwind, so none still holds a session
+        of the scope when its owner closes it.
+        """
+        for step_id in self._tasks:
+            if step_id in self._mismatched:
+                continue
+            if step_id in unconsumed:
+                unconsumed[step_id].cancel()
+                metrics.inc("orchestrator_speculation_total", step=step_id, outcome="wasted")
+            else:
+                metrics.inc("orchestrator_speculation_total", step=step_id, outcome="adopted")
+        if self._embedding is not None:
+            self._embedding.cancel()
+            await asyncio.gather(self._embedding, return_exceptions=True)
+        await asyncio.gather(*(task for task, _ in self._tasks.values()), return_exceptions=True)
+
+    async def _embed(self, steps: tuple[str, ...], context: dict, embeddings: dict) -> None:
+        embeddings.update(await self.engine._embed_plan(steps, context))
+
+    async def _run(self, step_id: str, context: dict) -> tuple[dict, dict]:
+        """Run one step on a private context; return its result and published keys."""
+        try:
+            await asyncio.shield(self._embedding)
+        except Exception:
+            # The step embeds its own texts
+            logger.debug("Speculative embedding failed", exc_info=True)
+        result = await self.engine._execute_step(step_id, context)
+        published = {
+            key: context[key]
+            for key in CONTEXT_KEYS
+            if context.get(key) is not None and context.get(key) != self.context.get(key)
+        }
+        return result, published
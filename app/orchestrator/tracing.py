@@ -0,0 +1,231 @@
+"""Record orchestration traces for offline replay.
+
+A sampled share of orchestrations (TRACE_SAMPLE_RATE) is recorded as a
+trace holding:
+
+- the query, the classified intent and its classification time
+- the plan's steps and the results it reused from earlier turns
+- the engine's embedding batch: the texts each step asked for, and latency
+- for every executed step: its start offset and duration, its result, the
+  context keys it published, and the SQL it ran (fingerprint and duration)
+
+Traces are JSON objects pushed onto a capped Redis list. They are exported
+and replayed by `python -m app.bench.replay`, which feeds the recorded
+results back with their original or scaled latencies.
+
+Nothing is recorded, and no SQL listeners are installed, unless a trace is
+being captured.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Awaitable, Iterator
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.conversation_state import CONTEXT_KEYS
+
+logger = logging.getLogger(__name__)
+
+TRACES_KEY = "traces"
+TRACE_VERSION = 1
+
+_current: ContextVar["TraceRecorder | None"] = ContextVar("trace", default=None)
+_current_step: ContextVar[str | None] = ContextVar("trace_step", default=None)
+_NOOP = nullcontext()
+
+
+class TraceRecorder:
+    """Collects one orchestration's trace."""
+
+    def __init__(self, user_id: str, query: str):
+        self._started = time.perf_counter()
+        self.trace = {
+            "v": TRACE_VERSION,
+            "id": str(uuid.uuid4()),
+            "recorded_at": time.time(),
+            "user_id": user_id,
+            "query": query,
+            "intent": None,
+            "stages_ms": {},
+            "plan": {"steps": [], "reused": {}},
+            "embeddings": {"texts": {}, "batch_ms": 0.0},
+            "steps": {},
+            "total_ms": 0.0,
+        }
+
+    def _offset_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def set_plan(self, intent: dict, steps, reused: dict) -> None:
+        self.trace["intent"] = intent
+        self.trace["plan"] = {"steps": list(steps), "reused": reused}
+
+    def add_stage(self, name: str, ms: float) -> None:
+        self.trace["stages_ms"][name] = self.trace["stages_ms"].get(name, 0.0) + ms
+
+    def add_embeddings(self, texts_by_step: dict[str, list[str]], ms: float) -> None:
+        self.trace["embeddings"] = {"texts": texts_by_step, "batch_ms": ms}
+
+    def add_sql(self, step_id: str | None, statement: str, ms: float) -> None:
+        # Imported lazily: app.db pulls in the engine
+        from app.db.slow_queries import fingerprint
+
+        step = self.trace["steps"].setdefault(step_id or "_unattributed", {"sql": []})
+        step.setdefault("sql", []).append({"statement": fingerprint(statement)[0], "ms": round(ms, 3)})
+
+    async def step(self, step_id: str, context: dict, execution: Awaitable[dict]) -> dict:
+        """Await a step's execution and record its timing, result and published keys."""
+        before = {key: context.get(key) for key in CONTEXT_KEYS}
+        token = _current_step.set(step_id)
+        offset = self._offset_ms()
+        try:
+            result = await execution
+        finally:
+            _current_step.reset(token)
+        entry = self.trace["steps"].setdefault(step_id, {"sql": []})
+        entry.update({
+            "offset_ms": round(offset, 3),
+            "duration_ms": round(self._offset_ms() - offset, 3),
+            "result": result,
+            "published": {
+                key: context[key]
+                for key in CONTEXT_KEYS
+                if context.get(key) is not None and context.get(key) != before[key]
+            },
+        })
+        return result
+
+    def finish(self) -> dict:
+        self.trace["total_ms"] = round(self._offset_ms(), 3)
+        return self.trace
+
+
+def current() -> TraceRecorder | None:
+    return _current.get()
+
+
+@contextmanager
+def _timed_stage(recorder: TraceRecorder, name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_stage(name, (time.perf_counter() - started) * 1000)
+
+
+def stage(name: str):
+    """Time a block as a named stage of the trace being recorded, if any."""
+    recorder = _current.get()
+    if recorder is None:
+        return _NOOP
+    return _timed_stage(recorder, name)
+
+
+# ---------------------------------------------------------------------------
+# SQL attribution (listeners installed only while a trace is recorded)
+# ---------------------------------------------------------------------------
+
+_sql_lock = threading.Lock()
+_sql_captures = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _current.get()
+    started = conn.info.get("trace_started")
+    if recorder is not None and started:
+        recorder.add_sql(_current_step.get(), statement, (time.perf_counter() - started.pop()) * 1000)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches _after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    started = conn.info.get("trace_started") if conn is not None else None
+    if started:
+        started.pop()
+
+
+def _sql_engine():
+    # Imported lazily: the session module creates the engine on import
+    from app.db.session import engine
+
+    return engine.sync_engine
+
+
+def _listen_sql() -> None:
+    global _sql_captures
+    with _sql_lock:
+        _sql_captures += 1
+        if _sql_captures == 1:
+            event.listen(_sql_engine(), "before_cursor_execute", _before_cursor_execute)
+            event.listen(_sql_engine(), "after_cursor_execute", _after_cursor_execute)
+            event.listen(_sql_engine(), "handle_error", _handle_error)
+
+
+def _unlisten_sql() -> None:
+    global _sql_captures
+    with _sql_lock:
+        _sql_captures -= 1
+        if _sql_captures == 0:
+            event.remove(_sql_engine(), "before_cursor_execute", _before_cursor_execute)
+            event.remove(_sql_engine(), "after_cursor_execute", _after_cursor_execute)
+            event.remove(_sql_engine(), "handle_error", _handle_error)
+
+
+@contextmanager
+def recording(recorder: TraceRecorder) -> Iterator[TraceRecorder]:
+    """Make `recorder` the active recorder for the enclosed block."""
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture(user_id: str, query: str, sample_rate: float | None = None) -> Iterator[TraceRecorder | None]:
+    """Record the enclosed orchestration with probability `sample_rate`.
+
+    Only orchestrations that complete are stored.
+    """
+    sample_rate = settings.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        yield None
+        return
+
+    recorder = TraceRecorder(user_id, query)
+    _listen_sql()
+    try:
+        with recording(recorder):
+            yield recorder
+    finally:
+        _unlisten_sql()
+    store_trace(recorder.finish())
+
+
+def store_trace(trace: dict) -> None:
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.lpush(TRACES_KEY, json.dumps(trace, default=str))
+        pipe.ltrim(TRACES_KEY, 0, settings.TRACE_MAX_STORED - 1)
+        pipe.execute()
+    except Exception:
+        logger.warning("Could not store trace %s", trace["id"], exc_info=True)
+
+
+def load_traces(limit: int | None = None) -> list[dict]:
+    """Stored traces, oldest first."""
+    raw = get_redis().lrange(TRACES_KEY, 0, -1 if limit is None else limit - 1)
+    return [json.loads(item) for item in reversed(raw)]
@@ -0,0 +1,132 @@
+"""Admission control for submitted queries.
+
+A query is shed with `429 Too Many Requests` instead of enqueued when
+
+- its queue already holds `ADMISSION_MAX_QUEUE_DEPTH` waiting tasks while
+  every worker slot is busy (a backlog that would take too long to drain), or
+- the user's token bucket is empty (`RATE_LIMIT_PER_SECOND` sustained,
+  `RATE_LIMIT_BURST` peak).
+
+Busy slots are the queue's unexpired fair-share leases
+(app/services/scheduling.py). Leases left behind by crashed workers expire,
+so lost releases cannot keep the API shedding load.
+
+Both checks live in Redis so limits hold across API instances. Redis errors
+fail open: an unavailable limiter must not take the API down with it.
+"""
+import logging
+import math
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+from app.services.scheduling import fair_share, queue_depths
+
+logger = logging.getLogger(__name__)
+
+# Refill and take one token. Returns {allowed, milliseconds until a token is available}.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+
+local allowed = 0
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait_ms}
+"""
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    admitted: bool
+    reason: str = "admitted"
+    retry_after: int = 0
+
+
+ADMITTED = AdmissionDecision(admitted=True)
+
+
+class AdmissionController:
+    """Decide whether a query may be enqueued now."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._token_bucket = None
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def admit(self, user_id: str, queue: str) -> AdmissionDecision:
+        """Check queue load first, then the user's rate limit.
+
+        Load is checked first so a shed request does not also spend a token.
+        """
+        decision = self._check_load(queue)
+        if decision.admitted:
+            decision = self._check_rate(user_id)
+
+        metrics.inc("orchestrator_admission_total", queue=queue, decision=decision.reason)
+        return decision
+
+    def _check_load(self, queue: str) -> AdmissionDecision:
+        """Shed when the backlog is deep and every worker slot holds a live lease."""
+        try:
+            depth = queue_depths(self.redis)[queue]
+            inflight = fair_share.inflight(queue)
+        except Exception:
+            logger.warning("Queue load unavailable; admitting", exc_info=True)
+            return ADMITTED
+
+        capacity = settings.ADMISSION_WORKER_CAPACITY
+        if depth < settings.ADMISSION_MAX_QUEUE_DEPTH or inflight < capacity:
+            return ADMITTED
+
+        # Roughly how long the current backlog takes to drain
+        drain_seconds = depth / capacity * settings.ADMISSION_TASK_SECONDS_ESTIMATE
+        return AdmissionDecision(
+            admitted=False,
+            reason="overloaded",
+            retry_after=max(1, math.ceil(drain_seconds)),
+        )
+
+    def _check_rate(self, user_id: str) -> AdmissionDecision:
+        if settings.RATE_LIMIT_PER_SECOND <= 0:
+            return ADMITTED
+        if self._token_bucket is None:
+            self._token_bucket = self.redis.register_script(_TOKEN_BUCKET_SCRIPT)
+        try:
+            allowed, wait_ms = self._token_bucket(
+                keys=[f"ratelimit:{user_id}"],
+                args=[settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST],
+            )
+        except Exception:
+            logger.warning("Rate limiter unavailable; admitting", exc_info=True)
+            return ADMITTED
+
+        if allowed:
+            return ADMITTED
+        return AdmissionDecision(
+            admitted=False,
+            reason="rate_limited",
+            retry_after=max(1, math.ceil(wait_ms / 1000)),
+        )
+
+
+admission_controller = AdmissionController()
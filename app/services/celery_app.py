@@ -1,5 +1,15 @@
 from celery import Celery
+from kombu import Queue
+
 from app.core.config import settings
+from app.services.scheduling import (
+    BATCH_QUEUE,
+    INGEST_QUEUE,
+    INTERACTIVE_QUEUE,
+    PRIORITY_SEP,
+    PRIORITY_STEPS,
+    QUEUES,
+)
 
 celery_app = Celery(
     "orchestrator",
@@ -7,5 +17,41 @@ celery_app = Celery(
     backend=settings.REDIS_URL,
 )
 
+# Separate queues per workload; priorities are emulated per queue by the
+# Redis transport (0 = served first). See app/services/scheduling.py.
+celery_app.conf.update(
+    task_queues=[Queue(name) for name in QUEUES],
+    task_default_queue=INTERACTIVE_QUEUE,
+    task_routes={
+        "app.services.tasks.run_orchestration": {"queue": INTERACTIVE_QUEUE},
+        "app.services.tasks.flush_conversations": {"queue": BATCH_QUEUE},
+        "app.services.tasks.backfill_entities": {"queue": INGEST_QUEUE},
+    },
+    broker_transport_options={
+        "priority_steps": list(PRIORITY_STEPS),
+        "sep": PRIORITY_SEP,
+        "queue_order_strategy": "priority",
+    },
+    # One message per worker process at a time: a long task cannot hold
+    # prefetched interactive messages hostage, and priorities stay effective
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    # Results are slim msgpack projections (app/services/results.py) that
+    # expire. Task messages keep Celery's JSON serializer, and JSON results
+    # the backend still holds from before the switch can be read
+    result_serializer="msgpack",
+    accept_content=["json", "msgpack"],
+    result_accept_content=["json", "msgpack"],
+    result_expires=settings.RESULT_EXPIRES_SECONDS,
+)
+
+# Periodic write-behind flush of buffered conversation records
+celery_app.conf.beat_schedule = {
+    "flush-conversations": {
+        "task": "app.services.tasks.flush_conversations",
+        "schedule": settings.CONVERSATION_FLUSH_INTERVAL_SECONDS,
+    },
+}
+
 # Explicit task discovery
 celery_app.autodiscover_tasks(["app.services"])
\ No newline at end of file
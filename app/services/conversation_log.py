@@ -0,0 +1,189 @@
+"""Write-behind persistence for conversation history.
+
+The pipeline only appends a record to a Redis list; a periodic flusher
+bulk-inserts buffered records into the `conversations` table. This keeps
+the database write off the critical path of every query.
+
+Delivery is at-least-once: records are moved to a processing list before
+the insert and only removed after it commits, so a crashed flush is retried
+by the next one. Record ids are generated up front and inserted with
+ON CONFLICT DO NOTHING, which makes redelivery harmless. The pending list
+is trimmed to a fixed length, so a stalled database cannot exhaust Redis
+memory.
+
+A batch that fails to insert is retried row by row, so one bad record (say,
+an unknown user_id) cannot block the log. Rows that still fail while others
+succeed are moved to a dead-letter list. When every row fails, the database
+is assumed to be down and the batch is retried by later flushes. After
+CONVERSATION_FLUSH_MAX_ATTEMPTS failed flushes it is dead-lettered as well.
+"""
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.db.models import Conversation
+from app.db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "conversations:pending"
+PROCESSING_KEY = "conversations:processing"
+FLUSH_LOCK_KEY = "conversations:flush_lock"
+ATTEMPTS_KEY = "conversations:processing_attempts"
+DEAD_LETTER_KEY = "conversations:dead_letter"
+
+# Delete the lock only if it still holds this flusher's token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ConversationRecorder:
+    """Buffer conversation records in Redis and flush them in batches."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def record(self, user_id: str, query: str, intent: dict, response: str) -> None:
+        """Buffer one conversation record. Never raises into the caller."""
+        record = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "query": query,
+            "intent": intent,
+            "response": response,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lpush(PENDING_KEY, json.dumps(record))
+            # Bound memory: keep the newest records if flushing falls behind
+            pipe.ltrim(PENDING_KEY, 0, settings.CONVERSATION_BUFFER_MAX_PENDING - 1)
+            pipe.execute()
+        except Exception:
+            logger.warning("Dropping conversation record; buffer unavailable", exc_info=True)
+
+    async def flush(self, batch_size: int | None = None, max_batches: int = 20) -> int:
+        """Bulk-insert buffered records. Returns the number of records written.
+
+        Never raises when Redis is unavailable: records left in the buffer are
+        flushed by a later run.
+        """
+        batch_size = batch_size or settings.CONVERSATION_FLUSH_BATCH_SIZE
+
+        # Only one flusher at a time owns the processing list
+        lock_ttl = max(30, int(settings.CONVERSATION_FLUSH_INTERVAL_SECONDS * 10))
+        token = str(uuid.uuid4())
+        try:
+            if not self.redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=lock_ttl):
+                return 0
+        except Exception:
+            logger.warning("Skipping conversation flush; buffer unavailable", exc_info=True)
+            return 0
+
+        written = 0
+        try:
+            for _ in range(max_batches):
+                # Records stranded by a failed flush are retried first
+                raw_records = self.redis.lrange(PROCESSING_KEY, 0, -1)
+                if not raw_records:
+                    raw_records = self._claim(batch_size)
+                if not raw_records:
+                    break
+
+                inserted = await self._insert_batch(raw_records)
+                if inserted is None:
+                    break
+                written += inserted
+        except Exception:
+            logger.warning("Conversation flush interrupted; buffer unavailable", exc_info=True)
+        finally:
+            # The lock may have expired and been taken by another flusher
+            try:
+                self.redis.eval(_RELEASE_SCRIPT, 1, FLUSH_LOCK_KEY, token)
+            except Exception:
+                logger.warning("Could not release the flush lock; it expires in %ds", lock_ttl, exc_info=True)
+
+        return written
+
+    async def _insert_batch(self, raw_records: list[bytes]) -> int | None:
+        """Insert the processing list and clear it.
+
+        Returns:
+            Rows inserted, or None when the batch stays in processing for the
+            next flush
+        """
+        try:
+            await self._insert([json.loads(raw) for raw in raw_records])
+            self._done()
+            return len(raw_records)
+        except Exception:
+            logger.warning("Conversation batch insert failed; retrying row by row", exc_info=True)
+
+        failed = []
+        for raw in raw_records:
+            try:
+                await self._insert([json.loads(raw)])
+            except Exception:
+                failed.append(raw)
+
+        if len(failed) == len(raw_records):
+            attempts = self.redis.incr(ATTEMPTS_KEY)
+            if attempts < settings.CONVERSATION_FLUSH_MAX_ATTEMPTS:
+                logger.warning("No conversation record could be inserted (attempt %d)", attempts)
+                return None
+        if failed:
+            logger.error("Moving %d conversation records to %s", len(failed), DEAD_LETTER_KEY)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lpush(DEAD_LETTER_KEY, *failed)
+            pipe.ltrim(DEAD_LETTER_KEY, 0, settings.CONVERSATION_BUFFER_MAX_PENDING - 1)
+            pipe.execute()
+        self._done()
+        return len(raw_records) - len(failed)
+
+    def _done(self) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(PROCESSING_KEY)
+        pipe.delete(ATTEMPTS_KEY)
+        pipe.execute()
+
+    def _claim(self, batch_size: int) -> list[bytes]:
+        """Move up to `batch_size` of the oldest pending records to processing."""
+        pipe = self.redis.pipeline(transaction=False)
+        for _ in range(batch_size):
+            pipe.lmove(PENDING_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+        return [raw for raw in pipe.execute() if raw is not None]
+
+    async def _insert(self, records: list[dict]) -> None:
+        rows = [
+            {
+                "id": uuid.UUID(record["id"]),
+                "user_id": uuid.UUID(record["user_id"]),
+                "query": record["query"],
+                "intent": record["intent"],
+                "response": record["response"],
+                "created_at": datetime.fromisoformat(record["created_at"]),
+            }
+            for record in records
+        ]
+        async with async_session() as db:
+            stmt = pg_insert(Conversation).values(rows).on_conflict_do_nothing(
+                index_elements=[Conversation.id]
+            )
+            await db.execute(stmt)
+            await db.commit()
+
+
+conversation_recorder = ConversationRecorder()
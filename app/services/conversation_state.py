@@ -0,0 +1,118 @@
+"""Conversation-scoped state for follow-up queries.
+
+Per `conversation_id`, Redis holds the intents seen so far, the results of
+read-only steps together with the entities they ran with, and context keys
+such as `booking_reference` and `event_date`. A follow-up like "now draft the
+cancellation" then reuses fresh search results instead of re-running every
+search from scratch.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Context keys agents publish for downstream steps, and the step publishing each
+CONTEXT_KEYS = {"booking_reference": "search_gmail_for_booking", "event_date": "find_calendar_event"}
+
+# Prior intents kept per conversation
+MAX_INTENTS = 10
+
+
+def entities_signature(intent: dict) -> str:
+    """Stable signature of the inputs a step ran with."""
+    return json.dumps(intent.get("entities", {}), sort_keys=True, default=str)
+
+
+@dataclass
+class ConversationState:
+    intents: list[dict] = field(default_factory=list)
+    steps: dict[str, dict] = field(default_factory=dict)
+    context: dict[str, dict] = field(default_factory=dict)
+
+    def fresh_results(self, intent: dict, max_age: float | None = None) -> dict[str, dict]:
+        """Step results still fresh and produced from the same entities as `intent`."""
+        max_age = settings.CONVERSATION_STEP_MAX_AGE_SECONDS if max_age is None else max_age
+        now = time.time()
+        signature = entities_signature(intent)
+        return {
+            step_id: entry["result"]
+            for step_id, entry in self.steps.items()
+            if now - entry["at"] <= max_age and entry["inputs"] == signature
+        }
+
+    def fresh_context(self, rerun=(), max_age: float | None = None) -> dict:
+        """Context keys published by earlier turns that are still fresh.
+
+        Args:
+            rerun: Steps that run again this turn; the keys they publish are
+                left out, so a miss does not leave the earlier value behind
+        """
+        max_age = settings.CONVERSATION_STEP_MAX_AGE_SECONDS if max_age is None else max_age
+        now = time.time()
+        return {
+            key: entry["value"]
+            for key, entry in self.context.items()
+            if now - entry["at"] <= max_age and CONTEXT_KEYS.get(key) not in rerun
+        }
+
+    def update(self, intent: dict, results: dict, context: dict, reusable_steps) -> None:
+        """Fold one turn's intent, reusable step results and context keys into the state."""
+        now = time.time()
+        signature = entities_signature(intent)
+
+        self.intents = (self.intents + [{"intent": intent, "at": now}])[-MAX_INTENTS:]
+
+        for step_id, result in results.items():
+            if step_id in reusable_steps and not result.get("reused"):
+                self.steps[step_id] = {"result": result, "inputs": signature, "at": now}
+
+        for key, step_id in CONTEXT_KEYS.items():
+            if context.get(key) is not None:
+                self.context[key] = {"value": context[key], "at": now}
+            elif step_id in results and not results[step_id].get("reused"):
+                # The step ran again without publishing the key
+                self.context.pop(key, None)
+
+
+class ConversationStore:
+    """Redis-backed ConversationState storage with a sliding TTL."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    @staticmethod
+    def _key(user_id: str, conversation_id: str) -> str:
+        return f"conversation_state:{user_id}:{conversation_id}"
+
+    def load(self, user_id: str, conversation_id: str) -> ConversationState:
+        """Load state, or an empty state for a new (or expired) conversation."""
+        try:
+            raw = self.redis.get(self._key(user_id, conversation_id))
+        except Exception:
+            logger.warning("Conversation state unavailable", exc_info=True)
+            return ConversationState()
+        if not raw:
+            return ConversationState()
+        return ConversationState(**json.loads(raw))
+
+    def save(self, user_id: str, conversation_id: str, state: ConversationState) -> None:
+        try:
+            self.redis.setex(
+                self._key(user_id, conversation_id),
+                settings.CONVERSATION_STATE_TTL_SECONDS,
+                json.dumps(asdict(state), default=str),
+            )
+        except Exception:
+            logger.warning("Failed to save conversation state", exc_info=True)
+
+
+conversation_store = ConversationStore()
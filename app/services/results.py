@@ -0,0 +1,82 @@
+"""Compact orchestration results.
+
+The Celery result backend only keeps a slim, versioned projection of each
+run: the synthesized message plus the per-step fields clients read. Full step
+outputs (email bodies, previews, file contents) are stored once, compressed,
+under `result_details:{task_id}` for `GET /query/{task_id}/details`, and both
+expire after a fixed time instead of accumulating in Redis.
+
+Stored details are msgpack, behind a leading codec byte.
+"""
+import logging
+import zlib
+
+import msgpack
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever a projected field is added or removed
+RESULT_VERSION = 1
+
+COMMON_FIELDS = ("status", "method", "message", "reused")
+STEP_FIELDS = {
+    "search_gmail_for_booking": ("email_id", "subject", "booking_reference"),
+    "search_gmail": ("emails",),
+    "find_calendar_event": ("event_id", "title", "start_time", "event_date"),
+    "search_drive_files": ("file_id", "name"),
+    "draft_cancellation_email": ("to", "subject", "body"),
+}
+
+# Leading byte of stored details: which codec produced the payload
+_MSGPACK = b"m"
+
+
+def slim_step(step_id: str, result: dict) -> dict:
+    """Project one step result onto the fields clients read."""
+    fields = COMMON_FIELDS + STEP_FIELDS.get(step_id, ())
+    return {key: result[key] for key in fields if key in result}
+
+
+def slim_result(message: str, results: dict) -> dict:
+    """Versioned payload stored in the Celery result backend."""
+    return {
+        "v": RESULT_VERSION,
+        "message": message,
+        "details": {step_id: slim_step(step_id, result) for step_id, result in results.items()},
+    }
+
+
+def encode(payload) -> bytes:
+    return _MSGPACK + zlib.compress(msgpack.packb(payload, default=str))
+
+
+def decode(raw: bytes):
+    codec, body = raw[:1], zlib.decompress(raw[1:])
+    if codec == _MSGPACK:
+        return msgpack.unpackb(body)
+    raise ValueError(f"Unknown result details codec {codec!r}")
+
+
+def _details_key(task_id: str) -> str:
+    return f"result_details:{task_id}"
+
+
+def store_details(task_id: str, results: dict) -> None:
+    """Store full step outputs for the detail endpoint. Never raises."""
+    try:
+        get_redis().setex(_details_key(task_id), settings.RESULT_EXPIRES_SECONDS, encode(results))
+    except Exception:
+        logger.warning("Failed to store result details for %s", task_id, exc_info=True)
+
+
+def load_details(task_id: str) -> dict | None:
+    """Stored step outputs, or None when missing, expired or unavailable."""
+    try:
+        raw = get_redis().get(_details_key(task_id))
+    except Exception:
+        logger.warning("Failed to load result details for %s", task_id, exc_info=True)
+        return None
+    return decode(raw) if raw else None
@@ -0,0 +1,178 @@
+"""Queue routing, priorities and per-user fair share for Celery work.
+
+Three queues keep workloads apart:
+
+- `interactive`: user queries someone is waiting on
+- `batch`: periodic and bulk housekeeping (conversation flushes, reports)
+- `ingest`: sync, seed and backfill jobs
+
+Interactive and background queues are consumed by separate workers (see
+docker-compose.yml), so a bulk job can never occupy the workers serving
+queries. Within a queue, the Redis transport emulates priorities with one
+list per priority step; lower numbers are served first.
+
+Fair share bounds how many tasks of one user run at once per queue. A task
+over its user's share is deferred with a short countdown instead of holding
+a worker, which lets other users' tasks through during a burst.
+
+Running tasks hold leases: members of a per-user and a queue-wide sorted
+set, scored by the lease deadline (FAIR_SHARE_SLOT_TTL_SECONDS). Expired
+leases are dropped before every count, so slots of workers that were
+killed before releasing them free themselves.
+"""
+import logging
+import random
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_QUEUE = "interactive"
+BATCH_QUEUE = "batch"
+INGEST_QUEUE = "ingest"
+QUEUES = (INTERACTIVE_QUEUE, BATCH_QUEUE, INGEST_QUEUE)
+
+# Redis transport priority steps (0 = served first)
+PRIORITY_STEPS = (0, 3, 6, 9)
+PRIORITY_SEP = ":"
+
+FOLLOW_UP_PRIORITY = 0
+INTERACTIVE_PRIORITY = 3
+BACKGROUND_PRIORITY = 6
+
+# Drop expired leases, then add lease ARGV[4] to the user's set (KEYS[1]) and
+# the queue-wide set (KEYS[2]) unless the user is at the limit (or `force` is
+# set). Scores are deadlines in server time.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) == false
+   and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) and ARGV[3] == '0' then
+    return 0
+end
+local deadline = now + tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], deadline, ARGV[4])
+redis.call('ZADD', KEYS[2], deadline, ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Unexpired leases on a queue
+_COUNT_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+def route_query(conversation_id: str | None, background: bool = False) -> dict:
+    """Derive queue and priority for an orchestration request.
+
+    Args:
+        conversation_id: Set for turns of an ongoing conversation
+        background: Caller does not wait on the result (bulk or scheduled runs)
+
+    Returns:
+        `apply_async` routing options
+    """
+    if background:
+        return {"queue": BATCH_QUEUE, "priority": BACKGROUND_PRIORITY}
+    # Follow-ups are usually cheap (reused steps) and the user is mid-conversation
+    priority = FOLLOW_UP_PRIORITY if conversation_id else INTERACTIVE_PRIORITY
+    return {"queue": INTERACTIVE_QUEUE, "priority": priority}
+
+
+def queue_keys(queue: str) -> list[str]:
+    """Redis list keys backing a queue, one per priority step."""
+    return [queue if step == 0 else f"{queue}{PRIORITY_SEP}{step}" for step in PRIORITY_STEPS]
+
+
+def queue_depths(redis_client=None) -> dict[str, int]:
+    """Number of messages waiting per queue, summed over priority steps."""
+    redis_client = redis_client or get_redis()
+    pipe = redis_client.pipeline(transaction=False)
+    for queue in QUEUES:
+        for key in queue_keys(queue):
+            pipe.llen(key)
+    lengths = iter(pipe.execute())
+    return {queue: sum(next(lengths) for _ in PRIORITY_STEPS) for queue in QUEUES}
+
+
+def _queue_depth_samples():
+    for queue, depth in queue_depths().items():
+        yield "orchestrator_queue_depth", {"queue": queue}, depth
+
+
+metrics.register_collector("queue_depth", _queue_depth_samples)
+
+
+class FairShare:
+    """Per-user, per-queue in-flight limits backed by Redis leases."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._acquire = None
+        self._count = None
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    @staticmethod
+    def _key(queue: str, user_id: str) -> str:
+        return f"inflight:{queue}:{user_id}"
+
+    @staticmethod
+    def _total_key(queue: str) -> str:
+        return f"inflight:{queue}"
+
+    def acquire(self, queue: str, user_id: str, lease_id: str, force: bool = False) -> bool:
+        """Lease one of the user's slots for `lease_id` (the task id).
+
+        `force` always succeeds (starvation guard). Re-acquiring a held lease
+        renews it.
+        """
+        if self._acquire is None:
+            self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        try:
+            return bool(self._acquire(
+                keys=[self._key(queue, user_id), self._total_key(queue)],
+                args=[
+                    settings.FAIR_SHARE_MAX_INFLIGHT_PER_USER,
+                    settings.FAIR_SHARE_SLOT_TTL_SECONDS,
+                    int(force),
+                    lease_id,
+                ],
+            ))
+        except Exception:
+            # Fail open: fairness is best-effort, queries must still run
+            logger.warning("Fair-share counter unavailable", exc_info=True)
+            return True
+
+    def release(self, queue: str, user_id: str, lease_id: str) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(self._key(queue, user_id), lease_id)
+            pipe.zrem(self._total_key(queue), lease_id)
+            pipe.execute()
+        except Exception:
+            logger.warning("Failed to release fair-share slot", exc_info=True)
+
+    def inflight(self, queue: str) -> int:
+        """Tasks of all users currently running on a queue (unexpired leases)."""
+        if self._count is None:
+            self._count = self.redis.register_script(_COUNT_SCRIPT)
+        return int(self._count(keys=[self._total_key(queue)]))
+
+    @staticmethod
+    def defer_countdown() -> float:
+        """Jittered delay before a deferred task is retried."""
+        base = settings.FAIR_SHARE_DEFER_SECONDS
+        return base + random.uniform(0, base)
+
+
+fair_share = FairShare()
@@ -0,0 +1,117 @@
+"""Single-flight coalescing of identical queries.
+
+Double submits, client retries and several dashboard tabs often send the same
+query within seconds. The first submitter claims
+`singleflight:{user_id}:{digest}` with the task id it is about to enqueue;
+later identical submissions within `SINGLEFLIGHT_WINDOW_SECONDS` receive that
+task id instead of starting another execution.
+
+The digest covers the normalized query and the conversation id, since the
+same text in another conversation may plan differently. Failed and cancelled
+tasks release their key so a retry runs again; since a cancelled task may
+never start, the leader's key is also recorded under
+`singleflight_task:{task_id}` for the cancel endpoint.
+"""
+import hashlib
+import logging
+import re
+import uuid
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the work done."""
+    return _WHITESPACE_RE.sub(" ", query).strip().rstrip("?!.").strip().lower()
+
+
+def flight_key(user_id: str, query: str, conversation_id: str | None = None) -> str:
+    digest = hashlib.sha1(
+        f"{conversation_id or ''}\x00{normalize_query(query)}".encode()
+    ).hexdigest()
+    return f"singleflight:{user_id}:{digest}"
+
+
+def _task_key(task_id: str) -> str:
+    return f"singleflight_task:{task_id}"
+
+
+class SingleFlight:
+    """Redis-backed registry of in-flight task ids."""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def lookup(self, user_id: str, query: str, conversation_id: str | None = None) -> str | None:
+        """Task id of an identical query in flight, if any."""
+        if settings.SINGLEFLIGHT_WINDOW_SECONDS <= 0:
+            return None
+        try:
+            task_id = self.redis.get(flight_key(user_id, query, conversation_id))
+        except Exception:
+            logger.warning("Single-flight registry unavailable", exc_info=True)
+            return None
+        if task_id:
+            metrics.inc("orchestrator_singleflight_total", outcome="joined")
+            return task_id.decode()
+        return None
+
+    def claim(self, user_id: str, query: str, conversation_id: str | None = None) -> tuple[str, bool]:
+        """Claim the query for a new task id.
+
+        Returns:
+            (task_id, leader): `leader` is False when a concurrent submitter won
+            the claim, in which case `task_id` is theirs and nothing should be
+            enqueued
+        """
+        task_id = str(uuid.uuid4())
+        if settings.SINGLEFLIGHT_WINDOW_SECONDS <= 0:
+            return task_id, True
+
+        key = flight_key(user_id, query, conversation_id)
+        try:
+            if self.redis.set(key, task_id, nx=True, ex=settings.SINGLEFLIGHT_WINDOW_SECONDS):
+                self.redis.set(_task_key(task_id), key, ex=settings.SINGLEFLIGHT_WINDOW_SECONDS)
+                metrics.inc("orchestrator_singleflight_total", outcome="leader")
+                return task_id, True
+            existing = self.redis.get(key)
+        except Exception:
+            logger.warning("Single-flight registry unavailable", exc_info=True)
+            return task_id, True
+
+        if existing:
+            metrics.inc("orchestrator_singleflight_total", outcome="joined")
+            return existing.decode(), False
+        # The winner's key expired in between; run without coalescing
+        return task_id, True
+
+    def release(self, user_id: str, query: str, conversation_id: str | None, task_id: str) -> None:
+        """Drop the claim if it still belongs to `task_id`."""
+        key = flight_key(user_id, query, conversation_id)
+        try:
+            if (self.redis.get(key) or b"").decode() == task_id:
+                self.redis.delete(key)
+        except Exception:
+            logger.warning("Failed to release single-flight key", exc_info=True)
+
+    def release_task(self, task_id: str) -> None:
+        """`release` for a cancelled task, knowing only its id."""
+        try:
+            key = self.redis.get(_task_key(task_id))
+            if key and (self.redis.get(key.decode()) or b"").decode() == task_id:
+                self.redis.delete(key.decode())
+        except Exception:
+            logger.warning("Failed to release single-flight key", exc_info=True)
+
+
+single_flight = SingleFlight()
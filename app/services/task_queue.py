@@ -1,19 +1,219 @@
-"""Placeholder for a task queue adapter (e.g., Celery, RQ, or a lightweight in-process queue).
-Keep interface small: enqueue(task), worker loop, status.
+"""In-process asyncio task queue, a broker-free alternative to Celery.
+
+With `TASK_BACKEND=local` the API runs orchestrations on this queue inside
+its own event loop, so single-node and development deployments need no
+broker or worker processes.
+
+Jobs wait in a priority heap (lower runs first, the scale of
+app/services/scheduling.py, FIFO within a priority) and a fixed number of
+worker coroutines run them: coroutine functions on the loop, plain functions
+in a thread. Each job has a future for its result and can be cancelled while
+pending or running. `drain` stops intake and waits for queued work to finish.
 """
-from typing import Callable, Any
+import asyncio
+import inspect
+import itertools
+import logging
+import uuid
+from collections import deque
+from typing import Callable
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+SUCCESS = "SUCCESS"
+FAILURE = "FAILURE"
+CANCELLED = "CANCELLED"
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds `max_pending` jobs."""
+
+
+class Job:
+    """A submitted call and its outcome."""
+
+    __slots__ = ("id", "func", "args", "kwargs", "priority", "state", "future", "task")
+
+    def __init__(self, job_id: str, func: Callable, args: tuple, kwargs: dict, priority: int, future: asyncio.Future):
+        self.id = job_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.state = PENDING
+        self.future = future
+        self.task: asyncio.Task | None = None
 
 
 class TaskQueue:
-    def __init__(self):
-        self._tasks = []
-
-    def enqueue(self, func: Callable[..., Any], *args, **kwargs):
-        self._tasks.append((func, args, kwargs))
-
-    def run_all(self):
-        results = []
-        while self._tasks:
-            func, args, kwargs = self._tasks.pop(0)
-            results.append(func(*args, **kwargs))
-        return results
+    """Priority queue drained by a bounded pool of worker coroutines."""
+
+    def __init__(self, workers: int = 4, max_pending: int | None = None, keep_results: int = 1000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_results = keep_results
+        self._heap: asyncio.PriorityQueue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._jobs: dict[str, Job] = {}
+        self._finished: deque[str] = deque()
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._running = 0
+        self._accepting = True
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def start(self) -> None:
+        """Start the workers on the running loop (idempotent)."""
+        if self._workers:
+            return
+        self._heap = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._accepting = True
+
+    def apply_async(
+        self,
+        func: Callable,
+        args: tuple = (),
+        kwargs: dict | None = None,
+        priority: int = 0,
+        task_id: str | None = None,
+    ) -> Job:
+        """Queue a call; the returned job's future resolves to its result.
+
+        Raises:
+            RuntimeError: While the queue is draining
+            QueueFull: When `max_pending` jobs are already waiting
+        """
+        if not self._accepting:
+            raise RuntimeError("Task queue is draining")
+        if self.max_pending is not None and self._pending >= self.max_pending:
+            raise QueueFull(f"{self._pending} jobs pending")
+        self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark failures as retrieved so unawaited futures do not log them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = Job(task_id or str(uuid.uuid4()), func, tuple(args), kwargs or {}, priority, future)
+        self._jobs[job.id] = job
+        self._pending += 1
+        self._heap.put_nowait((priority, next(self._sequence), job))
+        return job
+
+    def get(self, task_id: str) -> Job | None:
+        return self._jobs.get(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a pending or running job; False once it has finished."""
+        job = self._jobs.get(task_id)
+        if job is None:
+            return False
+        if job.state == PENDING:
+            # Left in the heap; workers skip it when popped
+            job.state = CANCELLED
+            job.future.cancel()
+            self._pending -= 1
+            self._retire(job)
+            return True
+        if job.state == RUNNING and job.task is not None:
+            job.task.cancel()
+            return True
+        return False
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Stop intake, wait for queued and running jobs, then stop the workers.
+
+        Jobs still unfinished after `timeout` seconds are cancelled.
+        """
+        self._accepting = False
+        if self._heap is not None:
+            try:
+                await asyncio.wait_for(self._heap.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Task queue drain timed out; cancelling %d pending job(s)", self._pending)
+        await self.shutdown()
+
+    async def shutdown(self) -> None:
+        """Cancel every unfinished job and stop the workers."""
+        self._accepting = False
+        for job in list(self._jobs.values()):
+            self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job = await self._heap.get()
+            try:
+                if job.state == PENDING:
+                    self._pending -= 1
+                    await self._run(job)
+            finally:
+                self._heap.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.state = RUNNING
+        self._running += 1
+        if inspect.iscoroutinefunction(job.func):
+            job.task = asyncio.create_task(job.func(*job.args, **job.kwargs))
+        else:
+            job.task = asyncio.create_task(asyncio.to_thread(job.func, *job.args, **job.kwargs))
+
+        # wait() does not propagate cancelling the job into the worker
+        try:
+            await asyncio.wait([job.task])
+        except asyncio.CancelledError:
+            # The worker is stopping: stop the job too and record it
+            job.task.cancel()
+            await asyncio.wait([job.task])
+            self._settle(job)
+            raise
+        self._settle(job)
+
+    def _settle(self, job: Job) -> None:
+        if job.task.cancelled():
+            job.state = CANCELLED
+            job.future.cancel()
+        elif job.task.exception() is not None:
+            job.state = FAILURE
+            job.future.set_exception(job.task.exception())
+        else:
+            job.state = SUCCESS
+            job.future.set_result(job.task.result())
+        job.task = None
+        self._running -= 1
+        metrics.inc("orchestrator_local_tasks_total", state=job.state)
+        self._retire(job)
+
+    def _retire(self, job: Job) -> None:
+        """Keep at most `keep_results` finished jobs, oldest dropped first."""
+        self._finished.append(job.id)
+        while len(self._finished) > self.keep_results:
+            self._jobs.pop(self._finished.popleft(), None)
+
+
+def _local_queue_samples():
+    yield "orchestrator_local_queue_pending", {}, local_queue.pending
+    yield "orchestrator_local_queue_running", {}, local_queue.running
+
+
+local_queue = TaskQueue(
+    workers=settings.LOCAL_TASK_WORKERS,
+    max_pending=settings.ADMISSION_MAX_QUEUE_DEPTH,
+    keep_results=settings.LOCAL_TASK_KEEP_RESULTS,
+)
+
+metrics.register_collector("local_queue", _local_queue_samples)
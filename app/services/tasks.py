@@ -1,39 +1,201 @@
 from app.services.celery_app import celery_app
 from app.orchestrator.engine import OrchestratorEngine
 from app.orchestrator.planner import QueryPlanner
+from app.orchestrator import tracing
+from app.orchestrator.speculation import Speculation
 from app.llm.classifier import IntentClassifier
 from app.llm.synthesizer import Synthesizer
+from app.services.conversation_log import conversation_recorder
+from app.services.conversation_state import CONTEXT_KEYS, ConversationState, conversation_store
+from app.services.scheduling import INTERACTIVE_QUEUE, fair_share
+from app.services.results import slim_result, store_details
+from app.services.singleflight import single_flight
+from app.db.session import SessionScope
+from app.core.config import settings
+from app.core import profiling
+from app.core.loop import run_async
+from app.core.metrics import metrics
 import asyncio
+import logging
+import time
 
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True)
+def run_orchestration(self, user_id: str, query: str, conversation_id: str | None = None, profile: bool = False):
+    """Run one orchestration within the user's fair share of the queue."""
+    delivery = self.request.delivery_info or {}
+    queue = delivery.get("routing_key") or INTERACTIVE_QUEUE
+
+    # Over the user's share: requeue behind other users instead of holding a worker.
+    # After enough deferrals the task runs anyway so it cannot starve.
+    exhausted = self.request.retries >= settings.FAIR_SHARE_MAX_DEFERRALS
+    if not fair_share.acquire(queue, user_id, self.request.id, force=exhausted):
+        metrics.inc("orchestrator_tasks_deferred_total", queue=queue)
+        raise self.retry(
+            countdown=fair_share.defer_countdown(),
+            max_retries=settings.FAIR_SHARE_MAX_DEFERRALS,
+            queue=queue,
+            priority=delivery.get("priority"),
+        )
+
+    started = time.perf_counter()
+    try:
+        message, results = _orchestrate(user_id, query, conversation_id, self.request.id if profile else None)
+    except Exception:
+        # Let a resubmission run again instead of joining the failed task
+        single_flight.release(user_id, query, conversation_id, self.request.id)
+        raise
+    finally:
+        fair_share.release(queue, user_id, self.request.id)
+        metrics.inc("orchestrator_tasks_total", queue=queue)
+        metrics.observe("orchestrator_task_seconds", time.perf_counter() - started, queue=queue)
+
+    # Full step outputs go to a compressed side key; the backend keeps the slim view
+    store_details(self.request.id, results)
+    return slim_result(message, results)
+
+
+def _orchestrate(
+    user_id: str,
+    query: str,
+    conversation_id: str | None,
+    profile_id: str | None = None,
+) -> tuple[str, dict]:
+    """Run the orchestration on the worker's persistent loop.
+
+    The loop is kept across tasks so loop-bound pools (LLM client, database)
+    are reused.
+    """
+    return run_async(orchestrate(user_id, query, conversation_id, profile_id))
+
+
+async def orchestrate(
+    user_id: str,
+    query: str,
+    conversation_id: str | None,
+    profile_id: str | None = None,
+) -> tuple[str, dict]:
+    """Classify, plan, execute and synthesize one query.
+
+    Args:
+        profile_id: Profile the run and store it under this id (see app/core/profiling.py)
+
+    Returns:
+        (synthesized message, full step results)
+    """
+    with profiling.capture(profile_id), tracing.capture(user_id, query):
+        return await _run_pipeline(user_id, query, conversation_id)
+
+
+async def _run_pipeline(user_id: str, query: str, conversation_id: str | None) -> tuple[str, dict]:
+    # Earlier turns of the conversation, if any
+    state = conversation_store.load(user_id, conversation_id) if conversation_id else ConversationState()
+
+    classifier = IntentClassifier()
+    engine = OrchestratorEngine()
+    # One SessionScope shared by speculative and planned steps
+    db_scope = SessionScope()
+    context = {"user_id": user_id, "query": query, "db_scope": db_scope}
+
+    speculation = None
+    try:
+        # 0. Speculate on a partial rule match while the slower tiers classify
+        guess = classifier.speculative_guess(query) if settings.SPECULATION_ENABLED else None
+        if guess:
+            reused = state.fresh_results(guess)
+            context.update(state.fresh_context(rerun=set(guess.get("steps", ())) - set(reused)))
+            speculation = Speculation(engine, context)
+            speculation.start(guess, skip=set(reused))
 
-@celery_app.task
-def run_orchestration(user_id: str, query: str):
-    """Wrapper task to run the async orchestration pipeline in a single loop."""
-    
-    # Define the entire flow as a single async function
-    async def _run_pipeline():
         # 1. Classify
-        classifier = IntentClassifier()
-        intent = await classifier.classify(query)
-
-        # 2. Plan
-        planner = QueryPlanner()
-        plan = planner.build_plan(intent)
-
-        # 3. Execute
-        engine = OrchestratorEngine()
-        results = await engine.execute(plan, {"user_id": user_id})
-        
-        return intent, results
-
-    # Execute the entire pipeline inside ONE event loop
-    intent, results = asyncio.run(_run_pipeline())
-
-    # 4. Synthesize (Synchronous)
-    synthesizer = Synthesizer()
-    message = synthesizer.synthesize(intent, results)
-
-    return {
-        "message": message,
-        "details": results
-    }
\ No newline at end of file
+        with profiling.stage("classify"), tracing.stage("classify"):
+            intent = await classifier.classify(query)
+
+        # 2. Plan (skipping steps whose results are still fresh)
+        with profiling.stage("plan"):
+            planner = QueryPlanner()
+            plan = planner.build_plan(intent, known_results=state.fresh_results(intent))
+        # Earlier keys are kept only where their step is reused, not run again
+        for key in CONTEXT_KEYS:
+            context.pop(key, None)
+        context.update(state.fresh_context(rerun=plan.steps))
+
+        recorder = tracing.current()
+        if recorder is not None:
+            recorder.set_plan(intent, plan.steps, plan.reused)
+
+        # 3. Execute, adopting matching speculative steps
+        if speculation:
+            context["prefetched"] = speculation.adopt(intent, plan)
+        with profiling.stage("execute"):
+            results = await engine.execute(plan, context)
+    finally:
+        if speculation:
+            await speculation.finish(context.pop("prefetched", {}))
+        context.pop("db_scope", None)
+        await db_scope.close()
+
+    # 4. Synthesize (LLM when enabled, else the template)
+    with profiling.stage("synthesize"), tracing.stage("synthesize"):
+        message = await Synthesizer().synthesize_async(intent, results)
+
+    if conversation_id:
+        state.update(intent, results, context, QueryPlanner.REUSABLE_STEPS)
+        conversation_store.save(user_id, conversation_id, state)
+
+    # 5. Record history off the critical path (flushed by flush_conversations)
+    conversation_recorder.record(user_id, query, intent, message)
+
+    return message, results
+
+
+async def run_orchestration_local(
+    task_id: str,
+    user_id: str,
+    query: str,
+    conversation_id: str | None = None,
+    profile: bool = False,
+):
+    """`run_orchestration` for TASK_BACKEND=local, run on the in-process queue.
+
+    The queue's bounded workers and priorities stand in for broker queues and
+    fair-share deferral.
+    """
+    started = time.perf_counter()
+    try:
+        message, results = await orchestrate(user_id, query, conversation_id, task_id if profile else None)
+    except (Exception, asyncio.CancelledError):
+        single_flight.release(user_id, query, conversation_id, task_id)
+        raise
+    finally:
+        metrics.inc("orchestrator_tasks_total", queue="local")
+        metrics.observe("orchestrator_task_seconds", time.perf_counter() - started, queue="local")
+
+    store_details(task_id, results)
+    return slim_result(message, results)
+
+
+@celery_app.task(ignore_result=True)
+def flush_conversations():
+    """Periodic task: bulk-insert buffered conversation records."""
+    return run_async(conversation_recorder.flush())
+
+
+async def flush_conversations_periodically() -> None:
+    """Beat-free stand-in for flush_conversations under TASK_BACKEND=local."""
+    while True:
+        await asyncio.sleep(settings.CONVERSATION_FLUSH_INTERVAL_SECONDS)
+        try:
+            await conversation_recorder.flush()
+        except Exception:
+            logger.warning("Conversation flush failed", exc_info=True)
+
+
+@celery_app.task
+def backfill_entities(batch_size: int = 500):
+    """Ingest task: populate extracted entity columns on cached rows."""
+    from app.ingestion.backfill import backfill_extracted_entities
+
+    return run_async(backfill_extracted_entities(batch_size))
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services import admission
+from app.services.admission import AdmissionController
+
+
+class LeaseCount:
+    """Queue-wide lease count that drops leases past their deadline."""
+
+    def __init__(self, deadlines):
+        self.deadlines = deadlines
+        self.now = 0
+
+    def inflight(self, queue):
+        return sum(deadline > self.now for deadline in self.deadlines)
+
+
+@pytest.fixture
+def overloaded_queue(monkeypatch):
+    monkeypatch.setattr(admission.settings, "ADMISSION_MAX_QUEUE_DEPTH", 10)
+    monkeypatch.setattr(admission.settings, "ADMISSION_WORKER_CAPACITY", 2)
+    monkeypatch.setattr(admission, "queue_depths", lambda redis: {"interactive": 50})
+
+
+class TestAdmission:
+    """Unit tests for load shedding on queue depth and busy slots."""
+
+    @pytest.mark.parametrize("deadlines, admitted", [
+        ([100, 100], False),
+        ([100], True),
+        ([], True),
+    ])
+    def test_sheds_only_when_every_slot_is_leased(self, overloaded_queue, monkeypatch, deadlines, admitted):
+        monkeypatch.setattr(admission, "fair_share", LeaseCount(deadlines))
+
+        decision = AdmissionController(redis_client=object())._check_load("interactive")
+
+        assert decision.admitted is admitted
+        if not admitted:
+            assert decision.reason == "overloaded"
+            assert decision.retry_after >= 1
+
+    def test_leaked_slots_stop_shedding_once_their_leases_expire(self, overloaded_queue, monkeypatch):
+        leases = LeaseCount([100, 100])
+        monkeypatch.setattr(admission, "fair_share", leases)
+        controller = AdmissionController(redis_client=object())
+
+        assert not controller._check_load("interactive").admitted
+        leases.now = 101
+        assert controller._check_load("interactive").admitted
+
+    def test_unavailable_load_admits(self, monkeypatch):
+        def down(redis):
+            raise ConnectionError("redis down")
+
+        monkeypatch.setattr(admission, "queue_depths", down)
+
+        assert AdmissionController(redis_client=object())._check_load("interactive").admitted
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.llm.classifier import IntentClassifier
+from app.llm.router import CentroidRouter
+from app.llm.rules import RuleEngine
+
+
+class TestRuleEngine:
+    """Unit tests for the classifier's rule-engine fast path."""
+
+    @pytest.mark.parametrize("query, intent", [
+        ("Cancel my Turkish Airlines flight", "cancel_flight"),
+        ("Now draft the cancellation", "cancel_flight"),
+        ("Prepare for tomorrow's meeting with Acme Corp", "prepare_meeting"),
+        ("Find events next week that conflict with my out-of-office doc", "check_conflicts"),
+        ("Where is my booking TK1234?", "find_booking"),
+        ("What's on my calendar next week?", "check_calendar"),
+        ("Move the meeting with John", "check_calendar"),
+        ("Next Tuesday", "check_calendar"),
+        ("Find emails from sarah@company.com about the budget", "search_emails"),
+        ("That email about the proposal", "search_emails"),
+        ("Show me PDFs in Drive from last month", "search_drive"),
+        ("Cancel my hotel", "unknown"),
+    ])
+    def test_known_queries(self, query, intent):
+        assert IntentClassifier().guess(query)["intent"] == intent
+
+    def test_declaration_order_breaks_ties(self):
+        # Both cancel_flight and check_calendar match fully
+        assert IntentClassifier().guess("Cancel the flight on my calendar")["intent"] == "cancel_flight"
+
+    def test_overlapping_phrases_are_all_found(self):
+        engine = RuleEngine({"intents": [
+            {"intent": "a", "match": [["cancellation"]]},
+            {"intent": "b", "match": [["cancel"], ["lation"]]},
+        ]})
+
+        assert engine.phrases_in("the cancellation") == {"cancellation", "cancel", "lation"}
+
+    def test_weighted_partial_match_respects_threshold(self):
+        config = {
+            "min_confidence": 0.7,
+            "intents": [{"intent": "reschedule", "match": [["move"], ["meeting"]], "weights": [3, 1]}],
+        }
+        engine = RuleEngine(config)
+
+        assert engine.match("move it").confidence == 0.75
+        assert engine.match("the meeting") is None
+
+    @pytest.mark.parametrize("query, intent", [
+        # Resolved by the rule tier: classify does not wait on anything
+        ("Cancel my Turkish Airlines flight", None),
+        # Partial match: a guess to speculate on while slower tiers run
+        ("Cancel my hotel", "cancel_flight"),
+        ("Hello there", None),
+    ])
+    def test_speculative_guess_only_when_rules_miss(self, query, intent):
+        guess = IntentClassifier().speculative_guess(query)
+
+        assert (guess and guess["intent"]) == intent
+
+    def test_classify_returns_fresh_intents_with_entities(self):
+        classifier = IntentClassifier()
+        first = asyncio.run(classifier.classify("Find my booking TK1234"))
+        second = asyncio.run(classifier.classify("Find my booking"))
+
+        assert first["entities"] == {"booking_reference": "TK1234"}
+        assert second["entities"] == {}
+
+    @pytest.mark.parametrize("steps, past", [
+        (["search_gmail"], True),
+        (["search_drive_files"], True),
+        (["find_calendar_event"], False),
+    ])
+    def test_undirected_dates_follow_the_data_searched(self, steps, past):
+        day = (datetime.now(timezone.utc) + timedelta(days=10)).strftime("%B %d")
+        intent = IntentClassifier()._add_entities(f"Files from {day}", {"entities": {}, "steps": steps})
+        start = datetime.fromisoformat(intent["entities"]["time_range"]["start"])
+
+        assert (start < datetime.now(timezone.utc)) is past
+
+
+class TestCentroidRouter:
+    """Unit tests for the nearest-centroid intent router."""
+
+    TEMPLATES = {
+        "search_emails": {"services": ["gmail"], "steps": ["search_gmail"]},
+        "search_drive": {"services": ["gdrive"], "steps": ["search_drive_files"]},
+    }
+
+    def _router(self):
+        return CentroidRouter(
+            ["search_emails", "search_drive"],
+            np.array([[1.0, 0.0, 0.0], [0.0, 2.0, 0.0]]),
+            self.TEMPLATES,
+        )
+
+    def test_confident_match_returns_template(self):
+        match = self._router().route([0.9, 0.1, 0.0], min_similarity=0.6, min_margin=0.1)
+
+        assert match.intent == {"services": ["gmail"], "intent": "search_emails", "entities": {}, "steps": ["search_gmail"]}
+
+    @pytest.mark.parametrize("embedding", [[1.0, 1.0, 0.0], [0.0, 0.0, 1.0], [0.0, 0.0, 0.0]])
+    def test_ambiguous_or_distant_queries_are_not_routed(self, embedding):
+        assert self._router().route(embedding, min_similarity=0.6, min_margin=0.1) is None
+
+    def test_save_and_load(self, tmp_path):
+        path = tmp_path / "centroids.npz"
+        self._router().save(path)
+        loaded = CentroidRouter.load(path)
+
+        assert loaded.labels == ["search_emails", "search_drive"]
+        assert loaded.templates == self.TEMPLATES
+        assert np.allclose(loaded.centroids, self._router().centroids)
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import conversation_log
+from app.services.conversation_log import (
+    DEAD_LETTER_KEY,
+    FLUSH_LOCK_KEY,
+    PENDING_KEY,
+    PROCESSING_KEY,
+    ConversationRecorder,
+)
+
+
+class FakeRedis:
+    """The list, string and script commands the recorder uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def lpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        for value in values:
+            items.insert(0, value.encode() if isinstance(value, str) else value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def lmove(self, source, destination, src_side, dest_side):
+        items = self.data.get(source, [])
+        if not items:
+            return None
+        value = items.pop()
+        self.data.setdefault(destination, []).insert(0, value)
+        return value
+
+    def eval(self, script, numkeys, key, token):
+        assert script is conversation_log._RELEASE_SCRIPT
+        if self.data.get(key) == token.encode():
+            return self.delete(key)
+        return 0
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+USER = "00000000-0000-0000-0000-000000000001"
+UNKNOWN_USER = "00000000-0000-0000-0000-0000000000ff"
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    """Recorder whose inserts fail for UNKNOWN_USER, or for everyone while `down`."""
+    recorder = ConversationRecorder(redis_client=FakeRedis())
+    recorder.inserted = []
+    recorder.down = False
+
+    async def insert(records):
+        if recorder.down or any(record["user_id"] == UNKNOWN_USER for record in records):
+            raise RuntimeError("insert failed")
+        recorder.inserted.extend(record["query"] for record in records)
+
+    monkeypatch.setattr(recorder, "_insert", insert)
+    return recorder
+
+
+class TestConversationRecorder:
+    """Unit tests for the write-behind conversation log."""
+
+    def test_flush_inserts_pending_records(self, recorder):
+        for query in ("a", "b", "c"):
+            recorder.record(USER, query, {}, "ok")
+
+        assert asyncio.run(recorder.flush(batch_size=2)) == 3
+        assert recorder.inserted == ["a", "b", "c"]
+        assert recorder.redis.lrange(PENDING_KEY, 0, -1) == []
+        assert FLUSH_LOCK_KEY not in recorder.redis.data
+
+    def test_bad_record_is_dead_lettered_without_blocking_others(self, recorder):
+        recorder.record(USER, "a", {}, "ok")
+        recorder.record(UNKNOWN_USER, "bad", {}, "ok")
+        recorder.record(USER, "b", {}, "ok")
+
+        assert asyncio.run(recorder.flush()) == 2
+        assert recorder.inserted == ["a", "b"]
+        dead = [json.loads(raw)["query"] for raw in recorder.redis.lrange(DEAD_LETTER_KEY, 0, -1)]
+        assert dead == ["bad"]
+        assert recorder.redis.lrange(PROCESSING_KEY, 0, -1) == []
+
+        recorder.record(USER, "c", {}, "ok")
+        assert asyncio.run(recorder.flush()) == 1
+
+    def test_outage_keeps_batch_until_attempts_run_out(self, recorder, monkeypatch):
+        monkeypatch.setattr(conversation_log.settings, "CONVERSATION_FLUSH_MAX_ATTEMPTS", 3)
+        recorder.record(UNKNOWN_USER, "bad", {}, "ok")
+
+        for _ in range(2):
+            assert asyncio.run(recorder.flush()) == 0
+            assert len(recorder.redis.lrange(PROCESSING_KEY, 0, -1)) == 1
+
+        assert asyncio.run(recorder.flush()) == 0
+        assert recorder.redis.lrange(PROCESSING_KEY, 0, -1) == []
+        assert len(recorder.redis.lrange(DEAD_LETTER_KEY, 0, -1)) == 1
+
+    def test_outage_then_recovery_delivers_everything(self, recorder):
+        recorder.record(USER, "a", {}, "ok")
+        recorder.down = True
+        assert asyncio.run(recorder.flush()) == 0
+
+        recorder.down = False
+        assert asyncio.run(recorder.flush()) == 1
+        assert recorder.inserted == ["a"]
+        assert DEAD_LETTER_KEY not in recorder.redis.data
+
+    def test_lock_taken_over_by_another_flusher_is_kept(self, recorder):
+        recorder.record(USER, "a", {}, "ok")
+        original_insert = recorder._insert
+
+        async def slow_insert(records):
+            # Our lock expired and another flusher claimed it
+            recorder.redis.data[FLUSH_LOCK_KEY] = b"other-flusher"
+            await original_insert(records)
+
+        recorder._insert = slow_insert
+        asyncio.run(recorder.flush())
+
+        assert recorder.redis.get(FLUSH_LOCK_KEY) == b"other-flusher"
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents.base import BaseAgent
+from app.agents.registry import AgentRegistry, AgentSpec
+from app.core.config import settings
+from app.orchestrator.engine import OrchestratorEngine
+from app.orchestrator.planner import QueryPlanner
+from app.services import tasks
+from app.services.conversation_state import ConversationState
+
+CANCEL_INTENT = {
+    "intent": "cancel_flight",
+    "entities": {"airline": "Turkish Airlines"},
+    "steps": ["search_gmail_for_booking", "find_calendar_event", "draft_cancellation_email"],
+}
+
+RESULTS = {
+    "search_gmail_for_booking": {"status": "found", "booking_reference": "TK1234"},
+    "find_calendar_event": {"status": "found", "event_date": "2026-10-20"},
+    "draft_cancellation_email": {"status": "drafted"},
+}
+
+
+class TestConversationState:
+    """Unit tests for follow-up reuse of step results and context."""
+
+    def _state(self) -> ConversationState:
+        state = ConversationState()
+        state.update(
+            CANCEL_INTENT,
+            RESULTS,
+            {"booking_reference": "TK1234", "event_date": "2026-10-20"},
+            QueryPlanner.REUSABLE_STEPS,
+        )
+        return state
+
+    def test_only_read_only_steps_are_kept(self):
+        state = self._state()
+
+        assert set(state.fresh_results(CANCEL_INTENT)) == {"search_gmail_for_booking", "find_calendar_event"}
+        assert state.fresh_context() == {"booking_reference": "TK1234", "event_date": "2026-10-20"}
+
+    def test_different_entities_do_not_reuse(self):
+        state = self._state()
+        other = {**CANCEL_INTENT, "entities": {"airline": "Lufthansa"}}
+
+        assert state.fresh_results(other) == {}
+
+    def test_stale_entries_expire(self):
+        state = self._state()
+        for entry in state.steps.values():
+            entry["at"] = time.time() - 3600
+
+        assert state.fresh_results(CANCEL_INTENT, max_age=300) == {}
+
+    def test_planner_skips_reused_steps(self):
+        plan = QueryPlanner().build_plan(CANCEL_INTENT, known_results=self._state().fresh_results(CANCEL_INTENT))
+
+        assert plan.steps == ("draft_cancellation_email",)
+        assert plan.roots() == [0]
+        assert plan.reused["find_calendar_event"]["reused"] is True
+
+    def test_keys_of_rerun_steps_are_left_out(self):
+        state = self._state()
+
+        assert state.fresh_context(rerun=("search_gmail_for_booking",)) == {"event_date": "2026-10-20"}
+
+    def test_a_miss_drops_the_earlier_key(self):
+        state = self._state()
+        missed = {**RESULTS, "search_gmail_for_booking": {"status": "not_found"}}
+
+        state.update(CANCEL_INTENT, missed, {"event_date": "2026-10-20"}, QueryPlanner.REUSABLE_STEPS)
+
+        assert state.fresh_context() == {"event_date": "2026-10-20"}
+
+
+class BookingAgent(BaseAgent):
+    """Finds a booking for Turkish Airlines only; drafts with the reference in context."""
+
+    async def handle(self, step_id: str, context: dict) -> dict:
+        if step_id == "draft_cancellation_email":
+            return {"status": "drafted", "booking_reference": context.get("booking_reference")}
+        if step_id == "find_calendar_event":
+            return {"status": "not_found"}
+        if context["intent"]["entities"]["airline"] != "Turkish Airlines":
+            return {"status": "not_found"}
+        context["booking_reference"] = "TK1234"
+        return {"status": "found", "booking_reference": "TK1234"}
+
+
+class FixedClassifier:
+    """Classifies "<airline>" queries as cancellations for that airline."""
+
+    def speculative_guess(self, query: str):
+        return None
+
+    async def classify(self, query: str) -> dict:
+        return {**CANCEL_INTENT, "entities": {"airline": query}}
+
+
+class MemoryStore:
+    def __init__(self):
+        self.states = {}
+
+    def load(self, user_id, conversation_id):
+        return self.states.get((user_id, conversation_id), ConversationState())
+
+    def save(self, user_id, conversation_id, state):
+        self.states[user_id, conversation_id] = state
+
+
+class TestFollowUpContext:
+    """Context keys carried between the turns of a conversation."""
+
+    @pytest.fixture
+    def pipeline(self, monkeypatch):
+        registry = AgentRegistry(
+            (AgentSpec("any", f"{__name__}:BookingAgent", tuple(CANCEL_INTENT["steps"])),), resources=object()
+        )
+        monkeypatch.setattr(settings, "LLM_ENABLED", False)
+        monkeypatch.setattr(tasks, "OrchestratorEngine", lambda: OrchestratorEngine(registry))
+        monkeypatch.setattr(tasks, "IntentClassifier", FixedClassifier)
+        monkeypatch.setattr(tasks, "conversation_store", MemoryStore())
+        monkeypatch.setattr(tasks.conversation_recorder, "record", lambda *args: None)
+
+    def test_missed_search_does_not_reuse_the_earlier_reference(self, pipeline):
+        async def turns():
+            first = await tasks._run_pipeline("u1", "Turkish Airlines", "c1")
+            second = await tasks._run_pipeline("u1", "Lufthansa", "c1")
+            return first[1], second[1]
+
+        first, second = asyncio.run(turns())
+
+        assert first["draft_cancellation_email"]["booking_reference"] == "TK1234"
+        assert second["search_gmail_for_booking"]["status"] == "not_found"
+        assert second["draft_cancellation_email"]["booking_reference"] is None
+
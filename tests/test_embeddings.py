@@ -0,0 +1,90 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.agents.gcal import GCalAgent
+
+from app.embeddings import service
+from app.embeddings.service import EmbeddingService
+
+
+class DictRedis:
+    """Minimal in-memory stand-in for the commands EmbeddingService uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value.encode()
+
+    def execute(self):
+        return []
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+class TestEmbedMany:
+    """Unit tests for batched, cached query embeddings."""
+
+    def test_one_model_call_per_batch_and_cache_hits_after(self, monkeypatch):
+        model = CountingModel()
+        monkeypatch.setattr(service, "get_embedding_model", lambda: model)
+        svc = EmbeddingService(redis_client=DictRedis())
+
+        first = asyncio.run(svc.embed_many(["Acme Corp", "document", "Acme Corp"]))
+        second = asyncio.run(svc.embed_many(["document", "Acme Corp"]))
+
+        assert model.calls == [["Acme Corp", "document"]]
+        assert first == [[9.0, 1.0], [8.0, 1.0], [9.0, 1.0]]
+        assert second == [[8.0, 1.0], [9.0, 1.0]]
+
+    def test_unavailable_cache_falls_back_to_the_model(self, monkeypatch):
+        class DownRedis(DictRedis):
+            def mget(self, keys):
+                raise ConnectionError("Error 111 connecting to localhost:6379. Connection refused.")
+
+            def execute(self):
+                raise ConnectionError("Error 111 connecting to localhost:6379. Connection refused.")
+
+        model = CountingModel()
+        monkeypatch.setattr(service, "get_embedding_model", lambda: model)
+
+        vectors = asyncio.run(EmbeddingService(redis_client=DownRedis()).embed_many(["Acme Corp"]))
+
+        assert vectors == [[9.0, 1.0]]
+        assert model.calls == [["Acme Corp"]]
+
+    def test_cache_keys_are_stable_across_processes(self):
+        assert service._cache_key("Acme Corp") == service._cache_key("Acme Corp")
+        assert "Acme" not in service._cache_key("Acme Corp")
+
+
+class TestCalendarEmbeddingText:
+    """The calendar step embeds exactly the text the engine precomputed."""
+
+    @pytest.mark.parametrize("entities, published, expected", [
+        ({"airline": "Turkish Airlines"}, "TK1234", ["Turkish Airlines"]),
+        ({}, "TK1234", ["TK1234"]),
+        ({}, None, []),
+    ])
+    def test_embedding_texts_match_the_fallback(self, entities, published, expected):
+        agent = GCalAgent(resources=object())
+        context = {"intent": {"entities": entities}, "booking_reference": published}
+
+        assert agent.embedding_texts("find_calendar_event", context) == expected
+        if expected:
+            assert agent._embedding_text(context) == expected[0]
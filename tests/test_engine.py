@@ -0,0 +1,131 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.agents.base import BaseAgent
+from app.agents.registry import AgentRegistry, AgentSpec
+from app.orchestrator.engine import OrchestratorEngine
+from app.orchestrator.planner import QueryPlanner
+from app.orchestrator.speculation import Speculation
+
+
+class EchoAgent(BaseAgent):
+    """Records the steps it ran and what earlier steps published."""
+
+    async def handle(self, step_id: str, context: dict) -> dict:
+        context.setdefault("ran", []).append(step_id)
+        return {"status": "found", "step": step_id, "seen": sorted(k for k in context if k.startswith("step_"))}
+
+
+class EmbeddingAgent(BaseAgent):
+    """Embeds its step id and records which scope and vector the step saw."""
+
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        return [step_id]
+
+    async def handle(self, step_id: str, context: dict) -> dict:
+        return {"status": "found", "scope": context.get("db_scope"), "vector": await self.embed(context, step_id)}
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    async def embed_many(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def embed(self, text):
+        self.calls.append([text])
+        return [float(len(text))]
+
+
+SPECS = (
+    AgentSpec("echo", f"{__name__}:EchoAgent", ("step_a", "step_b")),
+    AgentSpec("other", f"{__name__}:EchoAgent", ("step_c",)),
+)
+
+
+class TestAgentRegistry:
+    """Unit tests for step dispatch through the agent registry."""
+
+    def test_agents_load_lazily_and_once_per_service(self):
+        registry = AgentRegistry(SPECS, resources=object())
+
+        assert registry._agents == {}
+        assert registry.agent_for("step_a") is registry.agent_for("step_b")
+        assert registry.agent_for("step_c") is not registry.agent_for("step_a")
+        assert registry.agent_for("send_email") is None
+        assert registry.service_for("step_c") == "other"
+
+    def test_engine_runs_plan_through_registry(self):
+        engine = OrchestratorEngine(AgentRegistry(SPECS, resources=object()))
+        plan = QueryPlanner().build_plan({"steps": ["step_a", "step_b", "step_c", "unknown"]})
+        context = {"user_id": "u1"}
+
+        results = asyncio.run(engine.execute(plan, context))
+
+        assert context["ran"] == ["step_a", "step_b", "step_c"]
+        assert results["step_c"]["seen"] == ["step_a", "step_b"]
+        assert results["unknown"] == {"status": "unknown_step", "step_id": "unknown"}
+        assert "db_scope" not in context
+
+
+class TestSpeculation:
+    """Unit tests for adopting or discarding speculative step runs."""
+
+    GUESS = {"entities": {"airline": "Turkish Airlines"}, "steps": ["search_gmail", "draft_cancellation_email"]}
+
+    def _run(self, intent):
+        specs = (AgentSpec("echo", f"{__name__}:EchoAgent", ("search_gmail", "draft_cancellation_email")),)
+        engine = OrchestratorEngine(AgentRegistry(specs, resources=object()))
+
+        async def pipeline():
+            context = {"user_id": "u1", "query": "q"}
+            speculation = Speculation(engine, context)
+            speculation.start(self.GUESS)
+            plan = QueryPlanner().build_plan(intent)
+            context["prefetched"] = speculation.adopt(intent, plan)
+            results = await engine.execute(plan, context)
+            await speculation.finish(context.pop("prefetched"))
+            return context, results
+
+        return asyncio.run(pipeline())
+
+    def test_matching_guess_is_adopted(self):
+        context, results = self._run(self.GUESS)
+
+        # The root step ran once, speculatively, on a private context
+        assert context["ran"] == ["draft_cancellation_email"]
+        assert results["search_gmail"]["status"] == "found"
+
+    def test_mismatched_guess_is_discarded(self):
+        intent = {**self.GUESS, "entities": {"airline": "Lufthansa"}}
+        context, results = self._run(intent)
+
+        assert context["ran"] == ["search_gmail", "draft_cancellation_email"]
+
+    def test_speculative_steps_share_the_scope_and_embeddings(self):
+        specs = (AgentSpec("embed", f"{__name__}:EmbeddingAgent", ("search_gmail", "draft_cancellation_email")),)
+        embeddings = CountingEmbeddings()
+        engine = OrchestratorEngine(AgentRegistry(specs, resources=SimpleNamespace(embeddings=embeddings)))
+        intent = {"entities": {}, "steps": ["search_gmail", "draft_cancellation_email"]}
+        scope = object()
+
+        async def pipeline():
+            context = {"user_id": "u1", "query": "q", "db_scope": scope}
+            speculation = Speculation(engine, context)
+            speculation.start(intent)
+            await asyncio.sleep(0.01)  # classification in flight
+            context["prefetched"] = speculation.adopt(intent, QueryPlanner().build_plan(intent))
+            results = await engine.execute(QueryPlanner().build_plan(intent), context)
+            await speculation.finish(context.pop("prefetched"))
+            return context, results
+
+        context, results = asyncio.run(pipeline())
+
+        # The speculative step embedded once; the engine only embedded the rest
+        assert embeddings.calls == [["search_gmail"], ["draft_cancellation_email"]]
+        assert results["search_gmail"] == {"status": "found", "scope": scope, "vector": [12.0]}
+        assert results["draft_cancellation_email"]["scope"] is scope
+        # A scope passed in by the caller stays open for the caller
+        assert context["db_scope"] is scope
@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.ingestion.extraction import extract_entities, extract_date
+from app.llm.temporal import TimeRange, extract_time_range
+
+
+class TestIngestionExtraction:
+    """Unit tests for entity extraction run at ingestion time."""
+
+    @pytest.mark.parametrize("text, booking_reference, counterparty", [
+        ("Turkish Airlines Booking TK1234", "TK1234", "Turkish Airlines"),
+        ("Acme Corp meeting agenda - Product Launch", None, "Acme Corp"),
+        ("Budget notes from sarah@company.com", None, "sarah@company.com"),
+        ("Weekly Newsletter: Tech Trends", None, None),
+    ])
+    def test_extracts_reference_and_counterparty(self, text, booking_reference, counterparty):
+        entities = extract_entities(text)
+
+        assert entities.booking_reference == booking_reference
+        assert entities.counterparty == counterparty
+
+    def test_first_text_wins(self):
+        entities = extract_entities("Istanbul → NYC Flight TK1234", "Turkish Airlines flight TK9999")
+
+        assert entities.booking_reference == "TK1234"
+        assert entities.counterparty == "Turkish Airlines"
+
+    @pytest.mark.parametrize("text, expected", [
+        ("Departure on 2026-03-09", datetime(2026, 3, 9)),
+        ("Departure on 9 March 2026", datetime(2026, 3, 9)),
+        ("Departure on Mar 9, 2026", datetime(2026, 3, 9)),
+        ("No date here", None),
+    ])
+    def test_explicit_dates(self, text, expected):
+        assert extract_date(text) == expected
+
+    def test_relative_dates_need_reference_time(self):
+        received_at = datetime(2026, 3, 1, 15, 30)
+
+        assert extract_date("Tomorrow's Stand-up Agenda") is None
+        assert extract_date("Tomorrow's Stand-up Agenda", received_at) == datetime(2026, 3, 2)
+
+    def test_as_columns_subset(self):
+        entities = extract_entities("Turkish Airlines Booking TK1234")
+
+        assert entities.as_columns("booking_reference") == {"booking_reference": "TK1234"}
+
+
+class TestTemporalExtraction:
+    """Unit tests for query time-range extraction."""
+
+    # Monday
+    NOW = datetime(2026, 10, 19, 13, 0, tzinfo=timezone.utc)
+
+    @pytest.mark.parametrize("query, start, end", [
+        ("What's on my calendar next week?", datetime(2026, 10, 26), datetime(2026, 11, 2)),
+        ("Show me PDFs in Drive from last month", datetime(2026, 9, 1), datetime(2026, 10, 1)),
+        ("Prepare for tomorrow's meeting with Acme Corp", datetime(2026, 10, 20), datetime(2026, 10, 21)),
+        ("Next Tuesday", datetime(2026, 10, 20), datetime(2026, 10, 21)),
+        ("Flight on 2026-03-09", datetime(2026, 3, 9), datetime(2026, 3, 10)),
+    ])
+    def test_calendar_aligned_ranges(self, query, start, end):
+        time_range = extract_time_range(query, now=self.NOW)
+
+        assert time_range.start == start.replace(tzinfo=timezone.utc)
+        assert time_range.end == end.replace(tzinfo=timezone.utc)
+
+    @pytest.mark.parametrize("query, prefer, start, end", [
+        ("What happened on March 3?", "future", datetime(2026, 3, 3), datetime(2026, 3, 4)),
+        ("Flight on March 3", "future", datetime(2027, 3, 3), datetime(2027, 3, 4)),
+        ("Emails from March 3", "past", datetime(2026, 3, 3), datetime(2026, 3, 4)),
+        ("What will happen on March 3?", "past", datetime(2027, 3, 3), datetime(2027, 3, 4)),
+        ("What did I get on friday?", "future", datetime(2026, 10, 16), datetime(2026, 10, 17)),
+        ("Meeting on friday", "future", datetime(2026, 10, 23), datetime(2026, 10, 24)),
+    ])
+    def test_direction_from_cues_then_preference(self, query, prefer, start, end):
+        time_range = extract_time_range(query, now=self.NOW, prefer=prefer)
+
+        assert time_range == TimeRange(start.replace(tzinfo=timezone.utc), end.replace(tzinfo=timezone.utc))
+
+    @pytest.mark.parametrize("query, start", [
+        ("emails since friday", datetime(2026, 10, 16)),
+        ("emails since monday", datetime(2026, 10, 19)),
+        ("files changed since last week", datetime(2026, 10, 12)),
+        ("anything since March 3", datetime(2026, 3, 3)),
+    ])
+    def test_since_is_open_until_now(self, query, start):
+        time_range = extract_time_range(query, now=self.NOW)
+
+        assert time_range == TimeRange(start.replace(tzinfo=timezone.utc), self.NOW)
+
+    @pytest.mark.parametrize("query, start, end", [
+        # The rolling window comes first and wins; the date must still parse
+        ("emails from the last 3 days about march 5", datetime(2026, 10, 16, 13), datetime(2026, 10, 19, 13)),
+        ("What happened on March 3 in the last 2 weeks?", datetime(2026, 3, 3), datetime(2026, 3, 4)),
+        # "last 2 weeks" must not turn the past tense into a future weekday
+        ("What did I get on friday in the last 2 weeks?", datetime(2026, 10, 16), datetime(2026, 10, 17)),
+    ])
+    def test_rolling_window_keeps_the_query_direction(self, query, start, end):
+        time_range = extract_time_range(query, now=self.NOW)
+
+        assert time_range == TimeRange(start.replace(tzinfo=timezone.utc), end.replace(tzinfo=timezone.utc))
+
+    def test_no_temporal_expression(self):
+        assert extract_time_range("Cancel my Turkish Airlines flight", now=self.NOW) is None
+
+    def test_round_trips_through_intent_entities(self):
+        time_range = extract_time_range("emails from the last 3 days", now=self.NOW)
+
+        assert TimeRange.from_dict(time_range.to_dict()) == time_range
+        assert time_range.end == self.NOW
+
+    def test_clip_end_drops_future_ranges(self):
+        tomorrow = extract_time_range("tomorrow", now=self.NOW)
+        last_week = extract_time_range("last week", now=self.NOW)
+
+        assert tomorrow.clip_end(self.NOW) is None
+        assert last_week.clip_end(self.NOW) == last_week
@@ -0,0 +1,227 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import gcal, gmail
+from app.embeddings import filtered
+from app.embeddings.batching import GMAIL_SEMANTIC
+from app.embeddings.filtered import FilteredSearch, recall_at_k
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def setex(self, key, ttl, value):
+        self.values[key] = str(value).encode()
+
+    def execute(self):
+        pass
+
+
+class FakeSavepoint:
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def rollback(self):
+        self.calls.append(("ROLLBACK TO SAVEPOINT", {}))
+
+
+class FakeSession:
+    """Counts the user's rows as `corpus`; searches return rows with the given ids."""
+
+    def __init__(self, calls: list, corpus: int = 0, ids=()):
+        self.calls = calls
+        self.corpus = corpus
+        self.ids = ids
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def begin_nested(self):
+        self.calls.append(("SAVEPOINT", {}))
+        return FakeSavepoint(self.calls)
+
+    async def execute(self, statement, params):
+        self.calls.append((str(statement), params))
+        rows = [SimpleNamespace(id=row_id) for row_id in self.ids]
+        sizes = [min(self.corpus, params.get("cap", self.corpus))] * len(params.get("user_ids", ()))
+        return SimpleNamespace(
+            scalars=lambda: SimpleNamespace(all=lambda: sizes),
+            fetchall=lambda: rows,
+            first=lambda: rows[0] if rows else None,
+        )
+
+
+@pytest.fixture
+def observed(monkeypatch):
+    observations = []
+    monkeypatch.setattr(filtered.metrics, "inc", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        filtered.metrics, "observe", lambda name, value, **kwargs: observations.append((name, value, kwargs))
+    )
+    return observations
+
+
+def make_search(calls, ids=(), redis=None) -> FilteredSearch:
+    return FilteredSearch(session_factory=lambda: FakeSession(calls, ids=ids), redis_client=redis or FakeRedis())
+
+
+class TestRecall:
+    """Unit tests for recall@k."""
+
+    @pytest.mark.parametrize("found,exact,expected", [
+        ([1, 2, 3], [1, 2, 3], 1.0),
+        ([1, 2, 4], [1, 2, 3], 2 / 3),
+        ([1], [1, 2], 0.5),
+        ([], [], 1.0),
+    ])
+    def test_recall_at_k(self, found, exact, expected):
+        rows = lambda ids: [SimpleNamespace(id=row_id) for row_id in ids]
+
+        assert recall_at_k(rows(found), rows(exact)) == pytest.approx(expected)
+
+
+class TestFilteredSearch:
+    """Unit tests for choosing between exact and index search."""
+
+    @pytest.mark.parametrize("corpus,exact", [(10, True), (5000, True), (5001, False), (10**6, False)])
+    def test_strategy_follows_corpus_size(self, observed, monkeypatch, corpus, exact):
+        monkeypatch.setattr(filtered.settings, "VECTOR_EXACT_SCAN_MAX_ROWS", 5000)
+        calls = []
+        db = FakeSession(calls, corpus)
+
+        assert asyncio.run(make_search([]).use_exact(db, "gmail_cache", "u1")) is exact
+        # Counted on the caller's session, stopping just past the threshold
+        assert calls[0][1]["cap"] == 5001
+
+    def test_corpus_size_is_cached(self, observed):
+        calls = []
+        redis = FakeRedis()
+        search = make_search([], redis=redis)
+        db = FakeSession(calls, corpus=42)
+
+        async def twice():
+            return await search.corpus_size(db, "gmail_cache", "u1"), await search.corpus_size(db, "gmail_cache", "u1")
+
+        assert asyncio.run(twice()) == (42, 42)
+        assert len(calls) == 1
+        assert redis.values == {"vector_corpus:gmail_cache:u1": b"42"}
+
+    def test_users_of_a_batch_are_counted_together(self, observed):
+        calls = []
+        redis = FakeRedis()
+        redis.values["vector_corpus:gmail_cache:cached"] = b"10"
+        db = FakeSession(calls, corpus=10**6)
+
+        exact = asyncio.run(make_search([], redis=redis).use_exact_many(db, "gmail_cache", ["cached", "u1", "u2", "u1"]))
+
+        assert exact == {"cached": True, "u1": False, "u2": False}
+        # One statement for the uncached users, each counted once
+        assert [params["user_ids"] for _, params in calls] == [["u1", "u2"]]
+        assert redis.values["vector_corpus:gmail_cache:u2"] == b"5001"
+
+    @pytest.mark.parametrize("iterative_scan,statements", [("strict_order", 2), ("off", 1)])
+    def test_ann_scan_widens_candidates_inside_a_savepoint(self, monkeypatch, iterative_scan, statements):
+        monkeypatch.setattr(filtered.settings, "VECTOR_ANN_EF_SEARCH", 40)
+        monkeypatch.setattr(filtered.settings, "VECTOR_ANN_CANDIDATE_FACTOR", 4)
+        monkeypatch.setattr(filtered.settings, "VECTOR_ANN_ITERATIVE_SCAN", iterative_scan)
+        calls = []
+
+        async def scan():
+            async with FilteredSearch.ann_scan(FakeSession(calls), k=20):
+                calls.append(("search", {}))
+
+        asyncio.run(scan())
+
+        settings_calls = calls[1:1 + statements]
+        assert calls[0][0] == "SAVEPOINT"
+        assert calls[1][1]["ef_search"] == "80"
+        assert "set_config('hnsw.ef_search'" in calls[1][0]
+        # The scan cap only applies to iterative scans
+        assert any("max_scan_tuples" in sql for sql, _ in settings_calls) is (iterative_scan != "off")
+        # Settings are rolled back once the search is done
+        assert [sql for sql, _ in calls[1 + statements:]] == ["search", "ROLLBACK TO SAVEPOINT"]
+
+    @pytest.mark.parametrize("corpus,exact", [(10, True), (10**6, False)])
+    def test_search_runs_chosen_strategy_on_callers_session(self, observed, monkeypatch, corpus, exact):
+        monkeypatch.setattr(filtered.settings, "VECTOR_RECALL_SAMPLE_RATE", 0.0)
+        calls = []
+        search = make_search([])
+        db = FakeSession(calls, corpus, ids=("a", "b"))
+
+        rows = asyncio.run(search.search(db, GMAIL_SEMANTIC, "u1", [0.1], k=2))
+
+        assert [row.id for row in rows] == ["a", "b"]
+        statement, params = next(call for call in reversed(calls) if "LATERAL" in call[0])
+        assert ("+ 0" in statement) is exact
+        assert params["k_0"] == 2
+        assert any("hnsw.ef_search" in sql for sql, _ in calls) is not exact
+        assert (calls[-1][0] == "ROLLBACK TO SAVEPOINT") is not exact
+
+    def test_sampled_searches_record_recall(self, observed, monkeypatch):
+        monkeypatch.setattr(filtered.settings, "VECTOR_RECALL_SAMPLE_RATE", 1.0)
+        search = make_search([], ids=("a", "b", "c", "d"))
+        db = FakeSession([], corpus=10**6, ids=("a", "b", "x", "y"))
+
+        async def run():
+            await search.search(db, GMAIL_SEMANTIC, "u1", [0.1], k=4)
+            await asyncio.gather(*search._checks)
+
+        asyncio.run(run())
+
+        assert observed == [("orchestrator_vector_recall", 0.5, {"buckets": filtered.RECALL_BUCKETS, "query": "gmail_semantic"})]
+
+
+class TestAgentVectorFallbacks:
+    """Unit tests for the vector tiers of the agents' one-round-trip searches."""
+
+    @pytest.mark.parametrize("corpus,exact", [(10, True), (10**6, False)])
+    def test_calendar_fallback_follows_the_users_strategy(self, observed, monkeypatch, corpus, exact):
+        monkeypatch.setattr(gcal, "filtered_search", make_search([]))
+        calls = []
+        db = FakeSession(calls, corpus, ids=("e1",))
+
+        event = asyncio.run(gcal.GCalAgent(resources=object())._search_events(db, "u1", ["dentist"], [0.1]))
+
+        assert event.id == "e1"
+        statement = next(sql for sql, _ in calls if "nearest AS" in sql)
+        assert ("(embedding <-> CAST(:query_embedding AS vector)) + 0" in statement) is exact
+        assert any("hnsw.ef_search" in sql for sql, _ in calls) is not exact
+        assert (calls[-1][0] == "ROLLBACK TO SAVEPOINT") is not exact
+
+    def test_calendar_search_without_embedding_skips_the_index(self, monkeypatch):
+        monkeypatch.setattr(gcal, "filtered_search", make_search([]))
+        calls = []
+
+        asyncio.run(gcal.GCalAgent(resources=object())._search_events(FakeSession(calls), "u1", ["dentist"], None))
+
+        # No corpus count and no index settings; just the search
+        assert len(calls) == 1
+        assert "+ 0" in calls[0][0]
+
+    @pytest.mark.parametrize("corpus,exact", [(10, True), (10**6, False)])
+    def test_gmail_tiers_follow_the_users_strategy(self, observed, monkeypatch, corpus, exact):
+        monkeypatch.setattr(gmail, "filtered_search", make_search([]))
+        calls = []
+        db = FakeSession(calls, corpus, ids=("m1",))
+
+        match = asyncio.run(gmail.GmailAgent(resources=object())._hybrid_search(db, "u1", "Delta", None, [0.1]))
+
+        assert match.id == "m1"
+        statement = next(sql for sql, _ in calls if "nearest AS" in sql)
+        # Both the keyword and the vector tier order by distance
+        assert statement.count("(embedding <-> CAST(:query_embedding AS vector)) + 0") == (2 if exact else 0)
+        assert statement.count("embedding <-> CAST(:query_embedding AS vector)") == 2
+        assert any("hnsw.ef_search" in sql for sql, _ in calls) is not exact
+        assert (calls[-1][0] == "ROLLBACK TO SAVEPOINT") is not exact
@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.loop import get_loop, run_async
+from app.llm.classifier import IntentClassifier
+from app.llm.client import LLMClient, LLMError, RetryBudget, get_llm_client
+from app.llm.mock_server import app as mock_app
+from app.llm.synthesizer import Synthesizer
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def completion(content: str) -> dict:
+    return {
+        "model": "m",
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+    }
+
+
+def scripted(*responses):
+    """Transport answering successive requests with the given responses."""
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content))
+        response = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return httpx.MockTransport(handler), calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 0.0)
+
+
+class TestLLMClient:
+    """Unit tests for the pooled LLM client."""
+
+    def test_chat_returns_content_and_usage(self):
+        transport, calls = scripted(httpx.Response(200, json=completion("hi")))
+        result = asyncio.run(LLMClient(transport=transport).chat("m", MESSAGES, temperature=0))
+
+        assert result.content == "hi"
+        assert result.usage["prompt_tokens"] == 3
+        assert calls[0]["temperature"] == 0
+
+    @pytest.mark.parametrize("failure", [
+        httpx.Response(503),
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.ConnectError("refused"),
+    ])
+    def test_retryable_failures_are_retried(self, failure):
+        transport, calls = scripted(failure, httpx.Response(200, json=completion("ok")))
+        result = asyncio.run(LLMClient(transport=transport).chat("m", MESSAGES))
+
+        assert result.content == "ok"
+        assert len(calls) == 2
+
+    def test_client_errors_are_not_retried(self):
+        transport, calls = scripted(httpx.Response(400))
+
+        with pytest.raises(LLMError):
+            asyncio.run(LLMClient(transport=transport).chat("m", MESSAGES))
+        assert len(calls) == 1
+
+    @pytest.mark.parametrize("response", [
+        httpx.Response(200, text="<html>gateway</html>"),
+        httpx.Response(200, json={"error": "overloaded"}),
+        httpx.Response(200, json={"choices": []}),
+        httpx.Response(200, json={"choices": [{"message": {"content": None}}]}),
+    ])
+    def test_malformed_completions_raise_llm_error(self, response):
+        transport, _ = scripted(response)
+
+        with pytest.raises(LLMError, match="Malformed"):
+            asyncio.run(LLMClient(transport=transport).chat("m", MESSAGES))
+
+    def test_retries_stop_when_the_budget_is_spent(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_RETRY_BUDGET_RESERVE", 1.0)
+        monkeypatch.setattr(settings, "LLM_RETRY_BUDGET_RATIO", 0.0)
+        transport, calls = scripted(httpx.Response(503))
+
+        with pytest.raises(LLMError):
+            asyncio.run(LLMClient(transport=transport).chat("m", MESSAGES))
+        assert len(calls) == 2
+
+    def test_retry_budget_refills_with_requests(self):
+        budget = RetryBudget(ratio=0.5, reserve=1.0)
+
+        assert budget.withdraw()
+        assert not budget.withdraw()
+        budget.deposit()
+        budget.deposit()
+        assert budget.withdraw()
+
+    def test_concurrency_is_bounded_per_model(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY_PER_MODEL", 2)
+        active, peak = 0, 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200, json=completion("ok"))
+
+        async def run():
+            client = LLMClient(transport=httpx.MockTransport(handler))
+            await asyncio.gather(*(client.chat("m", MESSAGES) for _ in range(6)))
+
+        asyncio.run(run())
+        assert peak == 2
+
+    def test_one_client_per_loop(self):
+        async def client():
+            return get_llm_client()
+
+        loop = get_loop()
+        assert run_async(client()) is run_async(client())
+        assert get_loop() is loop
+
+
+class TestMockServer:
+    """The client against the local OpenAI-compatible mock server."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setattr("app.llm.mock_server.LATENCY_MS", 0)
+        return LLMClient(base_url="http://mock/v1", transport=httpx.ASGITransport(app=mock_app))
+
+    def test_stream_yields_the_full_reply(self, client):
+        async def run():
+            full = (await client.chat("m", MESSAGES)).content
+            streamed = "".join([delta async for delta in client.stream_chat("m", MESSAGES)])
+            return full, streamed
+
+        full, streamed = asyncio.run(run())
+        assert streamed == full
+
+    def test_classifier_llm_tier(self, client):
+        intent = asyncio.run(IntentClassifier(llm=client)._llm_classify("Show me PDFs in Drive"))
+
+        assert intent["intent"] == "search_drive"
+        assert intent["steps"] == ["search_drive_files"]
+
+    def test_synthesizer_falls_back_to_template(self):
+        transport, _ = scripted(httpx.Response(500))
+        synthesizer = Synthesizer(llm=LLMClient(transport=transport))
+
+        message = asyncio.run(synthesizer.synthesize_async({"entities": {}}, {}))
+        assert message == "I processed your cancellation request."
+
+    def test_synthesizer_falls_back_on_a_malformed_completion(self):
+        transport, _ = scripted(httpx.Response(200, json={"choices": []}))
+        synthesizer = Synthesizer(llm=LLMClient(transport=transport))
+
+        message = asyncio.run(synthesizer.synthesize_async({"entities": {}}, {}))
+        assert message == "I processed your cancellation request."
@@ -0,0 +1,78 @@
+import asyncio
+import itertools
+
+import httpx
+import pytest
+
+from app.bench.loadgen import Sample, compare, percentile, run_load, summarize
+
+
+def fake_api(shed_every: int = 0):
+    """Transport completing each task on its second poll, shedding every Nth submit."""
+    submits = itertools.count(1)
+    polls: dict[str, int] = {}
+
+    def handler(request):
+        path = request.url.path
+        if request.method == "POST":
+            n = next(submits)
+            if shed_every and n % shed_every == 0:
+                return httpx.Response(429, headers={"Retry-After": "1"})
+            return httpx.Response(200, json={"task_id": f"t{n}", "profiled": request.headers.get("X-Profile")})
+        if path.startswith("/debug/profiles/"):
+            return httpx.Response(200, json={"stages": {"classify": 0.001, "execute": 0.01}})
+        task_id = path.rsplit("/", 1)[-1]
+        polls[task_id] = polls.get(task_id, 0) + 1
+        status = "completed" if polls[task_id] >= 2 else "pending"
+        return httpx.Response(200, json={"status": status})
+
+    return httpx.MockTransport(handler)
+
+
+def run(transport, **kwargs):
+    async def go():
+        async with httpx.AsyncClient(base_url="http://api", transport=transport) as client:
+            return await run_load(client, **kwargs)
+
+    return asyncio.run(go())
+
+
+class TestLoadGenerator:
+    """Unit tests for the open-loop load generator and its reports."""
+
+    @pytest.mark.parametrize("q, expected", [(50, 50), (90, 90), (99, 99), (100, 100), (1, 1)])
+    def test_nearest_rank_percentile(self, q, expected):
+        assert percentile(list(range(1, 101)), q) == expected
+
+    def test_run_records_every_arrival(self):
+        samples = run(fake_api(shed_every=5), rate=200, duration=0.25, users=100, poll_interval=0.001, seed=1)
+        statuses = {sample.status for sample in samples}
+
+        assert len(samples) > 20
+        assert statuses == {"ok", "shed"}
+        assert all(sample.e2e_ms > 0 for sample in samples if sample.status == "ok")
+
+    def test_busy_users_drop_arrivals_instead_of_delaying_them(self):
+        samples = run(fake_api(), rate=400, duration=0.1, users=1, poll_interval=0.02, seed=2)
+
+        assert "dropped" in {sample.status for sample in samples}
+
+    def test_profiled_queries_report_stages(self):
+        samples = run(fake_api(), rate=100, duration=0.1, users=50, poll_interval=0.001, profile_rate=1.0, seed=3)
+        report = summarize(samples, duration=0.1)
+
+        assert set(report["stages_ms"]) == {"classify", "execute"}
+        assert report["stages_ms"]["execute"]["p50"] == 10.0
+
+    def test_summary_and_comparison(self):
+        before = summarize(
+            [Sample("a", 0, "ok", 1, 100), Sample("a", 0, "ok", 1, 300), Sample("a", 0, "shed", 1)],
+            duration=1.0,
+        )
+        after = summarize([Sample("a", 0, "ok", 1, 50), Sample("a", 0, "ok", 1, 150)], duration=1.0)
+
+        assert before["error_rate"] == pytest.approx(1 / 3, abs=1e-3)
+        assert before["by_label"]["a"]["errors"] == 1
+        rows = {metric: change for metric, _, _, change in compare(before, after)}
+        assert rows["e2e.p50_ms"] == -0.5
+        assert rows["throughput_per_second"] == 0.0
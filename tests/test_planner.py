@@ -0,0 +1,59 @@
+import pytest
+
+from app.orchestrator.dag import Plan, PlanNode
+from app.orchestrator.planner import QueryPlanner, compile_sequential
+
+CANCEL_INTENT = {
+    "intent": "cancel_flight",
+    "entities": {"airline": "Turkish Airlines"},
+    "steps": ["search_gmail_for_booking", "find_calendar_event", "draft_cancellation_email"],
+}
+
+
+class TestCompiledPlans:
+    """Unit tests for compiled plan caching and per-run instances."""
+
+    def test_plans_with_the_same_steps_share_one_compiled_plan(self):
+        planner = QueryPlanner()
+        first = planner.build_plan(CANCEL_INTENT)
+        second = planner.build_plan({**CANCEL_INTENT, "entities": {}})
+
+        assert first.compiled is second.compiled
+        assert first is not second
+
+    def test_instances_track_progress_independently(self):
+        first = QueryPlanner().build_plan(CANCEL_INTENT)
+        second = QueryPlanner().build_plan(CANCEL_INTENT)
+
+        assert first.roots() == [0]
+        assert first.complete(0) == [1]
+        assert second.complete(0) == [1]
+        assert first.complete(1) == [2]
+
+    def test_diamond_is_topologically_ordered(self):
+        plan = Plan()
+        plan.add_node(PlanNode("draft", ["email", "calendar"]))
+        plan.add_node(PlanNode("email"))
+        plan.add_node(PlanNode("calendar"))
+        compiled = plan.compile()
+        run = compiled.instantiate()
+
+        assert compiled.order == ("email", "calendar", "draft")
+        assert run.roots() == [0, 1]
+        assert run.complete(0) == []
+        assert run.complete(1) == [2]
+
+    @pytest.mark.parametrize("nodes", [
+        [PlanNode("a", ["b"]), PlanNode("b", ["a"])],
+        [PlanNode("a", ["missing"])],
+    ])
+    def test_invalid_plans_fail_to_compile(self, nodes):
+        plan = Plan()
+        for node in nodes:
+            plan.add_node(node)
+
+        with pytest.raises(ValueError):
+            plan.compile()
+
+    def test_empty_plan(self):
+        assert compile_sequential(()).instantiate().roots() == []
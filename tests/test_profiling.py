@@ -0,0 +1,81 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import profiling
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    profiles = []
+    monkeypatch.setattr(profiling, "store_profile", profiles.append)
+    return profiles
+
+
+class TestProfiling:
+    """Unit tests for opt-in request profiling."""
+
+    def test_stage_is_a_no_op_without_capture(self):
+        assert profiling.stage("classify") is profiling._NOOP
+
+    def test_capture_times_stages_across_tasks(self, stored):
+        async def step(name):
+            with profiling.stage(name):
+                await asyncio.sleep(0.02)
+
+        async def pipeline():
+            with profiling.capture("task-1"):
+                with profiling.stage("execute"):
+                    await asyncio.gather(step("step:a"), step("step:b"))
+
+        asyncio.run(pipeline())
+
+        profile = stored[0].to_dict()
+        assert profile["id"] == "task-1"
+        assert set(profile["stages"]) == {"execute", "step:a", "step:b"}
+        assert profile["stages"]["step:a"] >= 0.02
+        assert profile["wall_seconds"] >= profile["stages"]["execute"]
+        assert profiling._current.get() is None
+
+    def test_capture_samples_the_running_thread(self, stored):
+        def busy():
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+
+        with profiling.capture("task-2"):
+            busy()
+
+        profile = stored[0].to_dict()
+        assert profile["sample_count"] > 0
+        assert any("test_profiling.py:busy" in entry["stack"] for entry in profile["stacks"])
+
+    def test_sql_statements_are_aggregated(self, stored):
+        conn = SimpleNamespace(info={})
+
+        with profiling.capture("task-3"):
+            for _ in range(2):
+                profiling._before_cursor_execute(conn, None, "SELECT  1\n FROM t", None, None, False)
+                profiling._after_cursor_execute(conn, None, "SELECT  1\n FROM t", None, None, False)
+
+        (entry,) = stored[0].to_dict()["sql"]
+        assert entry["statement"] == "SELECT 1 FROM t"
+        assert entry["calls"] == 2
+        assert profiling._sql_captures == 0
+
+    def test_failed_statements_do_not_leak_start_times(self, stored):
+        conn = SimpleNamespace(info={})
+
+        with profiling.capture("task-4"):
+            profiling._before_cursor_execute(conn, None, "SELECT 1", None, None, False)
+            profiling._handle_error(SimpleNamespace(connection=conn))
+
+        assert conn.info["profile_started"] == []
+
+    def test_no_profile_id_disables_capture(self, stored):
+        with profiling.capture(None) as profile:
+            assert profiling.stage("plan") is profiling._NOOP
+
+        assert profile is None and stored == []
@@ -0,0 +1,51 @@
+import zlib
+
+import pytest
+
+from app.services.results import RESULT_VERSION, decode, encode, slim_result
+
+RESULTS = {
+    "search_gmail_for_booking": {
+        "status": "found",
+        "step": "search_gmail_for_booking",
+        "email_id": "e1",
+        "subject": "Turkish Airlines Flight TK1234 Confirmed",
+        "body": "Long email preview " * 50,
+        "booking_reference": "TK1234",
+        "method": "reference",
+    },
+    "draft_cancellation_email": {
+        "status": "drafted",
+        "step": "draft_cancellation_email",
+        "to": "support@airline.com",
+        "subject": "Cancellation Request - Turkish Airlines",
+        "body": "Please cancel my Turkish Airlines booking TK1234.",
+    },
+}
+
+
+class TestResults:
+    """Unit tests for slim result projection and detail encoding."""
+
+    def test_slim_result_drops_previews_but_keeps_drafts(self):
+        slim = slim_result("done", RESULTS)
+
+        assert slim["v"] == RESULT_VERSION
+        assert slim["message"] == "done"
+        assert "body" not in slim["details"]["search_gmail_for_booking"]
+        assert slim["details"]["search_gmail_for_booking"]["booking_reference"] == "TK1234"
+        assert slim["details"]["draft_cancellation_email"]["body"].startswith("Please cancel")
+
+    def test_details_round_trip(self):
+        raw = encode(RESULTS)
+
+        assert decode(raw) == RESULTS
+        assert len(raw) < len(str(RESULTS))
+
+    def test_details_are_msgpack(self):
+        assert encode(RESULTS)[:1] == b"m"
+
+    @pytest.mark.parametrize("codec", [b"x", b"j"])
+    def test_unknown_codec_is_rejected(self, codec):
+        with pytest.raises(ValueError, match="codec"):
+            decode(codec + zlib.compress(b"{}"))
@@ -0,0 +1,150 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1 import orchestrator
+from app.core.config import settings
+from app.core.metrics import series
+from app.services.scheduling import (
+    BATCH_QUEUE,
+    INTERACTIVE_QUEUE,
+    FairShare,
+    queue_keys,
+    route_query,
+)
+from app.services.singleflight import SingleFlight, flight_key
+
+
+class TestScheduling:
+    """Unit tests for queue routing and metric naming."""
+
+    @pytest.mark.parametrize("conversation_id, background, queue, priority", [
+        (None, False, INTERACTIVE_QUEUE, 3),
+        ("c1", False, INTERACTIVE_QUEUE, 0),
+        ("c1", True, BATCH_QUEUE, 6),
+    ])
+    def test_route_query(self, conversation_id, background, queue, priority):
+        assert route_query(conversation_id, background) == {"queue": queue, "priority": priority}
+
+    def test_queue_keys_cover_priority_steps(self):
+        assert queue_keys("batch") == ["batch", "batch:3", "batch:6", "batch:9"]
+
+    def test_series_sorts_labels(self):
+        assert series("depth", {"queue": "ingest", "le": 1}) == 'depth{le="1",queue="ingest"}'
+        assert series("depth") == "depth"
+
+
+class RecordingRedis:
+    """Records pipelined commands and script invocations."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.commands = []
+
+    def register_script(self, script):
+        def run(keys, args):
+            if self.fail:
+                raise ConnectionError("redis down")
+            self.commands.append(("script", tuple(keys), tuple(args)))
+            return 1
+        return run
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def zrem(self, key, member):
+        self.commands.append(("zrem", key, member))
+
+    def execute(self):
+        return []
+
+
+class TestFairShare:
+    """Unit tests for lease-based fair-share slots."""
+
+    def test_slots_are_leased_per_task(self):
+        redis = RecordingRedis()
+        share = FairShare(redis_client=redis)
+
+        assert share.acquire("interactive", "u1", "task-1")
+        share.release("interactive", "u1", "task-1")
+
+        keys, args = redis.commands[0][1:]
+        assert keys == ("inflight:interactive:u1", "inflight:interactive")
+        assert args[2:] == (0, "task-1")
+        assert redis.commands[1:] == [
+            ("zrem", "inflight:interactive:u1", "task-1"),
+            ("zrem", "inflight:interactive", "task-1"),
+        ]
+
+    def test_acquire_fails_open(self):
+        assert FairShare(redis_client=RecordingRedis(fail=True)).acquire("interactive", "u1", "task-1")
+
+
+class TestSingleFlight:
+    """Unit tests for single-flight query keys."""
+
+    @pytest.mark.parametrize("a, b", [
+        ("Cancel my Turkish Airlines flight", "cancel my  turkish airlines flight?"),
+        ("  What's on my calendar next week?", "what's on my calendar next week"),
+    ])
+    def test_equivalent_queries_share_a_key(self, a, b):
+        assert flight_key("u1", a) == flight_key("u1", b)
+
+    def test_user_and_conversation_are_part_of_the_key(self):
+        query = "Cancel my Turkish Airlines flight"
+
+        assert flight_key("u1", query) != flight_key("u2", query)
+        assert flight_key("u1", query, "c1") != flight_key("u1", query, "c2")
+
+
+class KeyValueRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value.encode()
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+class TestCancelReleasesSingleFlight:
+    """A cancelled query no longer absorbs resubmissions of the same query."""
+
+    @pytest.mark.parametrize("backend", ["local", "celery"])
+    def test_cancel_releases_the_claim(self, monkeypatch, backend):
+        flights = SingleFlight(redis_client=KeyValueRedis())
+        revoked = []
+        monkeypatch.setattr(settings, "TASK_BACKEND", backend)
+        monkeypatch.setattr(settings, "SINGLEFLIGHT_WINDOW_SECONDS", 30)
+        monkeypatch.setattr(orchestrator, "single_flight", flights)
+        monkeypatch.setattr(orchestrator, "local_queue", SimpleNamespace(cancel=lambda task_id: True))
+        monkeypatch.setattr(
+            orchestrator.celery_app.control, "revoke", lambda task_id, terminate: revoked.append(task_id)
+        )
+        task_id, _ = flights.claim("u1", "Cancel my Turkish Airlines flight")
+
+        asyncio.run(orchestrator.cancel_query(task_id))
+
+        assert flights.lookup("u1", "Cancel my Turkish Airlines flight") is None
+        assert revoked == ([task_id] if backend == "celery" else [])
+
+    def test_cancel_keeps_a_newer_claim(self, monkeypatch):
+        redis = KeyValueRedis()
+        flights = SingleFlight(redis_client=redis)
+        monkeypatch.setattr(settings, "SINGLEFLIGHT_WINDOW_SECONDS", 30)
+        old, _ = flights.claim("u1", "Cancel my Turkish Airlines flight")
+        redis.delete(flight_key("u1", "Cancel my Turkish Airlines flight"))
+        new, _ = flights.claim("u1", "Cancel my Turkish Airlines flight")
+
+        flights.release_task(old)
+
+        assert flights.lookup("u1", "Cancel my Turkish Airlines flight") == new
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.gcal import FIND_EVENT_SQL
+from app.agents.gmail import HYBRID_SEARCH_SQL
+from app.core.config import settings
+from app.db.slow_queries import SlowQueryLog, fingerprint, parameter_shapes, summarize_plan
+
+
+class TestSlowQueryLog:
+    """Unit tests for the slow-query recorder."""
+
+    @pytest.mark.parametrize("first, second", [
+        (
+            "SELECT * FROM gmail_cache WHERE user_id = $1 AND subject ILIKE $2",
+            "SELECT *  FROM gmail_cache\n WHERE user_id = $3 AND subject ILIKE $4",
+        ),
+        (
+            "SELECT id FROM t WHERE id IN (1, 2, 3) LIMIT 5",
+            "SELECT id FROM t WHERE id IN (7) LIMIT 10",
+        ),
+        (
+            "SELECT 1 FROM t WHERE name = 'a''b' AND w = :w",
+            "SELECT 1 FROM t WHERE name = 'other' AND w = :other",
+        ),
+    ])
+    def test_fingerprint_ignores_values(self, first, second):
+        assert fingerprint(first) == fingerprint(second)
+
+    def test_fingerprint_keeps_casts_and_identifiers(self):
+        normalized, _ = fingerprint("SELECT id FROM t2 ORDER BY embedding <-> $1::vector LIMIT 5")
+
+        assert normalized == "SELECT id FROM t2 ORDER BY embedding <-> ?::vector LIMIT ?"
+
+    def test_parameter_shapes_hide_values(self):
+        shapes = parameter_shapes(("user-1", "[0.1,0.2,0.3]", ["%a%", "%b%"], 5, None))
+
+        assert shapes == ["str(6)", "vector(3)", "list(2)", "int", "null"]
+
+    def test_plan_summary_lists_seq_scans_and_indexes(self):
+        plan = {
+            "Execution Time": 12.5,
+            "Plan": {
+                "Node Type": "Limit",
+                "Plans": [
+                    {"Node Type": "Seq Scan", "Relation Name": "gcal_cache"},
+                    {"Node Type": "Index Scan", "Index Name": "ix_gmail_cache_embedding_hnsw"},
+                ],
+            },
+        }
+
+        assert summarize_plan(plan) == {
+            "execution_ms": 12.5,
+            "seq_scans": ["gcal_cache"],
+            "indexes": ["ix_gmail_cache_embedding_hnsw"],
+        }
+
+    @pytest.mark.parametrize("statement", [
+        "UPDATE t SET x = 1",
+        "WITH moved AS (DELETE FROM t RETURNING *) SELECT * FROM moved",
+        "WITH s AS (SELECT 1) INSERT INTO t SELECT * FROM s",
+        "INSERT INTO t SELECT * FROM s",
+        "SELECT * FROM t FOR UPDATE",
+    ])
+    def test_only_reads_are_explained(self, monkeypatch, statement):
+        monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+
+        assert not SlowQueryLog(redis_client=object())._should_explain(statement, "digest")
+
+    @pytest.mark.parametrize("statement", [
+        "SELECT * FROM t WHERE updated_at > now()",
+        HYBRID_SEARCH_SQL,
+        FIND_EVENT_SQL,
+    ])
+    def test_read_only_ctes_are_explained(self, monkeypatch, statement):
+        monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+        redis = SimpleNamespace(set=lambda *args, **kwargs: True)
+
+        assert SlowQueryLog(redis_client=redis)._should_explain(statement, "digest")
+
+    def test_failed_statements_do_not_leak_start_times(self):
+        log = SlowQueryLog()
+        conn = SimpleNamespace(info={})
+
+        log._before(conn, None, "SELECT 1", (), None, False)
+        log._error(SimpleNamespace(connection=conn))
+        log._error(SimpleNamespace(connection=None))
+
+        assert conn.info["slow_query_started"] == []
+
+    def test_fast_statements_are_not_recorded(self, monkeypatch):
+        log = SlowQueryLog()
+        recorded = []
+        monkeypatch.setattr(log, "record", lambda *args, **kwargs: recorded.append(args))
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 10_000)
+        conn = SimpleNamespace(info={})
+
+        log._before(conn, None, "SELECT 1", (), None, False)
+        log._after(conn, None, "SELECT 1", (), None, False)
+        assert recorded == []
+
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+        monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.0)
+        log._before(conn, None, "SELECT 1", (), None, False)
+        log._after(conn, None, "SELECT 1", (), None, False)
+        assert len(recorded) == 1
@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.agents.base import AgentResources, BaseAgent
+from app.agents.registry import AgentRegistry, AgentSpec
+from app.core import profiling
+from app.core import redis as redis_module
+from app.core.config import settings
+from app.embeddings import service
+from app.orchestrator.engine import OrchestratorEngine
+from app.services import tasks
+from app.services.conversation_log import conversation_recorder
+from app.services.results import load_details
+from app.services.task_queue import CANCELLED, FAILURE, SUCCESS, QueueFull, TaskQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestTaskQueue:
+    """Unit tests for the in-process asyncio task queue."""
+
+    def test_results_and_failures_resolve_futures(self):
+        async def double(x):
+            return 2 * x
+
+        async def fail():
+            raise ValueError("boom")
+
+        async def scenario():
+            queue = TaskQueue(workers=2)
+            ok = queue.apply_async(double, (21,))
+            bad = queue.apply_async(fail)
+            sync = queue.apply_async(sum, ([1, 2, 3],))
+            assert await ok.future == 42
+            with pytest.raises(ValueError):
+                await bad.future
+            assert await sync.future == 6
+            await queue.drain()
+            return ok.state, bad.state, sync.state
+
+        assert run(scenario()) == (SUCCESS, FAILURE, SUCCESS)
+
+    def test_lower_priority_runs_first_fifo_within_priority(self):
+        order = []
+
+        async def record(name):
+            order.append(name)
+
+        async def scenario():
+            queue = TaskQueue(workers=1)
+            for name, priority in [("batch", 6), ("a", 3), ("follow-up", 0), ("b", 3)]:
+                queue.apply_async(record, (name,), priority=priority)
+            await queue.drain()
+
+        run(scenario())
+        assert order == ["follow-up", "a", "b", "batch"]
+
+    def test_worker_pool_bounds_concurrency(self):
+        active, peak = 0, 0
+
+        async def work():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        async def scenario():
+            queue = TaskQueue(workers=3)
+            for _ in range(10):
+                queue.apply_async(work)
+            await queue.drain()
+
+        run(scenario())
+        assert peak == 3
+
+    def test_cancel_pending_and_running(self):
+        async def scenario():
+            began = asyncio.Event()
+            queue = TaskQueue(workers=1)
+
+            async def slow():
+                began.set()
+                await asyncio.sleep(10)
+
+            running = queue.apply_async(slow)
+            pending = queue.apply_async(slow)
+            await began.wait()
+
+            assert queue.cancel(pending.id)
+            assert queue.cancel(running.id)
+            await queue.drain(timeout=1)
+            assert not queue.cancel(running.id)
+            return running, pending
+
+        running, pending = run(scenario())
+        assert running.state == pending.state == CANCELLED
+        assert running.future.cancelled() and pending.future.cancelled()
+
+    def test_max_pending_and_draining_reject_submissions(self):
+        async def noop():
+            pass
+
+        async def scenario():
+            queue = TaskQueue(workers=1, max_pending=1)
+            queue.apply_async(noop)
+            with pytest.raises(QueueFull):
+                queue.apply_async(noop)
+            await queue.drain()
+            with pytest.raises(RuntimeError):
+                queue.apply_async(noop)
+
+        run(scenario())
+
+    def test_drain_timeout_cancels_stragglers(self):
+        async def scenario():
+            queue = TaskQueue(workers=1)
+            job = queue.apply_async(asyncio.sleep, (10,))
+            started = time.perf_counter()
+            await queue.drain(timeout=0.05)
+            return job, time.perf_counter() - started
+
+        job, elapsed = run(scenario())
+        assert job.state == CANCELLED
+        assert elapsed < 1
+
+    def test_finished_jobs_are_bounded(self):
+        async def noop():
+            pass
+
+        async def scenario():
+            queue = TaskQueue(workers=1, keep_results=2)
+            jobs = [queue.apply_async(noop) for _ in range(4)]
+            await queue.drain()
+            return queue, jobs
+
+        queue, jobs = run(scenario())
+        assert [queue.get(job.id) for job in jobs] == [None, None, jobs[2], jobs[3]]
+
+
+class EmbeddingAgent(BaseAgent):
+    """Embeds its step id through the shared embedding service."""
+
+    def embedding_texts(self, step_id: str, context: dict) -> list[str]:
+        return [step_id]
+
+    async def handle(self, step_id: str, context: dict) -> dict:
+        return {"status": "found", "step": step_id, "vector": await self.embed(context, step_id)}
+
+
+class UnitModel:
+    def encode(self, texts):
+        return np.ones((len(texts), 2))
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    """Point the shared client at a port nothing listens on."""
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    redis_module.get_redis.cache_clear()
+    yield
+    redis_module.get_redis.cache_clear()
+
+
+class TestLocalBackendWithoutRedis:
+    """TASK_BACKEND=local runs queries end to end when Redis is unreachable."""
+
+    def test_orchestration_completes_and_helpers_fail_open(self, redis_down, monkeypatch):
+        steps = ("search_gmail_for_booking", "find_calendar_event", "draft_cancellation_email")
+        registry = AgentRegistry((AgentSpec("any", f"{__name__}:EmbeddingAgent", steps),), resources=AgentResources())
+        monkeypatch.setattr(tasks, "OrchestratorEngine", lambda: OrchestratorEngine(registry))
+        monkeypatch.setattr(service, "get_embedding_model", lambda: UnitModel())
+
+        async def scenario():
+            queue = TaskQueue(workers=1)
+            job = queue.apply_async(
+                tasks.run_orchestration_local,
+                ("t1", "u1", "Cancel my Turkish Airlines flight"),
+                {"profile": True},
+            )
+            result = await job.future
+            await queue.drain()
+            return result, await conversation_recorder.flush()
+
+        result, flushed = run(scenario())
+
+        assert set(result["details"]) == set(steps)
+        assert all(step["status"] == "found" for step in result["details"].values())
+        assert flushed == 0
+        assert load_details("t1") is None
+        assert profiling.load_profile("t1") is None
@@ -0,0 +1,225 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import Settings
+from app.embeddings import batching
+from app.embeddings.batching import DRIVE_KEYWORD, GMAIL_SEMANTIC, VectorSearchBatcher
+
+
+class FakeSession:
+    """Answers a batched statement with k rows per search, named after its user."""
+
+    def __init__(self, calls: list, fail: bool = False):
+        self.calls = calls
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params):
+        self.calls.append((str(statement), params))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        rows = []
+        i = 0
+        while f"user_id_{i}" in params:
+            rows.extend(
+                SimpleNamespace(batch_index=i, id=f"{params[f'user_id_{i}']}-{n}", distance=float(n))
+                for n in range(params[f"k_{i}"])
+            )
+            i += 1
+        return SimpleNamespace(fetchall=lambda: rows)
+
+
+class FixedStrategy:
+    """Searches users in `exact_users` exactly and everyone else through the index."""
+
+    def __init__(self, exact_users=()):
+        self.exact_users = set(exact_users)
+        self.configured = []
+        self.sampled = []
+        self.resolved = []
+
+    async def use_exact_many(self, db, table, user_ids):
+        self.resolved.append(list(user_ids))
+        return {user_id: user_id in self.exact_users for user_id in user_ids}
+
+    @asynccontextmanager
+    async def ann_scan(self, db, k):
+        self.configured.append(k)
+        yield
+
+    def sample_recall(self, query, bound, rows):
+        self.sampled.append(bound["user_id"])
+
+
+@pytest.fixture(autouse=True)
+def no_metrics(monkeypatch):
+    monkeypatch.setattr(batching.metrics, "observe", lambda *args, **kwargs: None)
+
+
+def make_batcher(calls, fail=False, strategy=None, **kwargs) -> VectorSearchBatcher:
+    return VectorSearchBatcher(
+        session_factory=lambda: FakeSession(calls, fail),
+        strategy=strategy or FixedStrategy(),
+        **kwargs,
+    )
+
+
+class TestVectorQuery:
+    """Unit tests for the batched statement."""
+
+    def test_batch_sql_binds_every_search(self):
+        sql = DRIVE_KEYWORD.batch_sql(2)
+
+        for i in range(2):
+            for name in ("user_id", "embedding", "k", "keyword", "updated_after", "updated_before"):
+                assert f":{name}_{i} " in sql
+        assert "CAST(:embedding_1 AS vector)" in sql
+        assert "CROSS JOIN LATERAL" in sql
+        assert "t.name ILIKE q.keyword" in sql
+        assert "WHERE t.user_id = q.user_id" in sql
+        assert "ORDER BY q.i, r.distance" in sql
+        assert "ORDER BY t.embedding <-> q.embedding\n" in sql
+        assert "ORDER BY (t.embedding <-> q.embedding) + 0" in DRIVE_KEYWORD.batch_sql(2, exact=True)
+
+    @pytest.mark.parametrize("query,lower,upper", [
+        (GMAIL_SEMANTIC, "t.received_at >= q.received_after", "t.received_at < q.received_before"),
+        (DRIVE_KEYWORD, "t.updated_at >= q.updated_after", "t.updated_at < q.updated_before"),
+    ])
+    def test_time_ranges_are_half_open(self, query, lower, upper):
+        sql = query.batch_sql(1)
+
+        assert lower in sql
+        assert upper in sql
+
+    def test_bind_rejects_unknown_parameters(self):
+        with pytest.raises(ValueError, match="keyword"):
+            GMAIL_SEMANTIC.bind("u", [0.0], 1, keyword="x")
+
+        bound = GMAIL_SEMANTIC.bind("u", [0.5], 3)
+        assert GMAIL_SEMANTIC.batch_params([bound, bound])["k_1"] == 3
+
+
+class TestVectorSearchBatcher:
+    """Unit tests for coalescing concurrent vector searches."""
+
+    def test_concurrent_searches_share_one_statement(self):
+        calls = []
+        batcher = make_batcher(calls, window_ms=5, max_size=32)
+
+        async def run():
+            return await asyncio.gather(*(
+                batcher.search(GMAIL_SEMANTIC, f"user{i}", [0.1, 0.2], k=i + 1) for i in range(3)
+            ))
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert [[row.id for row in rows] for rows in results] == [
+            ["user0-0"],
+            ["user1-0", "user1-1"],
+            ["user2-0", "user2-1", "user2-2"],
+        ]
+        params = calls[0][1]
+        assert params["embedding_2"] == "[0.1,0.2]"
+        assert params["received_after_0"] is None
+
+    @pytest.mark.parametrize("max_size,expected_batches", [(2, 3), (5, 1)])
+    def test_full_batches_flush_early(self, max_size, expected_batches):
+        calls = []
+        batcher = make_batcher(calls, window_ms=200, max_size=max_size)
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(*(
+                batcher.search(GMAIL_SEMANTIC, f"user{i}", [0.0], k=1) for i in range(5)
+            )), timeout=2)
+
+        results = asyncio.run(run())
+
+        assert len(calls) == expected_batches
+        assert [rows[0].id for rows in results] == [f"user{i}-0" for i in range(5)]
+
+    def test_searches_of_different_shapes_are_batched_separately(self):
+        calls = []
+        batcher = make_batcher(calls, window_ms=5)
+
+        async def run():
+            await asyncio.gather(
+                batcher.search(GMAIL_SEMANTIC, "a", [0.0], k=1),
+                batcher.search(DRIVE_KEYWORD, "b", [0.0], k=1, keyword="%acme%"),
+            )
+
+        asyncio.run(run())
+
+        assert sorted("gdrive_cache" in sql for sql, _ in calls) == [False, True]
+
+    def test_failure_reaches_every_caller(self):
+        batcher = make_batcher([], fail=True, window_ms=1)
+
+        async def run():
+            return await asyncio.gather(
+                *(batcher.search(GMAIL_SEMANTIC, "u", [0.0], k=1) for _ in range(2)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_unknown_parameters_are_rejected(self):
+        batcher = make_batcher([])
+
+        with pytest.raises(ValueError, match="keyword"):
+            asyncio.run(batcher.search(GMAIL_SEMANTIC, "u", [0.0], k=1, keyword="x"))
+
+    def test_exact_and_index_searches_run_as_separate_statements(self):
+        calls = []
+        strategy = FixedStrategy(exact_users={"small"})
+        batcher = make_batcher(calls, strategy=strategy, window_ms=5)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.search(GMAIL_SEMANTIC, "small", [0.0], k=2),
+                batcher.search(GMAIL_SEMANTIC, "large", [0.0], k=3),
+                batcher.search(GMAIL_SEMANTIC, "huge", [0.0], k=5),
+            )
+
+        results = asyncio.run(run())
+
+        assert sorted("+ 0" in sql for sql, _ in calls) == [False, True]
+        # Every user of the batch is resolved at once
+        assert strategy.resolved == [["small", "large", "huge"]]
+        assert strategy.configured == [5]
+        assert sorted(strategy.sampled) == ["huge", "large"]
+        assert [len(rows) for rows in results] == [2, 3, 5]
+
+    def test_disabled_by_default(self):
+        assert Settings.model_fields["VECTOR_BATCH_WINDOW_MS"].default == 0
+
+    def test_disabled_by_zero_window(self, monkeypatch):
+        monkeypatch.setattr(batching.settings, "VECTOR_BATCH_WINDOW_MS", 0.0)
+
+        async def lookup():
+            return batching.get_vector_batcher()
+
+        assert asyncio.run(lookup()) is None
+
+    def test_one_batcher_per_event_loop(self, monkeypatch):
+        monkeypatch.setattr(batching.settings, "VECTOR_BATCH_WINDOW_MS", 2.0)
+
+        async def lookup():
+            return batching.get_vector_batcher(), batching.get_vector_batcher()
+
+        first, again = asyncio.run(lookup())
+        second, _ = asyncio.run(lookup())
+
+        assert first is again
+        assert first is not second